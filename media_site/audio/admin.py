@@ -3,4 +3,4 @@ from .models import AudioFile
 
 @admin.register(AudioFile)
 class AudioFileAdmin(admin.ModelAdmin):
-    list_display = ['title', 'uploaded_date']
+    list_display = ['title', 'uploaded_date', 'duration', 'codec', 'file_size']
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0002_alter_audiofile_description'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='audiofile',
+            index=models.Index(fields=['-uploaded_date', '-id'], name='audio_uploaded_id_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:06
+
+from django.db import migrations, models
+
+
+def queue_existing_audio(apps, schema_editor):
+    # New uploads queue their own peaks job; backfill the rows that predate it
+    AudioFile = apps.get_model('audio', 'AudioFile')
+    Job = apps.get_model('jobs', 'Job')
+    Job.objects.bulk_create(
+        Job(kind='audio.peaks', object_id=pk)
+        for pk in AudioFile.objects.exclude(audio_file='').values_list('pk', flat=True).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0003_audiofile_audio_uploaded_id_idx'),
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiofile',
+            name='peaks',
+            field=models.FileField(blank=True, upload_to='audio_files/'),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='peaks_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(queue_existing_audio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:14
+
+import core.blobs
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0004_audiofile_peaks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='audiofile',
+            name='audio_file',
+            field=core.blobs.ContentAddressedFileField(upload_to='audio_files/'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0005_alter_audiofile_audio_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiofile',
+            name='bitrate',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='codec',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='metadata_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='audiofile',
+            index=models.Index(fields=['duration'], name='audio_duration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='audiofile',
+            index=models.Index(fields=['bitrate'], name='audio_bitrate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='audiofile',
+            index=models.Index(fields=['codec'], name='audio_codec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='audiofile',
+            index=models.Index(fields=['file_size'], name='audio_file_size_idx'),
+        ),
+    ]
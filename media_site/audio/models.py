@@ -1,10 +1,109 @@
 from django.db import models
+from core.blobs import ContentAddressedFileField
+from core.cache import invalidate
+from jobs.queue import enqueue
 
 class AudioFile(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     title = models.CharField(max_length=200)
-    audio_file = models.FileField(upload_to='audio_files/')
+    audio_file = ContentAddressedFileField(upload_to='audio_files/')
     description = models.TextField()
     uploaded_date = models.DateTimeField(auto_now_add=True)
+    # Waveform min/max pyramid, see audio/waveform.py
+    peaks = models.FileField(upload_to='audio_files/', blank=True)
+    peaks_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # Technical metadata, probed by the job worker (core/probe.py)
+    duration = models.FloatField(null=True, blank=True)  # seconds
+    bitrate = models.PositiveIntegerField(null=True, blank=True)  # bits per second
+    codec = models.CharField(max_length=32, blank=True)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)  # bytes
+    metadata_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+
+    METADATA_FIELDS = ['duration', 'bitrate', 'codec', 'file_size']
+
+    class Meta:
+        indexes = [
+            # Backs keyset pagination on (uploaded_date, id)
+            models.Index(fields=['-uploaded_date', '-id'], name='audio_uploaded_id_idx'),
+            # Sorting and filtering on technical metadata (core/filters.py)
+            models.Index(fields=['duration'], name='audio_duration_idx'),
+            models.Index(fields=['bitrate'], name='audio_bitrate_idx'),
+            models.Index(fields=['codec'], name='audio_codec_idx'),
+            models.Index(fields=['file_size'], name='audio_file_size_idx'),
+        ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored file as loaded, so a save can tell it was replaced
+        if 'audio_file' in field_names:
+            instance._saved_file = values[field_names.index('audio_file')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.queue_processing()
+
+    def queue_processing(self):
+        if self.file_replaced():
+            self.reset_processed()
+        if self.audio_file:
+            self.reuse_processed()
+
+        # Waveform peaks are computed once by the job worker (manage.py run_jobs)
+        if self.audio_file and not self.peaks and self.peaks_status == self.STATUS_PENDING:
+            enqueue('audio.peaks', self.pk)
+
+        if self.audio_file and self.metadata_status == self.STATUS_PENDING:
+            enqueue('audio.metadata', self.pk)
+
+    def file_replaced(self):
+        saved = getattr(self, '_saved_file', models.DEFERRED)
+        self._saved_file = self.audio_file.name
+        return saved is not models.DEFERRED and saved != self.audio_file.name
+
+    def reset_processed(self):
+        # Peaks and metadata describe the previous file: back to pending, so
+        # they are reused from a twin or computed again
+        updates = {name: self._meta.get_field(name).get_default() for name in self.METADATA_FIELDS}
+        updates.update(peaks='', peaks_status=self.STATUS_PENDING, metadata_status=self.STATUS_PENDING)
+        AudioFile.objects.filter(pk=self.pk).update(**updates)
+        for name, value in updates.items():
+            setattr(self, name, value)
+        invalidate('audio', self.pk)
+
+    def reuse_processed(self):
+        # Identical uploads share one stored file (core/blobs.py): reuse the
+        # peaks and metadata of another row with the same file instead of
+        # decoding or probing again
+        twins = AudioFile.objects.exclude(pk=self.pk).filter(audio_file=self.audio_file.name)
+        updates = {}
+        if not self.peaks and self.peaks_status == self.STATUS_PENDING:
+            donor = twins.filter(peaks_status=self.STATUS_READY).exclude(peaks='').first()
+            if donor is not None:
+                updates.update(peaks=donor.peaks.name, peaks_status=self.STATUS_READY)
+        if self.metadata_status == self.STATUS_PENDING:
+            donor = twins.filter(metadata_status=self.STATUS_READY).first()
+            if donor is not None:
+                updates.update({name: getattr(donor, name) for name in self.METADATA_FIELDS})
+                updates['metadata_status'] = self.STATUS_READY
+        if not updates:
+            return
+
+        AudioFile.objects.filter(pk=self.pk).update(**updates)
+        for name, value in updates.items():
+            setattr(self, name, value)
+        invalidate('audio', self.pk)
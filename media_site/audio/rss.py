@@ -0,0 +1,51 @@
+import mimetypes
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.feedgenerator import rfc2822_date
+
+from core.rss import Feed
+from .models import AudioFile
+
+
+class PodcastFeed(Feed):
+    """The audio catalogue as a podcast: one episode per file, with an enclosure"""
+    namespace = 'audio'
+    date_field = 'uploaded_date'
+    description = 'Latest audio'
+    xml_namespaces = {'itunes': 'http://www.itunes.com/dtds/podcast-1.0.dtd'}
+
+    @property
+    def title(self):
+        return f"{settings.FEED_SITE_NAME} podcast"
+
+    def items(self):
+        return AudioFile.objects.only('title', 'description', 'audio_file', 'uploaded_date', 'duration', 'file_size')
+
+    def channel_xml(self, base_url):
+        return (
+            f'<language>{escape(settings.LANGUAGE_CODE)}</language>'
+            f'<itunes:author>{escape(settings.FEED_SITE_NAME)}</itunes:author>'
+            '<itunes:explicit>false</itunes:explicit>'
+        )
+
+    def item_xml(self, audio, base_url):
+        # Enclosures point at the stream endpoint, which serves byte ranges
+        url = base_url + reverse('audio_stream', args=[audio.pk])
+        length = audio.file_size
+        if length is None:
+            try:
+                length = audio.audio_file.size
+            except (OSError, ValueError):
+                length = 0
+        content_type = mimetypes.guess_type(audio.audio_file.name)[0] or 'audio/mpeg'
+        duration = f'<itunes:duration>{round(audio.duration)}</itunes:duration>' if audio.duration else ''
+        return (
+            f'<item><title>{escape(audio.title)}</title>'
+            f'<guid isPermaLink="false">audio-{audio.pk}</guid>'
+            f'<pubDate>{rfc2822_date(audio.uploaded_date)}</pubDate>'
+            f'<description>{escape(audio.description)}</description>'
+            f'{duration}'
+            f'<enclosure url={quoteattr(url)} length="{length}" type={quoteattr(content_type)}/></item>'
+        )
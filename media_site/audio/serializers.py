@@ -1,11 +1,35 @@
+from django.urls import reverse
 from rest_framework import serializers
+from core.fieldsets import SparseFieldsetMixin
 from .models import AudioFile
 
-class AudioFileSerializer(serializers.ModelSerializer):
+class AudioFileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    stream_url = serializers.SerializerMethodField()
+    peaks_url = serializers.SerializerMethodField()
+
+    column_dependencies = {
+        'stream_url': [],
+        'peaks_url': ['peaks_status'],
+    }
+
     class Meta:
         model = AudioFile
-        fields = ['id', 'title', 'audio_file', 'description', 'uploaded_date']
-        read_only_fields = ['id', 'uploaded_date']
+        fields = [
+            'id', 'title', 'audio_file', 'stream_url', 'peaks_url', 'peaks_status', 'description', 'uploaded_date',
+            'duration', 'bitrate', 'codec', 'file_size', 'metadata_status',
+        ]
+        read_only_fields = [
+            'id', 'uploaded_date', 'peaks_status',
+            'duration', 'bitrate', 'codec', 'file_size', 'metadata_status',
+        ]
+
+    def get_stream_url(self, obj):
+        return reverse('audio_stream', args=[obj.pk])
+
+    def get_peaks_url(self, obj):
+        if obj.peaks_status != AudioFile.STATUS_READY:
+            return None
+        return reverse('audio_peaks', args=[obj.pk])
 
     def validate_description(self, value):
         """Ensure description is not empty"""
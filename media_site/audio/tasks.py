@@ -0,0 +1,45 @@
+from core.cache import invalidate
+from core.probe import read_metadata
+from .models import AudioFile
+from .waveform import generate_peaks as build_peaks
+
+
+def generate_peaks(job):
+    """Job handler for 'audio.peaks'"""
+    audio = AudioFile.objects.filter(pk=job.object_id).first()
+    if audio is None or not audio.audio_file or audio.peaks:
+        return
+
+    # Queryset updates skip post_save, so drop cached responses explicitly
+    AudioFile.objects.filter(pk=audio.pk).update(peaks_status=AudioFile.STATUS_PROCESSING)
+    invalidate('audio', audio.pk)
+    try:
+        build_peaks(audio)
+    except Exception:
+        status = AudioFile.STATUS_FAILED if job.is_last_attempt else AudioFile.STATUS_PENDING
+        AudioFile.objects.filter(pk=audio.pk).update(peaks_status=status)
+        invalidate('audio', audio.pk)
+        raise
+
+    audio.peaks_status = AudioFile.STATUS_READY
+    audio.save(update_fields=['peaks', 'peaks_status'])
+
+
+def extract_metadata(job):
+    """Job handler for 'audio.metadata'"""
+    audio = AudioFile.objects.filter(pk=job.object_id).first()
+    if audio is None or not audio.audio_file or audio.metadata_status == AudioFile.STATUS_READY:
+        return
+
+    try:
+        metadata = read_metadata(audio.audio_file)
+    except Exception:
+        if job.is_last_attempt:
+            AudioFile.objects.filter(pk=audio.pk).update(metadata_status=AudioFile.STATUS_FAILED)
+            invalidate('audio', audio.pk)
+        raise
+
+    for name in AudioFile.METADATA_FIELDS:
+        setattr(audio, name, metadata.get(name))
+    audio.metadata_status = AudioFile.STATUS_READY
+    audio.save(update_fields=[*AudioFile.METADATA_FIELDS, 'metadata_status'])
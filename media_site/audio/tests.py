@@ -1,3 +1,271 @@
-from django.test import TestCase
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from core.cache import get_version
+from core.probe import parse_ffprobe, read_metadata, stat_probe
+from core.tests import TempMediaMixin
+from jobs.models import Job
+from .models import AudioFile
+from .tasks import extract_metadata
+from .waveform import BASE_SAMPLES_PER_PEAK, build_pyramid, decode_peaks, read_level, reduce_samples, write_peaks
+from .views import audio_list
+
+
+class AudioTestCase(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def audio(self, content=b'audio bytes', **fields):
+        audio = AudioFile(title='Track', description='d', **fields)
+        with self.captureOnCommitCallbacks(execute=True):
+            audio.audio_file.save('track.mp3', ContentFile(content))
+        return audio
+
+
+@override_settings(MEDIA_PROBE='core.probe.stat_probe')
+class MetadataTests(AudioTestCase):
+    def test_stat_probe_reads_only_the_size(self):
+        audio = self.audio(b'x' * 1234)
+        metadata = stat_probe(audio.audio_file.path)
+        self.assertEqual(metadata['file_size'], 1234)
+        self.assertIsNone(metadata['duration'])
+        self.assertIsNone(stat_probe(os.path.join(os.path.dirname(audio.audio_file.path), 'missing.mp3'))['file_size'])
+
+    def test_metadata_job_stores_the_probe_result(self):
+        audio = self.audio(b'x' * 1234)
+        self.assertEqual(audio.metadata_status, AudioFile.STATUS_PENDING)
+        self.assertTrue(Job.objects.filter(kind='audio.metadata', object_id=audio.pk).exists())
+
+        extract_metadata(Job(kind='audio.metadata', object_id=audio.pk))
+        audio.refresh_from_db()
+        self.assertEqual(audio.file_size, 1234)
+        self.assertEqual(audio.metadata_status, AudioFile.STATUS_READY)
+
+    def test_read_metadata_falls_back_to_the_storage_size(self):
+        audio = self.audio(b'x' * 99)
+        # e.g. ffprobe reading a stream that doesn't report its size
+        with mock.patch('core.probe.stat_probe', return_value={'file_size': None}):
+            self.assertEqual(read_metadata(audio.audio_file)['file_size'], 99)
+
+    def test_parse_ffprobe_skips_cover_art(self):
+        metadata = parse_ffprobe({
+            'format': {'duration': '61.5', 'bit_rate': '128000', 'size': '983040'},
+            'streams': [
+                {'codec_type': 'video', 'codec_name': 'mjpeg', 'width': 600, 'height': 600, 'disposition': {'attached_pic': 1}},
+                {'codec_type': 'audio', 'codec_name': 'mp3'},
+            ],
+        })
+        self.assertEqual(metadata, {
+            'duration': 61.5, 'bitrate': 128000, 'codec': 'mp3', 'width': None, 'height': None, 'file_size': 983040,
+        })
+
+    def test_replacing_the_file_resets_its_metadata(self):
+        audio = self.audio(b'old bytes')
+        extract_metadata(Job(kind='audio.metadata', object_id=audio.pk))
+        AudioFile.objects.filter(pk=audio.pk).update(peaks='audio_files/old.json', peaks_status=AudioFile.STATUS_READY)
+
+        audio = AudioFile.objects.get(pk=audio.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            audio.audio_file.save('track.mp3', ContentFile(b'new bytes'))
+        audio.refresh_from_db()
+        self.assertIsNone(audio.file_size)
+        self.assertEqual(audio.metadata_status, AudioFile.STATUS_PENDING)
+        self.assertEqual(audio.peaks_status, AudioFile.STATUS_PENDING)
+        self.assertFalse(audio.peaks)
+
+    def test_saving_the_same_file_keeps_its_metadata(self):
+        audio = self.audio()
+        extract_metadata(Job(kind='audio.metadata', object_id=audio.pk))
+        audio = AudioFile.objects.get(pk=audio.pk)
+        audio.title = 'Renamed'
+        audio.save()
+        audio.refresh_from_db()
+        self.assertEqual(audio.metadata_status, AudioFile.STATUS_READY)
+
+
+class MetadataFilterTests(AudioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.short = self.audio(b'short')
+        self.long = self.audio(b'long')
+        AudioFile.objects.filter(pk=self.short.pk).update(duration=30, file_size=10, codec='mp3')
+        AudioFile.objects.filter(pk=self.long.pk).update(duration=600, file_size=11, codec='aac')
+
+    def ids(self, query):
+        response = self.client.get(f'/api/audio/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row['id'] for row in response.json()}
+
+    def test_ranges_and_exact_match(self):
+        self.assertEqual(self.ids('min_duration=60'), {self.long.pk})
+        self.assertEqual(self.ids('max_duration=60'), {self.short.pk})
+        self.assertEqual(self.ids('codec=mp3'), {self.short.pk})
+
+    def test_integer_columns_round_inwards(self):
+        self.assertEqual(self.ids('min_file_size=10.5'), {self.long.pk})
+        self.assertEqual(self.ids('max_file_size=10.5'), {self.short.pk})
+
+    def test_rejects_what_is_not_a_finite_number(self):
+        for query in ('min_duration=abc', 'min_duration=inf', 'max_duration=-Infinity', 'min_duration=nan', 'max_file_size=1e30'):
+            with self.subTest(query):
+                response = self.client.get(f'/api/audio/?{query}')
+                self.assertEqual(response.status_code, 400)
+
+
+class KeysetCursorTests(AudioTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.rows = [self.audio(f'track {i}'.encode()) for i in range(5)]
+        # Two rows share a date, so the id breaks the tie
+        dates = [now - timedelta(days=3), now - timedelta(days=2), now - timedelta(days=2), now - timedelta(days=1), now]
+        for audio, date in zip(self.rows, dates):
+            AudioFile.objects.filter(pk=audio.pk).update(uploaded_date=date)
+
+    def test_pages_cover_every_row_once_newest_first(self):
+        seen = []
+        url = '/api/audio/?page_size=2'
+        while url:
+            data = self.client.get(url).json()
+            self.assertLessEqual(len(data['results']), 2)
+            seen += [row['id'] for row in data['results']]
+            url = data['next']
+        expected = [self.rows[4].pk, self.rows[3].pk, self.rows[2].pk, self.rows[1].pk, self.rows[0].pk]
+        self.assertEqual(seen, expected)
+
+    def test_plain_list_without_pagination_params(self):
+        self.assertEqual(len(self.client.get('/api/audio/').json()), 5)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/audio/?cursor=not-a-cursor').status_code, 404)
+
+
+class AsyncListTests(AudioTestCase):
+    async def test_async_list_matches_the_drf_list(self):
+        for i in range(3):
+            await AudioFile.objects.acreate(title=f'Track {i}', description='d', audio_file=f'audio_files/{i}.mp3')
+        for query in ('', '?page_size=2', '?fields=id,title'):
+            with self.subTest(query):
+                response = await audio_list(RequestFactory().get(f'/api/audio/{query}'))
+                self.assertEqual(response.status_code, 200)
+                expected = await self.async_client.get(f'/api/audio/{query}')
+                self.assertEqual(response.content, expected.content)
+
+
+class PodcastFeedTests(AudioTestCase):
+    def test_enclosure_has_the_length_and_type(self):
+        audio = self.audio(b'x' * 1234)
+        AudioFile.objects.filter(pk=audio.pk).update(duration=61.4)
+        response = self.client.get('/api/audio/feed/')
+        self.assertEqual(response.status_code, 200)
+        channel = ElementTree.fromstring(b''.join(response.streaming_content)).find('channel')
+        item = channel.find('item')
+        enclosure = item.find('enclosure')
+        self.assertEqual(enclosure.get('url'), f'http://testserver/api/audio/{audio.pk}/stream/')
+        self.assertEqual(enclosure.get('length'), '1234')
+        self.assertEqual(enclosure.get('type'), 'audio/mpeg')
+        self.assertEqual(item.findtext('{http://www.itunes.com/dtds/podcast-1.0.dtd}duration'), '61')
+
+
+class CacheInvalidationTests(AudioTestCase):
+    def test_save_drops_the_cached_list_and_detail(self):
+        audio = self.audio()
+        detail = f'/api/audio/{audio.pk}/'
+        self.assertEqual(self.client.get('/api/audio/').json()[0]['title'], 'Track')
+        self.assertEqual(self.client.get(detail).json()['title'], 'Track')
+
+        list_version, detail_version = get_version('audio'), get_version('audio', audio.pk)
+        audio.title = 'Renamed'
+        audio.save()
+        # One bump each, not one per receiver
+        self.assertEqual(get_version('audio'), list_version + 1)
+        self.assertEqual(get_version('audio', audio.pk), detail_version + 1)
+        self.assertEqual(self.client.get('/api/audio/').json()[0]['title'], 'Renamed')
+        self.assertEqual(self.client.get(detail).json()['title'], 'Renamed')
+
+    def test_delete_drops_the_cached_list_and_detail(self):
+        audio = self.audio()
+        self.assertEqual(len(self.client.get('/api/audio/').json()), 1)
+        self.assertEqual(self.client.get(f'/api/audio/{audio.pk}/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            AudioFile.objects.get(pk=audio.pk).delete()
+        self.assertEqual(self.client.get('/api/audio/').json(), [])
+        self.assertEqual(self.client.get(f'/api/audio/{audio.pk}/').status_code, 404)
+
+
+def fake_ffmpeg(body):
+    """An executable standing in for ffmpeg, running `body` with the input path in `source`"""
+    fd, path = tempfile.mkstemp(suffix='.py')
+    with os.fdopen(fd, 'w') as f:
+        f.write(f"#!{sys.executable}\nimport sys, time\nsource = sys.argv[4]\n{body}\n")
+    os.chmod(path, 0o755)
+    return path
+
+
+class PeaksTests(AudioTestCase):
+    def test_samples_scale_to_8_bit_min_max_pairs(self):
+        samples = np.zeros(BASE_SAMPLES_PER_PEAK * 2, dtype='<i2')
+        samples[3], samples[5] = -32768, 32767
+        samples[BASE_SAMPLES_PER_PEAK:] = 256
+        samples[-1] = -1
+        self.assertEqual(reduce_samples(samples).tolist(), [[-128, 127], [-1, 1]])
+
+    def test_pyramid_halves_down_to_the_minimum_length(self):
+        base = np.array([[-i % 100, i % 100] for i in range(2001)], dtype=np.int8)
+        levels = build_pyramid(base)
+        self.assertEqual([len(level) for level in levels], [2001, 1001, 501])
+        # Each coarser peak is the min of mins and max of maxes below it
+        self.assertEqual(levels[1][0].tolist(), [min(base[0][0], base[1][0]), max(base[0][1], base[1][1])])
+        # An odd level repeats its last peak rather than dropping it
+        self.assertEqual(levels[1][-1].tolist(), base[-1].tolist())
+
+    def test_file_round_trip(self):
+        levels = build_pyramid(np.array([[-1, 1], [-2, 2], [-3, 3]] * 300, dtype=np.int8))
+        buffer = io.BytesIO()
+        write_peaks(levels, buffer)
+        audio = self.audio()
+        audio.peaks.save('track.peaks', ContentFile(buffer.getvalue()), save=False)
+        for index, level in enumerate(levels):
+            result = read_level(audio.peaks, index, 1, 4)
+            self.assertEqual(result['samples_per_peak'], BASE_SAMPLES_PER_PEAK << index)
+            self.assertEqual(result['length'], len(level))
+            self.assertEqual(result['data'].tolist(), level[1:4].tolist())
+
+    def test_decode_reads_ffmpeg_pcm(self):
+        samples = np.arange(-BASE_SAMPLES_PER_PEAK * 256, BASE_SAMPLES_PER_PEAK * 256, 128, dtype='<i2')
+        with tempfile.NamedTemporaryFile(suffix='.raw', delete=False) as source:
+            source.write(samples.tobytes())
+        self.addCleanup(os.unlink, source.name)
+        ffmpeg = fake_ffmpeg("sys.stdout.buffer.write(open(source, 'rb').read())")
+        self.addCleanup(os.unlink, ffmpeg)
+        with self.settings(FFMPEG_BINARY=ffmpeg):
+            peaks = decode_peaks(source.name)
+        self.assertEqual(peaks.tolist(), reduce_samples(samples).tolist())
+
+    def test_decode_kills_a_hung_ffmpeg(self):
+        ffmpeg = fake_ffmpeg('time.sleep(60)')
+        self.addCleanup(os.unlink, ffmpeg)
+        with self.settings(FFMPEG_BINARY=ffmpeg, AUDIO_PEAKS_TIMEOUT=1):
+            with self.assertRaises(subprocess.TimeoutExpired):
+                decode_peaks('missing.mp3')
+
+    def test_decode_failure_carries_stderr(self):
+        ffmpeg = fake_ffmpeg("sys.stderr.write('corrupt input'); sys.exit(1)")
+        self.addCleanup(os.unlink, ffmpeg)
+        with self.settings(FFMPEG_BINARY=ffmpeg):
+            with self.assertRaises(subprocess.CalledProcessError) as caught:
+                decode_peaks('missing.mp3')
+        self.assertEqual(caught.exception.stderr, b'corrupt input')
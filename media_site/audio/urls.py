@@ -1,7 +1,13 @@
 from django.urls import path
-from .views import AudioFileListAPIView, AudioFileDetailAPIView
+from core.async_views import with_async_get
+from .rss import PodcastFeed
+from .views import AudioFileListAPIView, AudioFileDetailAPIView, AudioFileStreamAPIView, AudioFilePeaksAPIView, AudioFileBulkAPIView, audio_list, audio_detail, audio_stream
 
 urlpatterns = [
-    path('', AudioFileListAPIView.as_view(), name = 'audio_list'),
-    path('<int:pk>/', AudioFileDetailAPIView.as_view(), name = 'audio_detail'),
+    path('', with_async_get(AudioFileListAPIView, audio_list), name = 'audio_list'),
+    path('<int:pk>/', with_async_get(AudioFileDetailAPIView, audio_detail), name = 'audio_detail'),
+    path('<int:pk>/stream/', with_async_get(AudioFileStreamAPIView, audio_stream), name = 'audio_stream'),
+    path('<int:pk>/peaks/', AudioFilePeaksAPIView.as_view(), name = 'audio_peaks'),
+    path('bulk/', AudioFileBulkAPIView.as_view(), name = 'audio_bulk'),
+    path('feed/', PodcastFeed.as_view(), name = 'audio_feed'),
 ]
\ No newline at end of file
@@ -2,20 +2,45 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import status
-from django.shortcuts import get_object_or_404
+from django.http import HttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from core.async_views import JSONResponse, async_api_view, serialized_response
+from core.bulk import BulkAPIView
+from core.cache import async_cached_response, cached_response
+from core.conditional import async_conditional_get, conditional_get
+from core.filters import filter_by_params
+from core.pagination import KeysetPagination
+from core.streaming import async_ranged_file_response, ranged_file_response
+from .waveform import read_level
 from .models import AudioFile
 from .serializers import AudioFileSerializer
 
+def list_queryset(request, fields, exclude):
+    columns = AudioFileSerializer.only_columns(fields, exclude)
+    queryset = AudioFile.objects.only('uploaded_date', *columns).order_by('-uploaded_date', '-id')
+    # e.g. ?min_duration=60&max_duration=600&codec=aac
+    return filter_by_params(queryset, request, ranges = ['duration', 'bitrate', 'file_size'], exact = ['codec'])
+
+
 class AudioFileListAPIView(APIView):
     def get_permissions(self):
         if self.request.method == 'GET':
             return [AllowAny()]
         return [IsAuthenticated()]
     
+    @conditional_get('audio')
+    @cached_response('audio')
     def get(self, request):
         # Public access
-        audio_files = AudioFile.objects.all().order_by('-uploaded_date')
-        serializer = AudioFileSerializer(audio_files, many = True)
+        # ?fields= / ?exclude= also trim the columns fetched
+        fields, exclude = AudioFileSerializer.fieldset_from_request(request)
+        audio_files = list_queryset(request, fields, exclude)
+        paginator = KeysetPagination('uploaded_date')
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(audio_files, request)
+            serializer = AudioFileSerializer(page, many = True, fields = fields, exclude = exclude)
+            return paginator.get_paginated_response(serializer.data)
+        serializer = AudioFileSerializer(audio_files, many = True, fields = fields, exclude = exclude)
         return Response(serializer.data)
     
     def post(self, request):
@@ -35,6 +60,8 @@ class AudioFileDetailAPIView(APIView):
     def get_object(self, pk):
         return get_object_or_404(AudioFile, pk=pk)
     
+    @conditional_get('audio')
+    @cached_response('audio')
     def get(self, request, pk):
         audio_file = self.get_object(pk)
         serializer = AudioFileSerializer(audio_file)
@@ -52,4 +79,85 @@ class AudioFileDetailAPIView(APIView):
         audio_file = self.get_object(pk)
         audio_file.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
-    
+
+
+class AudioFileStreamAPIView(APIView):
+    """
+    Stream the audio file with HTTP Range support so players can seek
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        audio_file = get_object_or_404(AudioFile, pk=pk).audio_file
+        if not audio_file:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return ranged_file_response(request, audio_file)
+
+
+class AudioFilePeaksAPIView(APIView):
+    """
+    Waveform peaks for one zoom level: ?level=0 is the finest, each level
+    above halves the resolution. ?start= and ?end= select a range of peaks.
+    """
+    permission_classes = [AllowAny]
+
+    @conditional_get('audio')
+    def get(self, request, pk):
+        audio_file = get_object_or_404(AudioFile, pk=pk)
+        if audio_file.peaks_status != AudioFile.STATUS_READY or not audio_file.peaks:
+            return Response({'detail': 'Waveform is not ready.'}, status = status.HTTP_404_NOT_FOUND)
+
+        try:
+            level = int(request.query_params.get('level', 0))
+            start = int(request.query_params.get('start', 0))
+            end = request.query_params.get('end')
+            end = int(end) if end is not None else None
+            peaks = read_level(audio_file.peaks, level, start, end)
+        except (ValueError, IndexError):
+            return Response({'detail': 'Invalid level or range.'}, status = status.HTTP_400_BAD_REQUEST)
+
+        # Flatten to [min0, max0, min1, max1, ...]
+        peaks['data'] = peaks['data'].ravel().tolist()
+        return Response(peaks)
+
+
+class AudioFileBulkAPIView(BulkAPIView):
+    """
+    Create, update and delete many audio files in one transaction
+    """
+    model = AudioFile
+    serializer_class = AudioFileSerializer
+
+
+# Native async GET handlers, used in place of the APIView GETs when
+# settings.ASYNC_VIEWS is on (see core/async_views.py)
+
+@async_api_view
+@async_conditional_get('audio')
+@async_cached_response('audio')
+async def audio_list(request):
+    fields, exclude = AudioFileSerializer.fieldset_from_request(request)
+    audio_files = list_queryset(request, fields, exclude)
+    paginator = KeysetPagination('uploaded_date')
+    if paginator.is_requested(request):
+        page = await paginator.apaginate_queryset(audio_files, request)
+        return await serialized_response(request, AudioFileSerializer, page, paginator, fields = fields, exclude = exclude)
+    rows = [audio_file async for audio_file in audio_files]
+    return await serialized_response(request, AudioFileSerializer, rows, fields = fields, exclude = exclude)
+
+
+@async_api_view
+@async_conditional_get('audio')
+@async_cached_response('audio')
+async def audio_detail(request, pk):
+    audio_file = await aget_object_or_404(AudioFile, pk=pk)
+    serializer = AudioFileSerializer(audio_file)
+    return JSONResponse(serializer.data, request = request)
+
+
+@async_api_view
+async def audio_stream(request, pk):
+    audio_file = (await aget_object_or_404(AudioFile, pk=pk)).audio_file
+    if not audio_file:
+        return HttpResponse(status = status.HTTP_404_NOT_FOUND)
+    return await async_ranged_file_response(request, audio_file)
@@ -0,0 +1,168 @@
+import os
+import struct
+import subprocess
+import tempfile
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.files import File
+
+from core.storage import local_path, media_source
+
+# File layout (little endian):
+#   header: magic, version, sample_rate, level count
+#   one (samples_per_peak, peak count, byte offset) entry per level
+#   per level: int8 pairs [min0, max0, min1, max1, ...]
+MAGIC = b'PEAK'
+VERSION = 1
+HEADER = struct.Struct('<4sBxxxII')
+LEVEL = struct.Struct('<IIQ')
+
+SAMPLE_RATE = 8000
+# Finest level: 64 samples per peak, ~125 peaks per second
+BASE_SAMPLES_PER_PEAK = 64
+# Stop halving once a level is this short; it already fits any screen
+MIN_LEVEL_PEAKS = 512
+
+
+def decode_peaks(path):
+    """
+    Decode `path` to mono 16-bit PCM with ffmpeg and reduce it to min/max
+    pairs at the base resolution. PCM is consumed block by block, so memory
+    stays flat however long the recording is.
+    """
+    cmd = [
+        settings.FFMPEG_BINARY, '-v', 'error', '-i', path,
+        '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', '-',
+    ]
+    block_bytes = BASE_SAMPLES_PER_PEAK * 2 * 4096
+    blocks = []
+    leftover = b''
+    timeout = settings.AUDIO_PEAKS_TIMEOUT
+    expired = threading.Event()
+    # stderr goes to a file: a full pipe nobody reads would stall ffmpeg
+    with tempfile.TemporaryFile() as errors, \
+            subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors) as proc:
+        # stdout is read as it streams, so communicate(timeout=) can't be
+        # used; a timer kills ffmpeg instead, which ends the read loop
+        def kill():
+            expired.set()
+            proc.kill()
+
+        watchdog = threading.Timer(timeout, kill)
+        watchdog.start()
+        try:
+            while True:
+                data = proc.stdout.read(block_bytes)
+                if not data:
+                    break
+                data = leftover + data
+                usable = len(data) - len(data) % (BASE_SAMPLES_PER_PEAK * 2)
+                leftover = data[usable:]
+                if usable:
+                    blocks.append(reduce_samples(np.frombuffer(data[:usable], dtype='<i2')))
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            watchdog.cancel()
+        proc.wait()
+        errors.seek(0)
+        stderr = errors.read()
+    if expired.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout, stderr=stderr)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+
+    if leftover:
+        tail = np.frombuffer(leftover[:len(leftover) - len(leftover) % 2], dtype='<i2')
+        if tail.size:
+            padded = np.zeros(BASE_SAMPLES_PER_PEAK, dtype='<i2')
+            padded[:tail.size] = tail
+            blocks.append(reduce_samples(padded))
+    if not blocks:
+        return np.zeros((0, 2), dtype=np.int8)
+    return np.concatenate(blocks)
+
+
+def reduce_samples(samples):
+    """int16 samples -> (n, 2) int8 array of per-window [min, max]"""
+    windows = samples.reshape(-1, BASE_SAMPLES_PER_PEAK)
+    peaks = np.stack([windows.min(axis=1), windows.max(axis=1)], axis=1)
+    return (peaks >> 8).astype(np.int8)
+
+
+def build_pyramid(base):
+    """Halve the resolution level by level: min of mins, max of maxes"""
+    levels = [base]
+    while len(levels[-1]) > MIN_LEVEL_PEAKS:
+        prev = levels[-1]
+        if len(prev) % 2:
+            prev = np.concatenate([prev, prev[-1:]])
+        pairs = prev.reshape(-1, 2, 2)
+        levels.append(np.stack([pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)], axis=1))
+    return levels
+
+
+def write_peaks(levels, f):
+    f.write(HEADER.pack(MAGIC, VERSION, SAMPLE_RATE, len(levels)))
+    offset = HEADER.size + LEVEL.size * len(levels)
+    for i, level in enumerate(levels):
+        f.write(LEVEL.pack(BASE_SAMPLES_PER_PEAK << i, len(level), offset))
+        offset += level.nbytes
+    for level in levels:
+        f.write(np.ascontiguousarray(level, dtype=np.int8).tobytes())
+
+
+def read_header(f):
+    magic, version, sample_rate, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a peaks file')
+    levels = [LEVEL.unpack(f.read(LEVEL.size)) for _ in range(count)]
+    return sample_rate, levels
+
+
+def read_level(peaks_file, level, start=0, end=None):
+    """
+    Return the requested [start, end) slice of one level's peak pairs.
+    Local files are memory-mapped so only those pages are read from disk;
+    remote ones are read with a single seek.
+    """
+    with peaks_file.open('rb') as f:
+        sample_rate, levels = read_header(f)
+        if not 0 <= level < len(levels):
+            raise IndexError('No such level')
+        samples_per_peak, count, offset = levels[level]
+        end = count if end is None else max(0, min(end, count))
+        start = max(0, min(start, end))
+        path = local_path(peaks_file)
+        if count == 0:
+            data = np.zeros((0, 2), dtype=np.int8)
+        elif path:
+            peaks = np.memmap(path, dtype=np.int8, mode='r', offset=offset, shape=(count, 2))
+            data = np.array(peaks[start:end])
+        else:
+            f.seek(offset + start * 2)
+            data = np.frombuffer(f.read((end - start) * 2), dtype=np.int8).reshape(-1, 2)
+    return {
+        'sample_rate': sample_rate,
+        'levels': len(levels),
+        'level': level,
+        'samples_per_peak': samples_per_peak,
+        'length': count,
+        'start': start,
+        'data': data,
+    }
+
+
+def generate_peaks(audio):
+    """Decode `audio` once and store its peaks pyramid as <audio file>.peaks"""
+    levels = build_pyramid(decode_peaks(media_source(audio.audio_file)))
+    with tempfile.NamedTemporaryFile(suffix='.peaks', delete=False) as tmp:
+        write_peaks(levels, tmp)
+    try:
+        with open(tmp.name, 'rb') as f:
+            audio.peaks.save(f"{os.path.basename(audio.audio_file.name)}.peaks", File(f), save=False)
+    finally:
+        os.unlink(tmp.name)
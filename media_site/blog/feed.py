@@ -0,0 +1,91 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.cache import aget_version, get_version
+from .models import BlogPost
+
+FEED_KEY = 'blog:feed'
+
+
+def published_posts(now=None):
+    """
+    Posts the public can see: published_date set and already reached.
+    Both conditions are served by the partial blog_published_id_idx index,
+    so drafts are never scanned.
+    """
+    return BlogPost.objects.filter(published_date__isnull = False, published_date__lte = now or timezone.now())
+
+
+def build_feed(now=None):
+    """
+    The newest BLOG_FEED_SIZE (published_date, id) keys, read straight off
+    the index, plus when the next scheduled post is due. Cached with the
+    blog table version it was built at, and rebuilt once that moves.
+    """
+    now = now or timezone.now()
+    size = settings.BLOG_FEED_SIZE
+    keys = list(
+        published_posts(now).order_by('-published_date', '-id').values_list('published_date', 'id')[:size + 1]
+    )
+    next_publish = (
+        BlogPost.objects.filter(published_date__gt = now)
+        .order_by('published_date').values_list('published_date', flat = True).first()
+    )
+    return {
+        'keys': keys[:size],
+        # False when older posts exist beyond the cached keys
+        'complete': len(keys) <= size,
+        'next_publish': next_publish,
+    }
+
+
+def is_current(feed, version, now):
+    # Every blog write bumps the table version, whichever process made it
+    if feed['version'] != version:
+        return False
+    # A scheduled post came due without the publish job bumping it yet
+    # (e.g. the worker is behind): rebuild rather than hide it
+    return feed['next_publish'] is None or feed['next_publish'] > now
+
+
+def get_feed():
+    feed = cache.get(FEED_KEY)
+    version = get_version('blog')
+    if feed is None or not is_current(feed, version, timezone.now()):
+        feed = {**build_feed(), 'version': version}
+        cache.set(FEED_KEY, feed, settings.BLOG_FEED_TIMEOUT)
+    return feed
+
+
+async def aget_feed():
+    feed = await cache.aget(FEED_KEY)
+    version = await aget_version('blog')
+    if feed is None or not is_current(feed, version, timezone.now()):
+        feed = {**await sync_to_async(build_feed)(), 'version': version}
+        await cache.aset(FEED_KEY, feed, settings.BLOG_FEED_TIMEOUT)
+    return feed
+
+
+def in_order(posts, ids):
+    rows = {post.pk: post for post in posts.filter(pk__in = ids)}
+    return [rows[pk] for pk in ids if pk in rows]
+
+
+def feed_page(paginator, posts, request):
+    """A keyset page of `posts`, located in the cached feed when it reaches that far"""
+    feed = get_feed()
+    ids = paginator.page_from_keys(feed['keys'], feed['complete'], request)
+    if ids is None:
+        return paginator.paginate_queryset(posts, request)
+    return paginator.set_page(in_order(posts, ids))
+
+
+async def afeed_page(paginator, posts, request):
+    feed = await aget_feed()
+    ids = paginator.page_from_keys(feed['keys'], feed['complete'], request)
+    if ids is None:
+        return await paginator.apaginate_queryset(posts, request)
+    rows = {post.pk: post async for post in posts.filter(pk__in = ids)}
+    return paginator.set_page([rows[pk] for pk in ids if pk in rows])
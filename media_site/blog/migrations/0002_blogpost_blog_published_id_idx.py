@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['-published_date', '-id'], name='blog_published_id_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+def queue_existing_images(apps, schema_editor):
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    Job = apps.get_model('jobs', 'Job')
+    rows = BlogPost.objects.exclude(image='').exclude(image__isnull=True)
+    Job.objects.bulk_create(
+        Job(kind='blog.image_derivatives', object_id=pk)
+        for pk in rows.values_list('pk', flat=True).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_blogpost_blog_published_id_idx'),
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(queue_existing_images, migrations.RunPython.noop),
+    ]
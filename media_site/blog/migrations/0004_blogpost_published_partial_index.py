@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_blogpost_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='blogpost',
+            name='blog_published_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('published_date__isnull', False)), fields=['-published_date', '-id'], name='blog_published_id_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
+from jobs.queue import enqueue
 
 class BlogPost(models.Model):
     title = models.CharField(max_length = 200)
@@ -7,9 +9,42 @@ class BlogPost(models.Model):
     image = models.ImageField(upload_to='blog_images/', blank = True, null = True)
     created_date = models.DateTimeField(default = timezone.now)
     published_date = models.DateTimeField(blank = True, null = True)
+    # Resized copies of `image`, see core/images.py
+    image_derivatives = models.JSONField(default = dict, blank = True)
 
-    def publish(self):
-        self.published_date = timezone.now()
+    class Meta:
+        indexes = [
+            # Backs keyset pagination and the feed on (published_date, id).
+            # Partial, so drafts are not in it at all
+            models.Index(
+                fields=['-published_date', '-id'], name='blog_published_id_idx',
+                condition=Q(published_date__isnull=False),
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.queue_processing()
+
+    def queue_processing(self):
+        # Resize in the job worker whenever the image changes
+        if self.image and self.image_derivatives.get('source') != self.image.name:
+            enqueue('blog.image_derivatives', self.pk)
+        # A post dated in the future goes live when the job worker reaches it
+        if self.published_date and self.published_date > timezone.now():
+            enqueue('blog.publish', self.pk, run_after=self.published_date)
+
+    def get_absolute_url(self):
+        # The React page for the post, which manage.py export also prerenders
+        return f'/blog/{self.pk}/'
+
+    @property
+    def is_published(self):
+        return self.published_date is not None and self.published_date <= timezone.now()
+
+    def publish(self, at=None):
+        """Publish now, or schedule the post to appear at `at`"""
+        self.published_date = at or timezone.now()
         self.save()
 
     def __str__(self):
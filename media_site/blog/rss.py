@@ -0,0 +1,32 @@
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.utils.feedgenerator import rfc2822_date
+
+from core.rss import Feed
+from .feed import published_posts
+
+
+class BlogFeed(Feed):
+    """Published posts, newest first; scheduled posts join when they go live"""
+    namespace = 'blog'
+    date_field = 'published_date'
+    description = 'Latest blog posts'
+
+    @property
+    def title(self):
+        return f"{settings.FEED_SITE_NAME} blog"
+
+    def items(self):
+        return published_posts().only('title', 'content', 'published_date')
+
+    def item_xml(self, post, base_url):
+        # The public post page, not the JSON API
+        link = base_url + post.get_absolute_url()
+        return (
+            f'<item><title>{escape(post.title)}</title>'
+            f'<link>{escape(link)}</link>'
+            f'<guid isPermaLink="true">{escape(link)}</guid>'
+            f'<pubDate>{rfc2822_date(post.published_date)}</pubDate>'
+            f'<description>{escape(post.content)}</description></item>'
+        )
@@ -1,8 +1,57 @@
 from rest_framework import serializers
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+from core.fieldsets import SparseFieldsetMixin
+from core.images import srcset
 from .models import BlogPost
 
-class BlogPostSerializer(serializers.ModelSerializer):
+class BlogPostSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    image_srcset = serializers.SerializerMethodField()
+
+    column_dependencies = {
+        'image_srcset': ['image', 'image_derivatives'],
+    }
+
+    class Meta:
+        model = BlogPost
+        fields = ['id', 'title', 'content', 'image', 'image_srcset', 'created_date', 'published_date']
+        read_only_fields = ['id', 'created_date']
+
+    def get_image_srcset(self, obj):
+        if not obj.image:
+            return None
+        return srcset(obj.image.storage, obj.image_derivatives)
+
+
+class BlogPostSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Blog index cards: a plain-text excerpt instead of the full content.
+    The list view annotates `content_head` (the first few hundred
+    characters) and defers `content`, so the body is never fetched.
+    """
+    EXCERPT_LENGTH = 150
+    # Enough raw content to survive markup stripping and still fill an excerpt
+    EXCERPT_SOURCE_LENGTH = 1000
+
+    excerpt = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+
+    column_dependencies = {
+        'excerpt': [],
+        'image_srcset': ['image', 'image_derivatives'],
+    }
+
     class Meta:
         model = BlogPost
-        fields = ['id', 'title', 'content', 'image', 'created_date', 'published_date']
-        read_only_fields = ['id', 'created_date']
\ No newline at end of file
+        fields = ['id', 'title', 'excerpt', 'image', 'image_srcset', 'created_date', 'published_date']
+
+    def get_excerpt(self, obj):
+        content = getattr(obj, 'content_head', None)
+        if content is None:
+            content = obj.content
+        return Truncator(strip_tags(content).strip()).chars(self.EXCERPT_LENGTH)
+
+    def get_image_srcset(self, obj):
+        if not obj.image:
+            return None
+        return srcset(obj.image.storage, obj.image_derivatives)
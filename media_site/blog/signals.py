@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import bump_version, invalidate
+from core.signals import bulk_saved
+from .models import BlogPost
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_cached_responses(sender, instance, **kwargs):
+    invalidate('blog', instance.pk)
+
+
+@receiver(bulk_saved, sender=BlogPost)
+def handle_bulk_save(sender, created, updated, **kwargs):
+    # bulk_create/bulk_update skip save(), so do its follow-up work here
+    for instance in created + updated:
+        bump_version('blog', instance.pk)
+        instance.queue_processing()
+    bump_version('blog')
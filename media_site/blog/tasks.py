@@ -0,0 +1,27 @@
+from core.cache import invalidate
+from core.images import build_derivatives
+from search.index import update_entry
+from .models import BlogPost
+
+
+def generate_image_derivatives(job):
+    """Job handler for 'blog.image_derivatives'"""
+    post = BlogPost.objects.filter(pk=job.object_id).first()
+    if post is None or not post.image or post.image_derivatives.get('source') == post.image.name:
+        return
+
+    post.image_derivatives = build_derivatives(post.image)
+    post.save(update_fields=['image_derivatives'])
+
+
+def publish_scheduled(job):
+    """Job handler for 'blog.publish': runs when a scheduled post's published_date arrives"""
+    post = BlogPost.objects.filter(pk=job.object_id).first()
+    if post is None or not post.is_published:
+        # Deleted or unpublished since; a rescheduled post moved this job along
+        return
+
+    # Nothing was written at publish time, so do what a save would have;
+    # the version bump also has every process rebuild its feed
+    invalidate('blog', post.pk)
+    update_entry('blog', post)
@@ -1,3 +1,126 @@
+from datetime import timedelta
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from core.conditional import bump_table_version
+from jobs.models import Job
+from .feed import get_feed
+from .models import BlogPost
+from .tasks import publish_scheduled
+
+
+class ScheduledPublishingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+
+    def post(self, title, published_date):
+        return BlogPost.objects.create(title=title, content='c', published_date=published_date)
+
+    def feed_ids(self):
+        return [pk for _, pk in get_feed()['keys']]
+
+    def test_scheduling_queues_a_publish_job_for_the_date(self):
+        at = self.now + timedelta(hours=1)
+        post = self.post('later', at)
+        job = Job.objects.get(kind='blog.publish', object_id=post.pk)
+        self.assertEqual(job.run_after, at)
+
+        # Moving the date moves the waiting job rather than adding another
+        post.publish(at + timedelta(hours=1))
+        job.refresh_from_db()
+        self.assertEqual(job.run_after, at + timedelta(hours=1))
+        self.assertEqual(Job.objects.filter(kind='blog.publish', object_id=post.pk).count(), 1)
+
+    def test_feed_holds_published_posts_newest_first(self):
+        old = self.post('old', self.now - timedelta(days=2))
+        new = self.post('new', self.now - timedelta(days=1))
+        self.post('draft', None)
+        self.post('later', self.now + timedelta(hours=1))
+        self.assertEqual(self.feed_ids(), [new.pk, old.pk])
+        self.assertTrue(get_feed()['complete'])
+
+    def test_scheduled_post_appears_once_due(self):
+        at = self.now + timedelta(hours=1)
+        post = self.post('later', at)
+        self.assertEqual(self.feed_ids(), [])
+        self.assertEqual(get_feed()['next_publish'], at)
+
+        # Due, and the job worker hasn't run the publish job yet
+        with mock.patch.object(timezone, 'now', return_value=at + timedelta(seconds=1)):
+            self.assertEqual(self.feed_ids(), [post.pk])
+
+    def test_publish_job_shows_the_post(self):
+        post = self.post('later', self.now + timedelta(hours=1))
+        self.assertEqual(self.feed_ids(), [])
+        BlogPost.objects.filter(pk=post.pk).update(published_date=self.now - timedelta(seconds=1))
+        publish_scheduled(Job(kind='blog.publish', object_id=post.pk))
+        self.assertEqual(self.feed_ids(), [post.pk])
+
+    def test_feed_follows_writes_made_by_another_process(self):
+        post = self.post('post', self.now - timedelta(days=1))
+        self.assertEqual(self.feed_ids(), [post.pk])
+        # Another process unpublishes the post; only the table version,
+        # not this process's cache, sees the write
+        BlogPost.objects.filter(pk=post.pk).update(published_date=None)
+        bump_table_version('blog')
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_feed_marks_itself_incomplete_past_its_size(self):
+        posts = [self.post(f'post {i}', self.now - timedelta(days=i + 1)) for i in range(3)]
+        with self.settings(BLOG_FEED_SIZE=2):
+            feed = get_feed()
+        self.assertEqual([pk for _, pk in feed['keys']], [posts[0].pk, posts[1].pk])
+        self.assertFalse(feed['complete'])
+
+
+class BlogFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.post = BlogPost.objects.create(title='Fish & chips', content='<p>c</p>', published_date=now - timedelta(hours=1))
+        BlogPost.objects.create(title='draft', content='c')
+        BlogPost.objects.create(title='later', content='c', published_date=now + timedelta(hours=1))
+
+    def fetch(self, **headers):
+        response = self.client.get('/api/blog/feed/', **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_feed_is_valid_xml_with_published_posts_only(self):
+        response, body = self.fetch()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/rss+xml; charset=utf-8')
+        items = ElementTree.fromstring(body).findall('channel/item')
+        self.assertEqual([item.findtext('title') for item in items], ['Fish & chips'])
+
+    def test_links_point_at_the_post_page(self):
+        _, body = self.fetch()
+        item = ElementTree.fromstring(body).find('channel/item')
+        link = f'http://testserver/blog/{self.post.pk}/'
+        self.assertEqual(item.findtext('link'), link)
+        self.assertEqual(item.findtext('guid'), link)
+
+    def test_repeated_etag_gets_a_304(self):
+        response, _ = self.fetch()
+        again, body = self.fetch(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(body, b'')
+
+
+class CacheInvalidationTests(TestCase):
+    def test_save_drops_the_cached_list_and_detail(self):
+        cache.clear()
+        post = BlogPost.objects.create(title='Post', content='c', published_date=timezone.now() - timedelta(minutes=1))
+        detail = f'/api/blog/{post.pk}/'
+        self.assertEqual(self.client.get('/api/blog/').json()[0]['title'], 'Post')
+        self.assertEqual(self.client.get(detail).json()['title'], 'Post')
 
-# Create your tests here.
+        post.title = 'Renamed'
+        post.save()
+        self.assertEqual(self.client.get('/api/blog/').json()[0]['title'], 'Renamed')
+        self.assertEqual(self.client.get(detail).json()['title'], 'Renamed')
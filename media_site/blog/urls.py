@@ -1,7 +1,11 @@
 from django.urls import path
-from .views import BlogPostListAPIView, BlogPostDetailAPIView
+from core.async_views import with_async_get
+from .rss import BlogFeed
+from .views import BlogPostListAPIView, BlogPostDetailAPIView, BlogPostBulkAPIView, blog_list, blog_detail
 
 urlpatterns = [
-    path('', BlogPostListAPIView.as_view(), name = 'blog_list'),
-    path('<int:pk>/', BlogPostDetailAPIView.as_view(), name = 'blog_detail'),
+    path('', with_async_get(BlogPostListAPIView, blog_list), name = 'blog_list'),
+    path('<int:pk>/', with_async_get(BlogPostDetailAPIView, blog_detail), name = 'blog_detail'),
+    path('bulk/', BlogPostBulkAPIView.as_view(), name = 'blog_bulk'),
+    path('feed/', BlogFeed.as_view(), name = 'blog_feed'),
 ]
\ No newline at end of file
@@ -2,9 +2,34 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import status
-from django.shortcuts import get_object_or_404
+from django.db.models.functions import Substr
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from core.async_views import JSONResponse, async_api_view, serialized_response
+from core.bulk import BulkAPIView
+from core.cache import async_cached_response, cached_response
+from core.conditional import async_conditional_get, conditional_get
+from core.pagination import KeysetPagination
+from .feed import afeed_page, feed_page, published_posts
 from .models import BlogPost
-from .serializers import BlogPostSerializer
+from .serializers import BlogPostSerializer, BlogPostSummarySerializer
+
+def list_query(request):
+    """The serializer, fieldset and queryset for a published-posts list request"""
+    # ?view=summary swaps the full content for a short excerpt;
+    # ?fields= / ?exclude= also trim the columns fetched
+    if request.GET.get('view') == 'summary':
+        serializer_class = BlogPostSummarySerializer
+    else:
+        serializer_class = BlogPostSerializer
+    fields, exclude = serializer_class.fieldset_from_request(request)
+    columns = serializer_class.only_columns(fields, exclude)
+
+    posts = published_posts().only('published_date', *columns)
+    if 'excerpt' in serializer_class.selected_fields(fields, exclude):
+        posts = posts.annotate(content_head = Substr('content', 1, BlogPostSummarySerializer.EXCERPT_SOURCE_LENGTH))
+    posts = posts.order_by('-published_date', '-id')
+    return serializer_class, fields, exclude, posts
+
 
 class BlogPostListAPIView(APIView):
     """
@@ -15,10 +40,17 @@ class BlogPostListAPIView(APIView):
             return [AllowAny()]
         return [IsAuthenticated()]
 
+    @conditional_get('blog')
+    @cached_response('blog')
     def get(self, request):
         # Public access
-        posts = BlogPost.objects.filter(published_date__isnull = False).order_by('-published_date')
-        serializer = BlogPostSerializer(posts, many = True)
+        serializer_class, fields, exclude, posts = list_query(request)
+        paginator = KeysetPagination('published_date')
+        if paginator.is_requested(request):
+            page = feed_page(paginator, posts, request)
+            serializer = serializer_class(page, many = True, fields = fields, exclude = exclude)
+            return paginator.get_paginated_response(serializer.data)
+        serializer = serializer_class(posts, many = True, fields = fields, exclude = exclude)
         return Response(serializer.data)
     
     def post(self, request):
@@ -41,8 +73,11 @@ class BlogPostDetailAPIView(APIView):
     def get_object(self, pk):
         return get_object_or_404(BlogPost, pk=pk)
 
+    @conditional_get('blog')
+    @cached_response('blog')
     def get(self, request, pk):
-        post = self.get_object(pk)
+        # Drafts and scheduled posts are not public
+        post = get_object_or_404(published_posts(), pk=pk)
         serializer = BlogPostSerializer(post)
         return Response(serializer.data)
     
@@ -59,4 +94,37 @@ class BlogPostDetailAPIView(APIView):
         post.delete()
         return Response(status = status.HTTP_204_NO_CONTENT)
     
-    
\ No newline at end of file
+    
+
+
+class BlogPostBulkAPIView(BulkAPIView):
+    """
+    Create, update and delete many blog posts in one transaction
+    """
+    model = BlogPost
+    serializer_class = BlogPostSerializer
+
+
+# Native async GET handlers, used in place of the APIView GETs when
+# settings.ASYNC_VIEWS is on (see core/async_views.py)
+
+@async_api_view
+@async_conditional_get('blog')
+@async_cached_response('blog')
+async def blog_list(request):
+    serializer_class, fields, exclude, posts = list_query(request)
+    paginator = KeysetPagination('published_date')
+    if paginator.is_requested(request):
+        page = await afeed_page(paginator, posts, request)
+        return await serialized_response(request, serializer_class, page, paginator, fields = fields, exclude = exclude)
+    rows = [post async for post in posts]
+    return await serialized_response(request, serializer_class, rows, fields = fields, exclude = exclude)
+
+
+@async_api_view
+@async_conditional_get('blog')
+@async_cached_response('blog')
+async def blog_detail(request, pk):
+    post = await aget_object_or_404(published_posts(), pk=pk)
+    serializer = BlogPostSerializer(post)
+    return JSONResponse(serializer.data, request = request)
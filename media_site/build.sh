@@ -4,8 +4,9 @@ set -o errexit
 # Install dependencies
 pip install -r requirements.txt
 
-# Run migrations
-python manage.py migrate --noinput
+# Migrations and the SHARED_CACHE=database table are not built here: the
+# web service and the worker both run this script, so they would race.
+# The web service applies them once, in its pre-deploy step (render.yaml).
 
 # Collect static files
 python manage.py collectstatic --noinput
@@ -26,16 +26,7 @@ if os.path.exists(settings.MEDIA_ROOT):
         if len(files) > 5:
             print(f"{subindent}... and {len(files) - 5} more")
 
-# Check a specific model
-try:
-    from blog.models import BlogPost
-    print(f"\n=== Post Images in Database ===")
-    for post in BlogPost.objects.all()[:5]:  # First 5 posts
-        if post.image:
-            print(f"Post {post.id}: {post.image.name}")
-            full_path = os.path.join(settings.MEDIA_ROOT, post.image.name)
-            print(f"  Full path: {full_path}")
-            print(f"  Exists: {os.path.exists(full_path)}")
-            print(f"  URL: {post.image.url}")
-except Exception as e:
-    print(f"\nCould not check models: {e}")
\ No newline at end of file
+# Cross-check every stored file against the database (dry run)
+from django.core.management import call_command
+print("\n=== Storage consistency ===")
+call_command('scan_media')
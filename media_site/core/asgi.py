@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Served by an event loop: use the native async GET views unless told otherwise
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
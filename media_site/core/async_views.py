@@ -0,0 +1,76 @@
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+
+
+class JSONResponse(HttpResponse):
+    """
+    Data rendered exactly as DRF's JSONRenderer would, for the async
+    handlers. `data` is kept so the response cache can store it.
+    """
+    def __init__(self, data, status=200, request=None):
+        start = time.perf_counter()
+        content = JSONRenderer().render(data)
+        super().__init__(content, content_type='application/json', status=status)
+        self.data = data
+        # Report the render to MetricsMiddleware like a DRF response would
+        timing = getattr(request, '_render_timing', None)
+        if timing is not None:
+            timing[0], timing[1] = start, time.perf_counter()
+
+
+async def serialized_response(request, serializer_class, rows, paginator=None, **kwargs):
+    """
+    JSONResponse of `rows` (already fetched) through `serializer_class`.
+    Serializing and rendering a whole list is CPU work that would stall
+    every other request on the event loop, so it runs in a worker thread.
+    """
+    def render():
+        data = serializer_class(rows, many=True, **kwargs).data
+        if paginator is not None:
+            data = paginator.get_paginated_data(data)
+        return JSONResponse(data, request=request)
+    return await sync_to_async(render, thread_sensitive=False)()
+
+
+def async_api_view(view):
+    """Send the JSON errors DRF would for 404s and API exceptions"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except Http404 as exc:
+            return JSONResponse({'detail': str(exc) or 'Not found.'}, status=404, request=request)
+        except APIException as exc:
+            # Same body as DRF's exception handler
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return JSONResponse(data, status=exc.status_code, request=request)
+    return wrapper
+
+
+def with_async_get(api_view, async_get):
+    """
+    The URL view for a DRF APIView. With ASYNC_VIEWS on, GET and HEAD go
+    to the native async handler, so under ASGI a slow reader waits on the
+    event loop instead of holding a worker thread; other methods still run
+    through the DRF view in a thread. With it off this is just the APIView.
+    """
+    drf_view = api_view.as_view()
+    if not settings.ASYNC_VIEWS:
+        return drf_view
+
+    sync_view = sync_to_async(drf_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await async_get(request, *args, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+
+    # DRF does its own CSRF checks for session-authenticated writes
+    view.csrf_exempt = True
+    return view
@@ -0,0 +1,353 @@
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import quote
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.utils import timezone
+
+from audio.models import AudioFile
+from blog.feed import published_posts
+from blog.models import BlogPost
+from core.pagination import KeysetPagination
+from video.models import VideoFile
+
+# Seeded rows are recognisable by title so they can be flushed again
+SEED_PREFIX = 'bench-'
+MEDIA_PREFIX = 'bench/'
+
+WORDS = (
+    'audio video stream upload playlist podcast episode studio mix master '
+    'review guide tutorial release interview live session remix edit cut'
+).split()
+
+
+def synthetic_text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(volume, media_files=20, batch_size=5000, rng_seed=0, log=print):
+    """
+    Add `volume` blog posts, audio files and video files, all pointing at a
+    small pool of synthetic media so seeding a million rows stays cheap.
+    Rows go in with bulk_create, so no processing jobs are queued.
+    """
+    rng = random.Random(rng_seed)
+    audio_names = [
+        default_storage.save(f'{MEDIA_PREFIX}audio_{i}.mp3', ContentFile(rng.randbytes(64 * 1024)))
+        for i in range(media_files)
+    ]
+    video_names = [
+        default_storage.save(f'{MEDIA_PREFIX}video_{i}.mp4', ContentFile(rng.randbytes(256 * 1024)))
+        for i in range(media_files)
+    ]
+
+    now = timezone.now()
+    factories = [
+        (BlogPost, lambda i: BlogPost(
+            title=f'{SEED_PREFIX}{i} {synthetic_text(rng, 4)}',
+            content=synthetic_text(rng, 200),
+            published_date=now - timedelta(minutes=i),
+        )),
+        (AudioFile, lambda i: AudioFile(
+            title=f'{SEED_PREFIX}{i} {synthetic_text(rng, 4)}',
+            description=synthetic_text(rng, 30),
+            audio_file=audio_names[i % media_files],
+        )),
+        (VideoFile, lambda i: VideoFile(
+            title=f'{SEED_PREFIX}{i} {synthetic_text(rng, 4)}',
+            description=synthetic_text(rng, 30),
+            video_file=video_names[i % media_files],
+        )),
+    ]
+    for model, factory in factories:
+        for start in range(0, volume, batch_size):
+            model.objects.bulk_create([factory(i) for i in range(start, min(start + batch_size, volume))])
+        log(f"Seeded {volume} {model._meta.label} rows")
+    log("Seeded rows skip the search index; run rebuild_search_index to include them")
+
+
+def flush(batch_size=5000, log=print):
+    """Remove everything seed() created"""
+    for model in (BlogPost, AudioFile, VideoFile):
+        pks = model.objects.filter(title__startswith=SEED_PREFIX).values_list('pk', flat=True)
+        deleted = 0
+        while batch := list(pks[:batch_size]):
+            deleted += model.objects.filter(pk__in=batch).delete()[1].get(model._meta.label, 0)
+        log(f"Removed {deleted} {model._meta.label} rows")
+    try:
+        _, files = default_storage.listdir(MEDIA_PREFIX)
+    except FileNotFoundError:
+        files = []
+    for name in files:
+        default_storage.delete(f'{MEDIA_PREFIX}{name}')
+
+
+def sample_pks(model, count, rng):
+    pks = list(model.objects.order_by('pk').values_list('pk', flat=True)[:count * 10])
+    return rng.sample(pks, min(count, len(pks))) or [0]
+
+
+def middle_cursor():
+    """A keyset cursor halfway down the published blog list"""
+    posts = published_posts().order_by('-published_date', '-id')
+    post = posts[posts.count() // 2:].first()
+    return KeysetPagination('published_date').encode_cursor(post) if post else None
+
+
+def build_endpoints(rng, token, samples=200):
+    """
+    name -> function(i) returning (method, path, body, content_type, headers).
+    Requests are picked from a seeded RNG so every run replays the same ones.
+    Only writes carry the bearer token; reads go out anonymous, as the
+    public sees them.
+    """
+    blog_pks = sample_pks(BlogPost, samples, rng)
+    audio_pks = sample_pks(AudioFile, samples, rng)
+    video_pks = sample_pks(VideoFile, samples, rng)
+    cursor = middle_cursor()
+    deep_page = f'/api/blog/?page_size=10&cursor={quote(cursor)}' if cursor else '/api/blog/?page_size=10'
+    auth = {'Authorization': f'Bearer {token}'}
+    upload = encode_multipart(BOUNDARY, {
+        'title': f'{SEED_PREFIX}upload',
+        'description': 'benchmark upload',
+        'audio_file': ContentFile(rng.randbytes(256 * 1024), name='upload.mp3'),
+    })
+
+    def get(path):
+        return lambda i: ('GET', path(i), None, None, {})
+
+    return {
+        'blog.list': get(lambda i: '/api/blog/'),
+        'blog.list.deep_page': get(lambda i: deep_page),
+        'blog.list.cursor': get(lambda i: '/api/blog/?page_size=10'),
+        'blog.list.summary': get(lambda i: '/api/blog/?view=summary'),
+        'blog.detail': get(lambda i: f'/api/blog/{blog_pks[i % len(blog_pks)]}/'),
+        'audio.list': get(lambda i: '/api/audio/'),
+        'audio.detail': get(lambda i: f'/api/audio/{audio_pks[i % len(audio_pks)]}/'),
+        'audio.stream.range': lambda i: ('GET', f'/api/audio/{audio_pks[i % len(audio_pks)]}/stream/', None, None, {'Range': 'bytes=0-65535'}),
+        'video.list': get(lambda i: '/api/video/'),
+        'video.detail': get(lambda i: f'/api/video/{video_pks[i % len(video_pks)]}/'),
+        'search': get(lambda i: f'/api/search/?q={WORDS[i % len(WORDS)]}'),
+        'audio.upload': lambda i: ('POST', '/api/audio/', upload, MULTIPART_CONTENT, auth),
+    }
+
+
+class InProcessDriver:
+    """Calls the views through Django's test client: full middleware stack, no sockets"""
+    name = 'inprocess'
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def request(self, method, path, body, content_type, headers):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client(SERVER_NAME='localhost')
+        extra = {f"HTTP_{k.upper().replace('-', '_')}": v for k, v in headers.items()}
+        response = client.generic(method, path, body or b'', content_type or 'application/octet-stream', **extra)
+        if response.streaming:
+            # Iterating the response also drains async streaming bodies
+            for _ in response:
+                pass
+        response.close()
+        return response.status_code
+
+    def peak_memory(self, make_request, count=5):
+        """Peak Python allocations while serving a few requests"""
+        tracemalloc.start()
+        try:
+            for i in range(count):
+                self.request(*make_request(i))
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def close(self):
+        connection.close()
+
+
+class GunicornDriver:
+    """
+    Sends real HTTP requests to a local gunicorn started for the run, on
+    uvicorn workers like production unless `asgi` is off
+    """
+    name = 'gunicorn'
+
+    def __init__(self, workers=4, threads=1, asgi=True, port=None):
+        self.port = port or free_port()
+        if asgi:
+            app = ['core.asgi:application', '--worker-class', 'uvicorn_worker.UvicornWorker']
+        else:
+            app = ['core.wsgi:application', '--threads', str(threads)]
+        self.process = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', *app,
+                '--bind', f'127.0.0.1:{self.port}',
+                '--workers', str(workers),
+                '--log-level', 'warning',
+            ],
+            env=os.environ.copy(),
+        )
+        self.wait_until_ready()
+
+    def wait_until_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError('gunicorn did not start listening')
+
+    def request(self, method, path, body, content_type, headers):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            headers = dict(headers, Host='localhost')
+            if content_type:
+                headers['Content-Type'] = content_type
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+    def pids(self):
+        try:
+            with open(f'/proc/{self.process.pid}/task/{self.process.pid}/children') as f:
+                return [self.process.pid] + [int(pid) for pid in f.read().split()]
+        except OSError:
+            return [self.process.pid]
+
+    def reset_peak_memory(self):
+        # Writing 5 to clear_refs resets VmHWM (Linux only)
+        for pid in self.pids():
+            try:
+                with open(f'/proc/{pid}/clear_refs', 'w') as f:
+                    f.write('5')
+            except OSError:
+                pass
+
+    def peak_memory(self, make_request=None, count=0):
+        """Largest peak RSS among the gunicorn processes, in bytes"""
+        peak = 0
+        for pid in self.pids():
+            try:
+                with open(f'/proc/{pid}/status') as f:
+                    for line in f:
+                        if line.startswith('VmHWM:'):
+                            peak = max(peak, int(line.split()[1]) * 1024)
+            except OSError:
+                pass
+        return peak or None
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, round(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_endpoint(driver, make_request, requests, concurrency, warmup=5):
+    """Replay `requests` requests with `concurrency` threads and summarise them"""
+    for i in range(warmup):
+        driver.request(*make_request(i))
+    if hasattr(driver, 'reset_peak_memory'):
+        driver.reset_peak_memory()
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            status = driver.request(*make_request(i))
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status is None or status >= 400:
+                errors += 1
+
+    def worker(indexes):
+        try:
+            for i in indexes:
+                one(i)
+        finally:
+            if isinstance(driver, InProcessDriver):
+                driver.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, [range(n, requests, concurrency) for n in range(concurrency)]))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'throughput_rps': round(requests / wall, 2) if wall else None,
+        'peak_memory_bytes': driver.peak_memory(make_request),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Rows of (mode, endpoint, metric, baseline, current, change, regressed)
+    for every endpoint present in both runs. Latency regresses when it
+    grows by more than `threshold`, throughput when it drops by more.
+    """
+    rows = []
+    for mode, endpoints in results['modes'].items():
+        for name, current in endpoints.items():
+            previous = baseline.get('modes', {}).get(mode, {}).get(name)
+            if not previous:
+                continue
+            for metric, higher_is_worse in [('p50_ms', True), ('p95_ms', True), ('p99_ms', True), ('throughput_rps', False)]:
+                old, new = previous.get(metric), current.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                regressed = change > threshold if higher_is_worse else change < -threshold
+                rows.append((mode, name, metric, old, new, change, regressed))
+    return rows
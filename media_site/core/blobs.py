@@ -0,0 +1,225 @@
+import hashlib
+import os
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_save
+
+
+class HashingUploadMixin:
+    """
+    Hashes an uploaded file while it streams in, so deduplication never
+    needs a second pass over the bytes. The result is set as `file.sha256`.
+    """
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            # This handler kept the chunk
+            self.sha256.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def content_sha256(content):
+    """Hash a file that did not come through the upload handlers"""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks() if hasattr(content, 'chunks') else iter(lambda: content.read(64 * 1024), b''):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(prefix, sha256, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return f"{prefix}{sha256[:2]}/{sha256}{ext}"
+
+
+def ensure_stored(storage, name, content):
+    """Write `content` under `name` unless a complete copy is already there"""
+    if storage.exists(name):
+        # A file left behind by an interrupted save is the same content,
+        # but only reuse it if it is complete
+        if storage.size(name) == content.size:
+            return
+        storage.delete(name)
+    stored = storage.save(name, content)
+    if stored != name:
+        # Another upload of the same content got there first
+        storage.delete(stored)
+
+
+def store_blob(storage, prefix, content, filename):
+    """
+    Store `content` under its content-addressed name and return the name.
+    Identical content is written once. This takes no reference: the row
+    that will point at the file does that once it is saved (add_reference),
+    putting the file back if the last other reference went in between.
+    A blob nothing ever references is removed by manage.py scan_media.
+    """
+    from .models import MediaBlob
+
+    sha256 = getattr(content, 'sha256', None) or content_sha256(content)
+    name = blob_name(prefix, sha256, filename)
+
+    with transaction.atomic():
+        # Locked, so release() can't delete the file while it is checked
+        if MediaBlob.objects.select_for_update().filter(name=name).exists() and storage.exists(name):
+            return name
+
+    ensure_stored(storage, name, content)
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, sha256=sha256, size=content.size, ref_count=0)
+    except IntegrityError:
+        pass
+    return name
+
+
+def add_reference(storage, name, content=None):
+    """
+    Take one reference to a blob. Runs under the blob's row lock, which
+    release() holds while it deletes a file, so a blob released since
+    store_blob() is seen here and stored again from `content`.
+    """
+    from .models import MediaBlob
+
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+        if blob is not None and storage.exists(name):
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+            return
+        if content is not None and not content.closed:
+            ensure_stored(storage, name, content)
+        # Without the content, scan_media reports the row as missing its file
+        size = storage.size(name) if storage.exists(name) else 0
+        if blob is not None:
+            MediaBlob.objects.filter(pk=blob.pk).update(size=size, ref_count=F('ref_count') + 1)
+            return
+        sha256 = os.path.splitext(os.path.basename(name))[0]
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, sha256=sha256, size=size, ref_count=1)
+        except IntegrityError:
+            MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def release(storage, name):
+    """Drop one reference to a blob, deleting the file with the last one"""
+    from .models import MediaBlob
+
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+        if blob is None:
+            # Not a managed blob (stored before deduplication, or a direct upload)
+            return
+        MediaBlob.objects.filter(pk=blob.pk, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        deleted, _ = MediaBlob.objects.filter(pk=blob.pk, ref_count=0).delete()
+        if deleted:
+            # Still under the row lock: add_reference() waits for it and
+            # then finds the file gone
+            storage.delete(name)
+
+
+def commit_references(instance):
+    """
+    Apply the reference changes a row's file fields queued (see
+    ContentAddressedFieldFile) once the row's write commits. Called from
+    post_save, and by bulk writes, which send no post_save; if the write
+    fails or rolls back, no reference is taken or dropped.
+    """
+    changes = instance.__dict__.pop('_blob_changes', [])
+    for storage, added, removed, content in changes:
+        if added:
+            transaction.on_commit(lambda storage=storage, name=added, content=content: add_reference(storage, name, content))
+        if removed:
+            transaction.on_commit(lambda storage=storage, name=removed: release(storage, name))
+
+
+class ContentAddressedFieldFile(FieldFile):
+    """Saves through store_blob() and counts references once the row is saved"""
+    def queue_change(self, added, removed, content=None):
+        if added != removed:
+            # The content is kept so add_reference() can store it again
+            self.instance.__dict__.setdefault('_blob_changes', []).append((self.storage, added, removed, content))
+
+    def save(self, name, content, save=True):
+        previous = self.field.stored_name(self.instance)
+        prefix = self.field.upload_to if isinstance(self.field.upload_to, str) else ''
+        self.name = store_blob(self.storage, prefix, content, name)
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+        # Re-uploading the same bytes to a row changes nothing
+        self.queue_change(self.name, previous, content)
+        if save:
+            self.instance.save()
+
+    save.alters_data = True
+
+    def delete(self, save=True):
+        if not self:
+            return
+        if hasattr(self, '_file'):
+            self.close()
+            del self.file
+        # Other rows may share the file: drop this reference instead of deleting it
+        self.queue_change(None, self.name)
+        self.name = None
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = False
+        if save:
+            self.instance.save()
+
+    delete.alters_data = True
+
+
+class ContentAddressedFileField(models.FileField):
+    """
+    A FileField whose files are stored once per distinct content, under
+    <upload_to><first two hex digits>/<sha256><ext>, and reference counted.
+
+    Rows that upload the same bytes end up with the same file name, which
+    also lets the models reuse derived files (thumbnails, peaks, HLS) from
+    a row that already has them.
+    """
+    attr_class = ContentAddressedFieldFile
+
+    def stored_name(self, model_instance):
+        """The name currently saved in the database for this row"""
+        if model_instance.pk is None:
+            return None
+        return type(model_instance)._base_manager.filter(pk=model_instance.pk).values_list(self.attname, flat=True).first()
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            post_save.connect(self.commit_on_save, sender=cls, weak=False, dispatch_uid=f'{cls._meta.label}.{name}.blobs')
+            post_delete.connect(self.release_on_delete, sender=cls, weak=False)
+
+    def commit_on_save(self, sender, instance, **kwargs):
+        commit_references(instance)
+
+    def release_on_delete(self, sender, instance, **kwargs):
+        file = getattr(instance, self.attname)
+        if file:
+            name, storage = file.name, file.storage
+            transaction.on_commit(lambda: release(storage, name))
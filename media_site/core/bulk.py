@@ -0,0 +1,144 @@
+import json
+
+from django.conf import settings
+from django.db import models, transaction
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .blobs import commit_references
+from .signals import bulk_saved
+
+
+class BulkAPIView(APIView):
+    """
+    Apply many create/update/delete operations in one request.
+
+    The body is a list of operations:
+        {"op": "create", "data": {...}}
+        {"op": "update", "id": 1, "data": {...}}   (partial update)
+        {"op": "delete", "id": 2}
+    Multipart requests send the list as JSON in an `operations` field and
+    attach files, referenced from an operation as "files": {"<field>": "<part name>"}.
+
+    Every operation is validated first; if any fails nothing is written and
+    the response lists the errors by index. Otherwise all of them run in one
+    transaction with bulk_create, bulk_update and batched deletes.
+    """
+    permission_classes = [IsAuthenticated]
+    model = None
+    serializer_class = None
+    batch_size = 500
+
+    def post(self, request):
+        operations = request.data
+        if hasattr(request.data, 'getlist') and 'operations' in request.data:
+            try:
+                operations = json.loads(request.data['operations'])
+            except (TypeError, ValueError):
+                return Response({'detail': 'operations must be JSON.'}, status = status.HTTP_400_BAD_REQUEST)
+        if not isinstance(operations, list) or not operations:
+            return Response({'detail': 'Expected a non-empty list of operations.'}, status = status.HTTP_400_BAD_REQUEST)
+        if len(operations) > settings.BULK_MAX_OPERATIONS:
+            return Response({'detail': f'At most {settings.BULK_MAX_OPERATIONS} operations per request.'}, status = status.HTTP_400_BAD_REQUEST)
+
+        plan, errors = self.validate(operations, request.FILES)
+        if errors:
+            return Response({'errors': errors}, status = status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            created = self.apply_creates(plan['create'])
+            updated = self.apply_updates(plan['update'])
+            self.apply_deletes(plan['delete'])
+            # bulk writes send no post_save, which normally counts file references
+            for obj in created + updated:
+                commit_references(obj)
+            transaction.on_commit(lambda: bulk_saved.send(sender=self.model, created=created, updated=updated))
+
+        results = [None] * len(operations)
+        for (index, _), obj in zip(plan['create'], created):
+            results[index] = {'index': index, 'op': 'create', 'status': status.HTTP_201_CREATED, 'data': self.serializer_class(obj).data}
+        for index, obj, _ in plan['update']:
+            results[index] = {'index': index, 'op': 'update', 'status': status.HTTP_200_OK, 'data': self.serializer_class(obj).data}
+        for index, pk in plan['delete']:
+            results[index] = {'index': index, 'op': 'delete', 'status': status.HTTP_204_NO_CONTENT, 'id': pk}
+        return Response({'results': results})
+
+    def validate(self, operations, files):
+        """Check every operation in one pass, fetching all targeted rows in one query"""
+        plan = {'create': [], 'update': [], 'delete': []}
+        errors = []
+
+        ids = [op.get('id') for op in operations if isinstance(op, dict) and op.get('op') in ('update', 'delete')]
+        instances = self.model.objects.in_bulk([pk for pk in ids if isinstance(pk, int)])
+        seen = set()
+
+        for index, op in enumerate(operations):
+            if not isinstance(op, dict) or op.get('op') not in ('create', 'update', 'delete'):
+                errors.append({'index': index, 'errors': {'op': ['Must be create, update or delete.']}})
+                continue
+
+            kind = op['op']
+            if kind in ('update', 'delete'):
+                pk = op.get('id')
+                if pk not in instances:
+                    errors.append({'index': index, 'errors': {'id': ['Not found.']}})
+                    continue
+                if pk in seen:
+                    errors.append({'index': index, 'errors': {'id': ['Appears in more than one operation.']}})
+                    continue
+                seen.add(pk)
+                if kind == 'delete':
+                    plan['delete'].append((index, pk))
+                    continue
+
+            data = op.get('data') or {}
+            if not isinstance(data, dict):
+                errors.append({'index': index, 'errors': {'data': ['Must be an object.']}})
+                continue
+            data = dict(data)
+            for field, part in (op.get('files') or {}).items():
+                if part not in files:
+                    errors.append({'index': index, 'errors': {field: [f'No uploaded file named {part}.']}})
+                    break
+                data[field] = files[part]
+            else:
+                if kind == 'create':
+                    serializer = self.serializer_class(data = data)
+                else:
+                    serializer = self.serializer_class(instances[op['id']], data = data, partial = True)
+                if not serializer.is_valid():
+                    errors.append({'index': index, 'errors': serializer.errors})
+                elif kind == 'create':
+                    plan['create'].append((index, serializer.validated_data))
+                else:
+                    plan['update'].append((index, instances[op['id']], serializer.validated_data))
+        return plan, errors
+
+    def apply_creates(self, creates):
+        objs = [self.model(**validated_data) for _, validated_data in creates]
+        # bulk_create runs each field's pre_save, which stores uploaded files
+        return self.model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+    def apply_updates(self, updates):
+        if not updates:
+            return []
+        fields = set()
+        objs = []
+        for _, obj, validated_data in updates:
+            for name, value in validated_data.items():
+                setattr(obj, name, value)
+                model_field = obj._meta.get_field(name)
+                # bulk_update does not call pre_save, so store new files here
+                if isinstance(model_field, models.FileField):
+                    model_field.pre_save(obj, add=False)
+            fields.update(validated_data)
+            objs.append(obj)
+        self.model.objects.bulk_update(objs, sorted(fields), batch_size=self.batch_size)
+        return objs
+
+    def apply_deletes(self, deletes):
+        pks = [pk for _, pk in deletes]
+        for start in range(0, len(pks), self.batch_size):
+            self.model.objects.filter(pk__in=pks[start:start + self.batch_size]).delete()
@@ -0,0 +1,122 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from .async_views import JSONResponse
+from .conditional import bump_table_version, version_name
+from .models import TableVersion
+from .signals import content_changed
+
+
+def get_version(namespace, pk=None):
+    version = TableVersion.objects.filter(name=version_name(namespace, pk)).values_list('version', flat=True).first()
+    return version or 0
+
+
+async def aget_version(namespace, pk=None):
+    version = await TableVersion.objects.filter(name=version_name(namespace, pk)).values_list('version', flat=True).afirst()
+    return version or 0
+
+
+def request_version(namespace, request, pk=None):
+    """The version conditional GET already read for this request, or None"""
+    row = getattr(request, '_versions', {}).get(version_name(namespace, pk))
+    return row.version if row is not None else None
+
+
+def get_versions(namespace, pks):
+    """{pk: version} for many detail versions in one query"""
+    names = {version_name(namespace, pk): pk for pk in pks}
+    found = dict(TableVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    return {pk: found.get(name, 0) for name, pk in names.items()}
+
+
+def bump_version(namespace, pk=None):
+    """
+    Invalidate every cached response under this version by moving to the
+    next one. The counters are database rows rather than cache entries, so
+    every worker process and the job worker see the bump, and an evicted
+    entry can't bring back an old version.
+    """
+    bump_table_version(version_name(namespace, pk))
+    if pk is not None:
+        content_changed.send(sender=namespace, pk=pk)
+
+
+def invalidate(namespace, pk):
+    """Drop the cached detail response for `pk` and every cached list page"""
+    bump_version(namespace, pk)
+    bump_version(namespace)
+
+
+def make_key(namespace, request, pk=None, version=None):
+    # The Accept header picks the renderer (JSON vs browsable API)
+    accept = request.META.get('HTTP_ACCEPT', '')
+    query = hashlib.md5(f"{request.get_full_path()}|{accept}".encode()).hexdigest()
+    if version is None:
+        version = request_version(namespace, request, pk)
+    if version is None:
+        version = get_version(namespace, pk)
+    return f"resp:{namespace}:{'list' if pk is None else pk}:v{version}:{query}"
+
+
+def cached_response(namespace):
+    """
+    Cache the serialized data of an anonymous GET handler.
+
+    List responses share one version counter per namespace and detail
+    responses get one per pk; the post_save/post_delete receivers in each
+    app bump them via `invalidate()`. Every request reads its version from
+    the database, so an edit made in any process is visible on the next
+    request instead of after the TTL; under conditional_get() that is the
+    same read the ETag came from.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return method(self, request, *args, **kwargs)
+
+            key = make_key(namespace, request, kwargs.get('pk'))
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def async_cached_response(namespace):
+    """
+    cached_response() for the async GET handlers (core/async_views.py).
+    Both share cache entries. Requests carrying credentials skip the cache,
+    as authenticated ones do on the DRF side.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if 'HTTP_AUTHORIZATION' in request.META or settings.SESSION_COOKIE_NAME in request.COOKIES:
+                return await view(request, *args, **kwargs)
+
+            pk = kwargs.get('pk')
+            version = request_version(namespace, request, pk)
+            if version is None:
+                version = await aget_version(namespace, pk)
+            key = make_key(namespace, request, pk, version)
+            data = await cache.aget(key)
+            if data is not None:
+                return JSONResponse(data, request=request)
+
+            response = await view(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,108 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .db import note_write
+from .models import TableVersion
+
+
+def version_name(namespace, pk=None):
+    # Lists share the table's own row; each detail response gets a row of
+    # its own (core/cache.py)
+    return namespace if pk is None else f"{namespace}:{pk}"
+
+
+def read_versions(names):
+    """
+    {name: TableVersion} in one read-only query. A table never written has
+    no row; it reads as an unsaved version 0 with no modification date.
+    """
+    found = {row.name: row for row in TableVersion.objects.filter(name__in=names).only('name', 'version', 'updated_at')}
+    return {name: found.get(name) or TableVersion(name=name, version=0, updated_at=None) for name in names}
+
+
+async def aread_versions(names):
+    found = {row.name: row async for row in TableVersion.objects.filter(name__in=names).only('name', 'version', 'updated_at')}
+    return {name: found.get(name) or TableVersion(name=name, version=0, updated_at=None) for name in names}
+
+
+def get_table_version(name):
+    return read_versions([name])[name]
+
+
+def load_versions(request, name, pk=None):
+    """
+    Read the table's version row, plus the detail row when there is a pk,
+    and keep them on the request: the ETag uses the first, and
+    cached_response() builds its key from the matching one without
+    another query.
+    """
+    request._versions = read_versions({name, version_name(name, pk)})
+    request._table_version = request._versions[name]
+
+
+async def aload_versions(request, name, pk=None):
+    request._versions = await aread_versions({name, version_name(name, pk)})
+    request._table_version = request._versions[name]
+
+
+def bump_table_version(name):
+    updated = TableVersion.objects.filter(name=name).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        # Readers treat a missing row as version 0
+        TableVersion.objects.get_or_create(name=name, defaults={'version': 1})
+    note_write()
+
+
+def conditional_get(name):
+    """
+    Add ETag/Last-Modified to a GET handler and answer 304 when they match.
+
+    Both validators come from the table's version row, so a matching
+    If-None-Match / If-Modified-Since returns before the view runs.
+    """
+    return method_decorator(table_condition(name))
+
+
+def async_conditional_get(name):
+    """conditional_get() for async view functions"""
+    decorate = table_condition(name)
+
+    def decorator(view):
+        conditional_view = decorate(view)
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            # condition() calls the validators synchronously, so load the
+            # version rows first; get_row() then finds them on the request
+            await aload_versions(request, name, kwargs.get('pk'))
+            return await conditional_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def table_condition(name):
+    # The version rows are read once per request and shared by both
+    # callbacks and the response cache
+    def get_row(request, pk=None):
+        if not hasattr(request, '_table_version'):
+            load_versions(request, name, pk)
+        return request._table_version
+
+    def etag(request, *args, **kwargs):
+        row = get_row(request, kwargs.get('pk'))
+        # The body also varies by query string and renderer
+        accept = request.META.get('HTTP_ACCEPT', '')
+        key = f"{name}|{row.version}|{request.get_full_path()}|{accept}"
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return get_row(request, kwargs.get('pk')).updated_at
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,149 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+RECENT_WRITE_KEY = 'db:recent_write'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Set per request by ReplicaMiddleware. A context variable, like the query
+# timer in core/metrics.py, so async views' ORM threads see it too.
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to a random replica while the request allows it (see
+    ReplicaMiddleware), and everything else to default. Management
+    commands and the job worker never set it, so they only use default.
+    """
+    def db_for_read(self, model, **hints):
+        # The shared cache (SHARED_CACHE=database) must never lag
+        if model._meta.app_label == 'django_cache':
+            return None
+        if read_from_replica.get() and settings.REPLICA_DATABASES:
+            return random.choice(settings.REPLICA_DATABASES)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as default
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == 'default'
+
+
+def shared_cache():
+    # Every process and the job worker must see the same marks
+    return caches['shared']
+
+
+def writer_key(user_id):
+    return f'db:wrote:{user_id}'
+
+
+def note_write():
+    """Called on content writes: keep everyone's reads on default while replicas catch up"""
+    if settings.REPLICA_DATABASES:
+        shared_cache().set(RECENT_WRITE_KEY, True, settings.REPLICA_STICKY_SECONDS)
+
+
+def token_user_id(request):
+    """The user id in a valid JWT on the request, without loading the user"""
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else None
+    if raw is None:
+        return None
+    try:
+        return auth.get_validated_token(raw).get(jwt_settings.USER_ID_CLAIM)
+    except (InvalidToken, TokenError):
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Lets public GETs under REPLICA_READ_PATHS read from the replicas.
+
+    A user who made an authenticated write is remembered in the shared
+    cache for REPLICA_STICKY_SECONDS, and their reads stay on default in
+    the meantime, so they see their own change straight away (read-your-
+    writes). Keyed by user id rather than a cookie: the SPA calls the API
+    cross-site with a bearer token, so a cookie would never come back.
+    Works under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        use_replica = self.replica_allowed(request) and not self.on_primary(request)
+        token = read_from_replica.set(use_replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        self.note_writer(request, response)
+        return response
+
+    async def __acall__(self, request):
+        use_replica = self.replica_allowed(request) and not await self.aon_primary(request)
+        token = read_from_replica.set(use_replica)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        await self.anote_writer(request, response)
+        return response
+
+    def replica_allowed(self, request):
+        if not settings.REPLICA_DATABASES or request.method not in ('GET', 'HEAD'):
+            return False
+        return request.path_info.startswith(tuple(settings.REPLICA_READ_PATHS))
+
+    def on_primary(self, request):
+        user_id = token_user_id(request)
+        if user_id is None and settings.SESSION_COOKIE_NAME in request.COOKIES:
+            user_id = request.session.get(SESSION_KEY)
+        keys = [RECENT_WRITE_KEY] + ([writer_key(user_id)] if user_id is not None else [])
+        return bool(shared_cache().get_many(keys))
+
+    async def aon_primary(self, request):
+        user_id = token_user_id(request)
+        if user_id is None and settings.SESSION_COOKIE_NAME in request.COOKIES:
+            user_id = await request.session.aget(SESSION_KEY)
+        keys = [RECENT_WRITE_KEY] + ([writer_key(user_id)] if user_id is not None else [])
+        return bool(await shared_cache().aget_many(keys))
+
+    def writer(self, request, response):
+        """The id of the user who just wrote through this request, if any"""
+        if not settings.REPLICA_DATABASES or request.method in SAFE_METHODS or response.status_code >= 400:
+            return None
+        # DRF sets the authenticated (e.g. JWT) user on the request too
+        user = getattr(request, 'user', None)
+        return user.pk if getattr(user, 'is_authenticated', False) else None
+
+    def note_writer(self, request, response):
+        user_id = self.writer(request, response)
+        if user_id is not None:
+            shared_cache().set(writer_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+    async def anote_writer(self, request, response):
+        user_id = self.writer(request, response)
+        if user_id is not None:
+            await shared_cache().aset(writer_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
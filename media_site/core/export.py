@@ -0,0 +1,307 @@
+import io
+import json
+import os
+import re
+import shlex
+import subprocess
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIRequest
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.html import escape, json_script
+from django.views.generic import TemplateView
+
+from jobs.queue import enqueue
+from .media import ENCODINGS, accepted_variant, compress, find_file, precompressed_file_response
+from .signals import content_changed
+
+MANIFEST = '.export-manifest.json'
+INDEX_FILES = {
+    'application/json': 'index.json',
+    'application/rss+xml': 'index.xml',
+    'text/html': 'index.html',
+}
+
+
+class Section:
+    """
+    One public area of the site: the API resources and React pages built
+    from a content table, and how to find its public rows.
+    """
+    def __init__(self, namespace, rows, list_urls, detail_url, pages, detail_page=None, heading=''):
+        self.namespace = namespace
+        # Callable returning a queryset of the rows anonymous visitors can see
+        self.rows = rows
+        self.list_urls = list_urls
+        self.detail_url = detail_url
+        # React routes showing the list, and the route for one row
+        self.pages = pages
+        self.detail_page = detail_page
+        self.heading = heading
+
+    def public_pks(self):
+        return self.rows().order_by('pk').values_list('pk', flat=True)
+
+
+def sections():
+    from audio.models import AudioFile
+    from blog.feed import published_posts
+    from video.models import VideoFile
+
+    return {
+        'blog': Section(
+            'blog', published_posts, ['blog_list', 'blog_feed'], 'blog_detail',
+            pages=['/', '/blog/'], detail_page='/blog/{pk}/', heading='Blog',
+        ),
+        'audio': Section(
+            'audio', AudioFile.objects.all, ['audio_list', 'audio_feed'], 'audio_detail',
+            pages=['/audio/'], heading='Audio',
+        ),
+        'video': Section(
+            'video', VideoFile.objects.all, ['video_list'], 'video_detail',
+            pages=['/video/'], heading='Video',
+        ),
+    }
+
+
+def item_summary(namespace, data):
+    """The fields the prerendered markup shows, from an API object"""
+    return {
+        'title': data.get('title', ''),
+        'text': data.get('content') or data.get('description') or '',
+        'date': data.get('published_date') or data.get('uploaded_date'),
+        'url': f"/blog/{data['id']}/" if namespace == 'blog' else None,
+    }
+
+
+class Exporter:
+    """
+    Writes API responses and prerendered pages under STATIC_EXPORT_ROOT.
+
+    Responses come from the full middleware stack as an anonymous visitor
+    would get them: each request is a WSGIRequest built from a plain
+    environ and goes through the same handler chain the WSGI server runs. A file is only rewritten when its
+    content changed, so unchanged pages keep their mtime and ETag and CDN
+    copies stay valid.
+    """
+    def __init__(self, root=None, log=None):
+        self.root = root or settings.STATIC_EXPORT_ROOT
+        self.log = log or (lambda message: None)
+        base = urlsplit(settings.STATIC_EXPORT_BASE_URL)
+        self.environ = {
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'SERVER_NAME': base.hostname,
+            'SERVER_PORT': str(base.port or (443 if base.scheme == 'https' else 80)),
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.url_scheme': base.scheme,
+        }
+        self.handler = BaseHandler()
+        self.handler.load_middleware()
+        self.written = self.removed = 0
+
+    def fetch(self, url):
+        """(content type, body) of an anonymous GET, or None unless it is a 200"""
+        path, _, query = url.partition('?')
+        request = WSGIRequest(dict(self.environ, PATH_INFO=path, QUERY_STRING=query, **{'wsgi.input': io.BytesIO()}))
+        response = self.handler.get_response(request)
+        body = b''.join(response) if response.streaming else response.content
+        response.close()
+        if response.status_code != 200:
+            return None
+        return response['Content-Type'].split(';')[0], body
+
+    def export_section(self, section, pks):
+        self.export_lists(section)
+        for pk in pks:
+            self.export_row(section, pk)
+
+    def export_lists(self, section):
+        data = self.export_url(reverse(section.list_urls[0]))
+        for name in section.list_urls[1:]:
+            self.export_url(reverse(name))
+        for page in section.pages:
+            if data is None:
+                self.remove(page_path(page))
+                continue
+            rows = data['results'] if isinstance(data, dict) else data
+            items = [item_summary(section.namespace, item) for item in rows[:settings.STATIC_EXPORT_PAGE_ITEMS]]
+            markup = render_to_string('export/list.html', {'heading': section.heading, 'items': items})
+            self.write(page_path(page), self.page(section.heading, reverse(section.list_urls[0]), data, markup))
+
+    def export_row(self, section, pk):
+        url = reverse(section.detail_url, args=[pk])
+        data = self.export_url(url)
+        if section.detail_page is None:
+            return
+        page = section.detail_page.format(pk=pk)
+        if data is None:
+            self.remove(page_path(page))
+            return
+        item = item_summary(section.namespace, data)
+        markup = render_to_string('export/detail.html', {'item': item})
+        self.write(page_path(page), self.page(item['title'], url, data, markup))
+
+    def export_url(self, url):
+        """Export one API response; returns its parsed JSON, or None if it is gone"""
+        fetched = self.fetch(url)
+        if fetched is None:
+            for name in INDEX_FILES.values():
+                self.remove(os.path.join(url.strip('/'), name))
+            return None
+        content_type, body = fetched
+        self.write(os.path.join(url.strip('/'), INDEX_FILES.get(content_type, 'index.html')), body)
+        return json.loads(body) if content_type == 'application/json' else None
+
+    def page(self, title, data_url, data, markup):
+        """
+        The React shell with the page's API data inlined, so the first paint
+        needs no API round trip, and readable markup in place of the empty
+        root for crawlers and no-JS visitors.
+        """
+        html = render_to_string('index.html')
+        title_tag = f'<title>{escape(title)}</title>'
+        html, found = re.subn(r'<title>.*?</title>', title_tag, html, count=1, flags=re.S)
+        head = json_script({data_url: data}, 'initial-data')
+        if not found:
+            head = title_tag + head
+        html = html.replace('</head>', head + '</head>', 1) if '</head>' in html else head + html
+        html, found = re.subn(r'<div id="root">\s*</div>', lambda m: f'<div id="root">{markup}</div>', html, count=1)
+        if not found:
+            html = html.replace('</body>', markup + '</body>', 1)
+        return html.encode()
+
+    def write(self, relpath, content):
+        """Write a file plus its .br/.gz variants, unless the content is unchanged"""
+        path = os.path.join(self.root, relpath)
+        try:
+            with open(path, 'rb') as f:
+                if f.read() == content:
+                    return False
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Variants first: a current main file means its variants are current too
+        for encoding, suffix in ENCODINGS:
+            compressed = compress(encoding, content)
+            if compressed is not None and len(compressed) < len(content):
+                atomic_write(path + suffix, compressed)
+            elif os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+        atomic_write(path, content)
+        self.written += 1
+        self.log(f"  wrote {relpath}")
+        return True
+
+    def remove(self, relpath):
+        path = os.path.join(self.root, relpath)
+        if not os.path.exists(path):
+            return
+        for suffix in [''] + [suffix for _, suffix in ENCODINGS]:
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+        self.removed += 1
+        self.log(f"  removed {relpath}")
+
+    def exported_pks(self, section):
+        """Row pks with an exported detail response, from the directory names"""
+        try:
+            names = os.listdir(os.path.join(self.root, reverse(section.list_urls[0]).strip('/')))
+        except FileNotFoundError:
+            return set()
+        return {int(name) for name in names if name.isdigit()}
+
+    def read_manifest(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def write_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        atomic_write(os.path.join(self.root, MANIFEST), json.dumps(manifest).encode())
+
+    def sync(self):
+        """
+        Run STATIC_EXPORT_SYNC_COMMAND when files changed, to push the tree
+        to wherever it is served from; the catch-all route only sees it on
+        a disk shared with whoever wrote it.
+        """
+        command = settings.STATIC_EXPORT_SYNC_COMMAND
+        if not command or not (self.written or self.removed):
+            return
+        self.log(f"  syncing {self.root}")
+        subprocess.run(
+            [arg.replace('{root}', self.root) for arg in shlex.split(command)],
+            check=True, timeout=settings.STATIC_EXPORT_SYNC_TIMEOUT,
+        )
+
+
+def page_path(page):
+    return os.path.join(page.strip('/'), 'index.html')
+
+
+def atomic_write(path, content):
+    # Readers (the view below, rsync to a CDN) never see a half-written file
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+@receiver(content_changed, dispatch_uid='core.export.queue_export')
+def queue_export(sender, pk, **kwargs):
+    """Rebuild the touched row's files and its section's lists in the job worker"""
+    if not settings.STATIC_EXPORT_ROOT or sender not in ('blog', 'audio', 'video'):
+        return
+    enqueue(f'export.{sender}', pk)
+    enqueue(f'export.{sender}', 0)
+
+
+def export_job(job):
+    """Job handler for 'export.<namespace>': object_id 0 rebuilds the section's lists"""
+    section = sections()[job.kind.split('.', 1)[1]]
+    exporter = Exporter()
+    if job.object_id:
+        exporter.export_row(section, job.object_id)
+    else:
+        exporter.export_lists(section)
+    exporter.sync()
+
+
+shell_view = TemplateView.as_view(template_name='index.html')
+
+
+def prerendered_view(request):
+    """
+    The catch-all route: serve an exported file when there is one, picking
+    the .br/.gz variant the client accepts, else the empty React shell.
+    """
+    path = find_export(request.path) if request.method in ('GET', 'HEAD') else None
+    if path is None:
+        return shell_view(request)
+
+    response = precompressed_file_response(request, path, accepted_variant(request, path))
+    response['Cache-Control'] = f'public, max-age={settings.STATIC_EXPORT_MAX_AGE}'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def find_export(url_path):
+    root = settings.STATIC_EXPORT_ROOT
+    if not root:
+        return None
+    path = find_file(root, url_path.lstrip('/'))
+    if path is None and os.path.isdir(os.path.join(root, url_path.lstrip('/'))):
+        path = find_file(root, os.path.join(url_path.lstrip('/'), 'index.html'))
+    if path is None or os.path.basename(path) == MANIFEST:
+        return None
+    return path
@@ -0,0 +1,57 @@
+from rest_framework.exceptions import ValidationError
+
+from .metrics import time_representation
+
+
+class SparseFieldsetMixin:
+    """
+    Lets list endpoints honour ?fields=a,b and ?exclude=c,d.
+
+    The serializer drops fields that were not asked for, and only_columns()
+    tells the view which model columns are still needed so the queryset can
+    use .only() and never fetch the rest. Its time is reported to
+    MetricsMiddleware as serializer time.
+    """
+    # Serializer field -> model columns it reads, for fields that are not
+    # simply a column of the same name
+    column_dependencies = {}
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        exclude = kwargs.pop('exclude', None)
+        super().__init__(*args, **kwargs)
+        for name in list(self.fields):
+            if (fields is not None and name not in fields) or (exclude and name in exclude):
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        return time_representation(super().to_representation, instance)
+
+    @classmethod
+    def fieldset_from_request(cls, request):
+        """(fields, exclude) from the query string; unknown names are a 400"""
+        known = set(cls.Meta.fields)
+
+        def parse(param):
+            # request.GET works for DRF and plain (async view) requests alike
+            value = request.GET.get(param)
+            if value is None:
+                return None
+            names = {name.strip() for name in value.split(',')} - {''}
+            unknown = names - known
+            if unknown:
+                raise ValidationError({param: f"Unknown field(s): {', '.join(sorted(unknown))}."})
+            return names
+
+        return parse('fields'), parse('exclude')
+
+    @classmethod
+    def selected_fields(cls, fields=None, exclude=None):
+        return set(fields if fields is not None else cls.Meta.fields) - set(exclude or ())
+
+    @classmethod
+    def only_columns(cls, fields=None, exclude=None):
+        columns = {'id'}
+        for name in cls.selected_fields(fields, exclude):
+            columns.update(cls.column_dependencies.get(name, [name]))
+        return sorted(columns)
@@ -0,0 +1,39 @@
+import math
+
+from django.db import models
+from rest_framework.exceptions import ValidationError
+
+# Bounds of a 64-bit integer column; larger values overflow the database driver
+MAX_INTEGER = 2 ** 63 - 1
+
+
+def filter_by_params(queryset, request, ranges=(), exact=()):
+    """
+    ?min_<field>= / ?max_<field>= on the numeric columns in `ranges` and
+    ?<field>= on the columns in `exact`, e.g. ?min_duration=60&codec=aac.
+    Only pass indexed columns.
+    """
+    params = request.GET
+    for field in ranges:
+        integer = isinstance(queryset.model._meta.get_field(field), models.IntegerField)
+        for prefix, lookup, to_int in (('min_', 'gte', math.ceil), ('max_', 'lte', math.floor)):
+            value = params.get(prefix + field)
+            if value is None:
+                continue
+            try:
+                number = float(value)
+                # float() takes 'inf' and 'nan', which no column can compare with
+                if not math.isfinite(number):
+                    raise ValueError
+                if integer:
+                    # Rounded inwards, so ?min_size=10.5 doesn't match 10
+                    number = to_int(number)
+                    if abs(number) > MAX_INTEGER:
+                        raise ValueError
+            except ValueError:
+                raise ValidationError({prefix + field: 'Must be a finite number.'})
+            queryset = queryset.filter(**{f'{field}__{lookup}': number})
+    for field in exact:
+        if field in params:
+            queryset = queryset.filter(**{field: params[field]})
+    return queryset
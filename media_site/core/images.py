@@ -0,0 +1,72 @@
+import io
+
+from django.conf import settings
+from PIL import Image, ImageOps, features
+
+from .media import store_hashed
+
+# Preferred first: browsers take the first <source> type they support
+FORMATS = [
+    ('avif', 'image/avif', {'quality': 50}),
+    ('webp', 'image/webp', {'quality': 75, 'method': 4}),
+    ('jpeg', 'image/jpeg', {'quality': 80, 'optimize': True, 'progressive': True}),
+]
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt[0] == 'jpeg' or features.check(fmt[0])]
+
+
+def derivative_widths(original_width):
+    # Never upscale; the largest derivative is at most the original size
+    widths = {w for w in settings.IMAGE_DERIVATIVE_WIDTHS if w < original_width}
+    widths.add(min(original_width, max(settings.IMAGE_DERIVATIVE_WIDTHS)))
+    return sorted(widths)
+
+
+def build_derivatives(field_file):
+    """
+    Resize `field_file` to each configured width in every available format
+    and store the results under derivatives/ with content-hashed names.
+
+    Returns the JSON structure saved on the model: the source name it was
+    built from plus, per format, the stored file for each width.
+    """
+    storage = field_file.storage
+    with field_file.open('rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    sources = []
+    for fmt, mime, options in available_formats():
+        files = []
+        for width in derivative_widths(image.width):
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+            if fmt == 'jpeg' and resized.mode == 'RGBA':
+                resized = resized.convert('RGB')
+            buffer = io.BytesIO()
+            resized.save(buffer, fmt.upper(), **options)
+            name = store_hashed(storage, 'derivatives/', buffer.getvalue(), f"_{width}w.{'jpg' if fmt == 'jpeg' else fmt}")
+            files.append({'width': width, 'name': name})
+        sources.append({'format': fmt, 'type': mime, 'files': files})
+    return {'source': field_file.name, 'sources': sources}
+
+
+def srcset(storage, derivatives):
+    """
+    The stored structure as <picture> sources:
+    [{'type': 'image/avif', 'srcset': '<url> 320w, <url> 640w'}, ...]
+    """
+    if not derivatives or not derivatives.get('sources'):
+        return None
+    return [
+        {
+            'type': source['type'],
+            'srcset': ', '.join(f"{storage.url(f['name'])} {f['width']}w" for f in source['files']),
+        }
+        for source in derivatives['sources']
+    ]
@@ -0,0 +1,68 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from audio.models import AudioFile
+from core.cache import bump_version
+from core.probe import complete_metadata, try_probe
+from core.storage import media_source
+from video.models import VideoFile
+
+MODELS = {
+    'audio': (AudioFile, 'audio_file'),
+    'video': (VideoFile, 'video_file'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Probe duration, bitrate, codec, resolution and size for audio and video rows that lack them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), action='append', dest='models', help='Only this model (repeatable)')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent probes')
+        parser.add_argument('--threads', action='store_true', help='Use a thread pool instead of processes')
+        parser.add_argument('--batch-size', type=int, default=200, help='Rows probed and saved per batch')
+        parser.add_argument('--all', action='store_true', help='Probe rows that already have metadata too')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        executor = ThreadPoolExecutor(workers) if options['threads'] else ProcessPoolExecutor(workers)
+        with executor:
+            for namespace in options['models'] or sorted(MODELS):
+                self.backfill(namespace, executor, options)
+
+    def backfill(self, namespace, executor, options):
+        model, field = MODELS[namespace]
+        rows = model.objects.exclude(**{field: ''}).order_by('pk')
+        if not options['all']:
+            rows = rows.exclude(metadata_status=model.STATUS_READY)
+        rows = rows.only('pk', field, *model.METADATA_FIELDS, 'metadata_status')
+
+        done = failed = 0
+        last_pk = 0
+        while batch := list(rows.filter(pk__gt=last_pk)[:options['batch_size']]):
+            last_pk = batch[-1].pk
+            sources = [media_source(getattr(obj, field)) for obj in batch]
+            if not options['threads']:
+                # Forked workers must not inherit the parent's open DB connections
+                connections.close_all()
+
+            for obj, (metadata, error) in zip(batch, executor.map(try_probe, sources)):
+                if error:
+                    failed += 1
+                    obj.metadata_status = model.STATUS_FAILED
+                    self.stderr.write(f"{model._meta.label} {obj.pk}: {error}")
+                    continue
+                metadata = complete_metadata(metadata, getattr(obj, field))
+                for name in model.METADATA_FIELDS:
+                    setattr(obj, name, metadata.get(name))
+                obj.metadata_status = model.STATUS_READY
+                done += 1
+
+            # bulk_update skips post_save, so drop cached responses here
+            model.objects.bulk_update(batch, [*model.METADATA_FIELDS, 'metadata_status'])
+            for obj in batch:
+                bump_version(namespace, obj.pk)
+            bump_version(namespace)
+            self.stdout.write(f"{model._meta.label}: {done} probed, {failed} failed")
@@ -0,0 +1,108 @@
+import json
+import platform
+import random
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from audio.models import AudioFile
+from blog.models import BlogPost
+from core.benchmark import GunicornDriver, InProcessDriver, build_endpoints, compare, flush, run_endpoint, seed
+from video.models import VideoFile
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the API endpoints in-process and/or over a local gunicorn. Run it against a scratch database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, metavar='ROWS', help='Seed this many rows per table first (e.g. 1000, 100000, 1000000)')
+        parser.add_argument('--media-files', type=int, default=20, help='Synthetic media files shared by the seeded rows')
+        parser.add_argument('--flush', action='store_true', help='Remove previously seeded rows and files first')
+        parser.add_argument('--mode', choices=['inprocess', 'gunicorn', 'both'], default='inprocess')
+        parser.add_argument('--gunicorn-workers', type=int, default=4)
+        parser.add_argument('--gunicorn-threads', type=int, default=1, help='Threads per worker with --server wsgi')
+        parser.add_argument('--server', choices=['asgi', 'wsgi'], default='asgi', help='How gunicorn serves the app (production: asgi)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help='Only run this endpoint (repeatable)')
+        parser.add_argument('--rng-seed', type=int, default=0, help='Seed for data and request selection')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--baseline', help='Compare against a previous --output file')
+        parser.add_argument('--threshold', type=float, default=0.10, help='Relative change counted as a regression')
+
+    def handle(self, *args, **options):
+        log = self.stdout.write
+        if options['flush']:
+            flush(log=log)
+        if options['seed']:
+            seed(options['seed'], options['media_files'], rng_seed=options['rng_seed'], log=log)
+
+        user, _ = User.objects.get_or_create(username='bench', defaults={'email': 'bench@example.com'})
+        token = str(RefreshToken.for_user(user).access_token)
+
+        rng = random.Random(options['rng_seed'])
+        endpoints = build_endpoints(rng, token)
+        if options['endpoints']:
+            unknown = set(options['endpoints']) - set(endpoints)
+            if unknown:
+                raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}. Known: {', '.join(endpoints)}")
+            endpoints = {name: endpoints[name] for name in options['endpoints']}
+
+        results = {
+            'meta': {
+                'date': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'rows': self.row_counts(),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+            },
+            'modes': {},
+        }
+
+        modes = ['inprocess', 'gunicorn'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            if mode == 'inprocess':
+                driver = InProcessDriver()
+            else:
+                driver = GunicornDriver(options['gunicorn_workers'], options['gunicorn_threads'], options['server'] == 'asgi')
+            try:
+                log(f"\n{mode} ({options['requests']} requests, concurrency {options['concurrency']})")
+                log(f"  {'endpoint':<22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'peak mem':>10} {'errors':>6}")
+                results['modes'][mode] = {}
+                for name, make_request in endpoints.items():
+                    summary = run_endpoint(driver, make_request, options['requests'], options['concurrency'], options['warmup'])
+                    results['modes'][mode][name] = summary
+                    memory = f"{summary['peak_memory_bytes'] / 1024 ** 2:.1f} MB" if summary['peak_memory_bytes'] else '-'
+                    log(
+                        f"  {name:<22} {summary['p50_ms']:>9} {summary['p95_ms']:>9} {summary['p99_ms']:>9} "
+                        f"{summary['throughput_rps']:>9} {memory:>10} {summary['errors']:>6}"
+                    )
+            finally:
+                driver.close()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            log(f"\nWrote {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            rows = compare(results, baseline, options['threshold'])
+            log(f"\nCompared with {options['baseline']} (threshold {options['threshold']:.0%})")
+            for mode, name, metric, old, new, change, regressed in rows:
+                marker = 'REGRESSION' if regressed else ''
+                log(f"  {mode:<9} {name:<22} {metric:<15} {old:>10} -> {new:<10} {change:+.1%} {marker}")
+            regressions = [row for row in rows if row[-1]]
+            if regressions:
+                raise CommandError(f"{len(regressions)} metric(s) regressed beyond {options['threshold']:.0%}")
+
+    def row_counts(self):
+        return {model._meta.label: model.objects.count() for model in (BlogPost, AudioFile, VideoFile)}
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.conditional import get_table_version
+from core.export import Exporter, sections
+
+
+class Command(BaseCommand):
+    help = 'Prerender the public pages and API responses into STATIC_EXPORT_ROOT, with .gz/.br variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--section', choices=sorted(sections()), action='append', dest='sections', help='Only this section (repeatable)')
+        parser.add_argument('--force', action='store_true', help='Re-export sections whose table has not changed since the last export')
+        parser.add_argument('--output', help='Export here instead of STATIC_EXPORT_ROOT')
+
+    def handle(self, *args, **options):
+        root = options['output'] or settings.STATIC_EXPORT_ROOT
+        if not root:
+            raise CommandError('Set STATIC_EXPORT_ROOT or pass --output')
+
+        exporter = Exporter(root, log=self.stdout.write if options['verbosity'] > 1 else None)
+        manifest = exporter.read_manifest()
+        available = sections()
+        for name in options['sections'] or sorted(available):
+            section = available[name]
+            # Every write to the table bumps its version row, so an equal
+            # version means the files from the last run are still current
+            version = get_table_version(name).version
+            if not options['force'] and manifest.get(name) == version:
+                self.stdout.write(f"{name}: unchanged since the last export")
+                continue
+
+            pks = set(section.public_pks())
+            exporter.export_section(section, sorted(pks))
+            # Rows deleted or unpublished since the last run
+            for pk in sorted(exporter.exported_pks(section) - pks):
+                exporter.export_row(section, pk)
+            manifest[name] = version
+            exporter.write_manifest(manifest)
+            self.stdout.write(f"{name}: exported {len(pks)} rows")
+
+        exporter.sync()
+
+        self.stdout.write(self.style.SUCCESS(f"{exporter.written} files written, {exporter.removed} removed"))
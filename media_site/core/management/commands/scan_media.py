@@ -0,0 +1,80 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.media_scan import find_missing, find_orphan_parts, find_orphans, remove_blob
+
+
+def human_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class Command(BaseCommand):
+    help = 'Check media storage against the audio, video and blog tables: orphaned files, missing files and disk usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help='Delete orphaned files (default is a dry run)')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent deletes with --delete')
+        parser.add_argument('--batch-size', type=int, default=500, help='Files and rows checked per query')
+        parser.add_argument('--min-age', type=int, default=3600, help='Ignore files modified in the last N seconds')
+        parser.add_argument('--skip-missing', action='store_true', help='Do not check rows for missing files')
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        usage = {}
+        orphans = [0, 0]
+
+        executor = ThreadPoolExecutor(max_workers=max(1, options['workers'])) if options['delete'] else None
+        futures = []
+
+        self.stdout.write('Orphaned files:')
+        for name, size in find_orphans(storage, options['batch_size'], options['min_age'], usage):
+            orphans[0] += 1
+            orphans[1] += size
+            self.stdout.write(f"  {name} ({human_size(size)})")
+            if executor:
+                futures.append(executor.submit(remove_blob, storage, name))
+            futures = self.drain(futures, options['batch_size'])
+
+        for path, size in find_orphan_parts(options['batch_size'], options['min_age']):
+            orphans[0] += 1
+            orphans[1] += size
+            self.stdout.write(f"  {path} ({human_size(size)}, abandoned upload)")
+            if executor:
+                futures.append(executor.submit(os.unlink, path))
+            futures = self.drain(futures, options['batch_size'])
+
+        if executor:
+            self.drain(futures, 0)
+            executor.shutdown()
+        verb = 'Deleted' if options['delete'] else 'Found'
+        self.stdout.write(f"{verb} {orphans[0]} orphaned file(s), {human_size(orphans[1])}")
+
+        if not options['skip_missing']:
+            missing = 0
+            self.stdout.write('\nRows with missing files:')
+            for app, label, pk, field, name in find_missing(storage, options['batch_size']):
+                missing += 1
+                self.stdout.write(f"  {label} {pk} {field}: {name}")
+            self.stdout.write(f"Found {missing} missing file(s)")
+
+        self.stdout.write('\nDisk usage:')
+        for app, (count, size) in sorted(usage.items()):
+            self.stdout.write(f"  {app:<12} {count:>8} file(s) {human_size(size):>10}")
+
+    def drain(self, futures, limit):
+        """Wait for pending deletes once more than `limit` are queued, keeping memory bounded"""
+        if len(futures) <= limit:
+            return futures
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                self.stderr.write(f"Delete failed: {e}")
+        return []
@@ -0,0 +1,216 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .streaming import async_ranged_file_response, ranged_file_response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# Names derived from the content, which therefore never changes under them:
+# derivatives/<hash>_<width>w.webp, video_thumbnails/<hash>.jpg and the
+# blobs (core/blobs.py), <upload_to>ab/<sha256>.mp4
+HASHED_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{16,64}(?:_\d+w)?\.\w+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Worth precompressing; images, audio and video are compressed already
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/vnd.apple.mpegurl', 'application/x-mpegurl',
+    'image/svg+xml', 'text/vtt',
+}
+MIN_COMPRESS_SIZE = 256
+
+
+def compress(encoding, content):
+    if encoding == 'gzip':
+        return gzip.compress(content, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(content)
+    return None
+
+
+def is_hashed(name):
+    return HASHED_NAME_RE.search(name) is not None
+
+
+def cache_control(name):
+    """Far-future and immutable for content-hashed names, else MEDIA_CACHE_MAX_AGE"""
+    if is_hashed(name):
+        return IMMUTABLE
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def compressible(name):
+    content_type = mimetypes.guess_type(name)[0] or ''
+    return content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES
+
+
+def is_local(storage):
+    try:
+        storage.path('')
+        return True
+    except NotImplementedError:
+        return False
+
+
+def store_hashed(storage, prefix, data, suffix):
+    """
+    Store `data` as <prefix><content hash><suffix> and return the name.
+    Same content, same name: an existing file is already correct, and the
+    name can be cached forever.
+    """
+    name = f"{prefix}{hashlib.sha256(data).hexdigest()[:16]}{suffix}"
+    if not storage.exists(name):
+        storage.save(name, ContentFile(data))
+        precompress(storage, name, data)
+    return name
+
+
+def precompress(storage, name, data=None):
+    """
+    Store .br/.gz copies of `name` next to it where that makes it
+    noticeably smaller, for serve_media to pick from. Drops the copies of
+    an overwritten file first. Object storage can't negotiate encodings,
+    so only local storage gets them.
+    """
+    if not is_local(storage):
+        return
+    for _, suffix in ENCODINGS:
+        if storage.exists(name + suffix):
+            storage.delete(name + suffix)
+    if not compressible(name):
+        return
+    if data is None:
+        with storage.open(name, 'rb') as f:
+            data = f.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return
+    for encoding, suffix in ENCODINGS:
+        compressed = compress(encoding, data)
+        if compressed is not None and len(compressed) < len(data) * 0.9:
+            storage.save(name + suffix, ContentFile(compressed))
+
+
+class LocalFile(File):
+    """A file by path, shaped like a FieldFile for core/streaming.py"""
+    def __init__(self, path):
+        super().__init__(None, name=path)
+        self.path = path
+
+
+def find_file(root, name):
+    try:
+        path = safe_join(root, name)
+    except SuspiciousFileOperation:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def accepted_variant(request, path):
+    """(encoding, path) of the best precompressed copy the client accepts, or None"""
+    if request.headers.get('Range'):
+        # Ranges are of the uncompressed file
+        return None
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    return next((
+        (encoding, path + suffix) for encoding, suffix in ENCODINGS
+        if encoding in accepted and os.path.exists(path + suffix)
+    ), None)
+
+
+def accepted_encodings(header):
+    """The codings an Accept-Encoding header allows, leaving out those refused with q=0"""
+    accepted = set()
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def precompressed_file_response(request, path, variant=None):
+    """
+    Serve `path`, or its precompressed `variant` from accepted_variant()
+    with Content-Encoding, with conditional GET support.
+    """
+    stat = os.stat(path)
+    suffix = f'-{variant[0]}' if variant else ''
+    # Each encoding is a different representation, so it gets its own ETag
+    etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}{suffix}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        response = FileResponse(open(variant[1] if variant else path, 'rb'), content_type=content_type)
+        # Shown inline, not downloaded under the variant's .gz/.br name
+        del response['Content-Disposition']
+        if variant:
+            response['Content-Encoding'] = variant[0]
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
+
+
+def finish_media_response(response, name):
+    response['Cache-Control'] = cache_control(name)
+    if compressible(name):
+        patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    MEDIA_URL for local storage: precompressed copies when the client takes
+    them, ranges of everything else, and Cache-Control by name, so content-
+    hashed files are never fetched twice.
+    """
+    full_path = find_file(settings.MEDIA_ROOT, path)
+    if full_path is None:
+        raise Http404
+    variant = accepted_variant(request, full_path)
+    if variant is not None:
+        response = precompressed_file_response(request, full_path, variant)
+    else:
+        response = ranged_file_response(request, LocalFile(full_path))
+    return finish_media_response(response, path)
+
+
+@require_safe
+async def aserve_media(request, path):
+    """serve_media() for ASGI; large files stream from a worker thread"""
+    full_path = await sync_to_async(find_file, thread_sensitive=False)(settings.MEDIA_ROOT, path)
+    if full_path is None:
+        raise Http404
+    variant = accepted_variant(request, full_path)
+    if variant is not None:
+        # Only small text files have variants
+        response = await sync_to_async(precompressed_file_response, thread_sensitive=False)(request, full_path, variant)
+    else:
+        response = await async_ranged_file_response(request, LocalFile(full_path))
+    return finish_media_response(response, path)
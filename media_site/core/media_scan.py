@@ -0,0 +1,223 @@
+import os
+import time
+import uuid
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+
+from .media import ENCODINGS
+
+# (app, model, field) for every column that holds a stored file name
+FILE_REFERENCES = [
+    ('audio', 'audio.AudioFile', 'audio_file'),
+    ('audio', 'audio.AudioFile', 'peaks'),
+    ('video', 'video.VideoFile', 'video_file'),
+    ('video', 'video.VideoFile', 'thumbnail'),
+    ('blog', 'blog.BlogPost', 'image'),
+    # Direct uploads in progress: the object exists before the media row does
+    ('uploads', 'uploads.UploadSession', 'storage_key'),
+]
+
+# JSON columns written by core.images.build_derivatives
+DERIVATIVE_REFERENCES = [
+    ('blog', 'blog.BlogPost', 'image_derivatives'),
+    ('video', 'video.VideoFile', 'thumbnail_derivatives'),
+]
+
+HLS_PREFIX = 'video_hls/'
+
+# Top-level media directory -> app, for the disk usage report
+DIRECTORY_APPS = {
+    'audio_files': 'audio',
+    'video_files': 'video',
+    'video_thumbnails': 'video',
+    'video_hls': 'video',
+    'blog_images': 'blog',
+    'derivatives': 'derivatives',
+}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def app_for(name):
+    return DIRECTORY_APPS.get(name.split('/', 1)[0], 'other')
+
+
+def walk_storage(storage, path=''):
+    """
+    Yield (name, size, mtime) for every stored file, one directory at a time.
+
+    Local storage is walked with os.scandir, which gets sizes and mtimes
+    from the directory entries; other backends go through listdir().
+    """
+    root = local_path_of_storage(storage)
+    if root is not None:
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = os.scandir(os.path.join(root, current))
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    name = f"{current}/{entry.name}" if current else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(name)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        yield name, stat.st_size, stat.st_mtime
+        return
+
+    dirs, files = storage.listdir(path)
+    for filename in files:
+        name = f"{path}/{filename}" if path else filename
+        yield name, storage.size(name), storage.get_modified_time(name).timestamp()
+    for dirname in dirs:
+        yield from walk_storage(storage, f"{path}/{dirname}" if path else dirname)
+
+
+def local_path_of_storage(storage):
+    try:
+        return storage.path('')
+    except NotImplementedError:
+        return None
+
+
+def derivative_names(derivatives):
+    for source in (derivatives or {}).get('sources', []):
+        for f in source.get('files', []):
+            yield f['name']
+
+
+def referenced_names(names):
+    """The subset of a batch of stored names that some row still refers to"""
+    names = list(names)
+    # Precompressed copies (core/media.py) live as long as their file does
+    variants = {n: n[:-len(suffix)] for n in names for _, suffix in ENCODINGS if n.endswith(suffix)}
+    names = list(set(names) | set(variants.values()))
+    found = set()
+    for _, label, field in FILE_REFERENCES:
+        model = apps.get_model(label)
+        found.update(model.objects.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+
+    derivatives = [n for n in names if n.startswith('derivatives/')]
+    if derivatives:
+        for _, label, field in DERIVATIVE_REFERENCES:
+            model = apps.get_model(label)
+            matches = Q()
+            for name in derivatives:
+                matches |= Q(**{f'{field}__icontains': name})
+            for value in model.objects.filter(matches).values_list(field, flat=True):
+                found.update(set(derivative_names(value)) & set(derivatives))
+
+    # HLS segments are not in the database: a file under video_hls/<pk>/ is
+    # live while that video exists or another row reuses its playlists
+    hls_dirs = {os.path.dirname(n) for n in names if n.startswith(HLS_PREFIX)}
+    if hls_dirs:
+        VideoFile = apps.get_model('video.VideoFile')
+        VideoRendition = apps.get_model('video.VideoRendition')
+        pks = [d[len(HLS_PREFIX):] for d in hls_dirs if d[len(HLS_PREFIX):].isdigit()]
+        live = {f"{HLS_PREFIX}{pk}" for pk in VideoFile.objects.filter(pk__in=pks).values_list('pk', flat=True)}
+        playlists = Q()
+        for d in hls_dirs:
+            playlists |= Q(playlist__startswith=f"{d}/")
+        live.update(os.path.dirname(p) for p in VideoRendition.objects.filter(playlists).values_list('playlist', flat=True))
+        live.update(os.path.dirname(p) for p in VideoFile.objects.filter(hls_playlist__in=[f"{d}/master.m3u8" for d in hls_dirs]).values_list('hls_playlist', flat=True))
+        found.update(n for n in names if n.startswith(HLS_PREFIX) and os.path.dirname(n) in live)
+    found.update(variant for variant, source in variants.items() if source in found)
+    return found
+
+
+def find_orphans(storage, batch_size=500, min_age=3600, usage=None):
+    """
+    Yield (name, size) for stored files no row refers to, checking the
+    walk in batches so memory stays bounded by `batch_size`.
+
+    Files younger than `min_age` seconds are skipped: uploads and jobs
+    write the file before the row that points at it. `usage`, if given,
+    is filled with {app: [files, bytes]} for everything walked.
+    """
+    cutoff = time.time() - min_age
+    for batch in batched(walk_storage(storage), batch_size):
+        if usage is not None:
+            for name, size, _ in batch:
+                totals = usage.setdefault(app_for(name), [0, 0])
+                totals[0] += 1
+                totals[1] += size
+        candidates = [(name, size) for name, size, mtime in batch if mtime < cutoff]
+        if not candidates:
+            continue
+        live = referenced_names(name for name, _ in candidates)
+        for name, size in candidates:
+            if name not in live:
+                yield name, size
+
+
+def find_missing(storage, batch_size=500):
+    """Yield (app, label, pk, field, name) for rows whose file is not in storage"""
+    for app, label, field in FILE_REFERENCES:
+        model = apps.get_model(label)
+        rows = model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''}).order_by('pk')
+        for pk, name in rows.values_list('pk', field).iterator(chunk_size=batch_size):
+            if not storage.exists(name):
+                yield app, label, pk, field, name
+
+    for app, label, field in DERIVATIVE_REFERENCES:
+        model = apps.get_model(label)
+        for pk, value in model.objects.order_by('pk').values_list('pk', field).iterator(chunk_size=batch_size):
+            for name in derivative_names(value):
+                if not storage.exists(name):
+                    yield app, label, pk, field, name
+
+    VideoFile = apps.get_model('video.VideoFile')
+    rows = VideoFile.objects.exclude(hls_playlist='').order_by('pk')
+    for pk, name in rows.values_list('pk', 'hls_playlist').iterator(chunk_size=batch_size):
+        if not storage.exists(name):
+            yield 'video', 'video.VideoFile', pk, 'hls_playlist', name
+
+
+def find_orphan_parts(batch_size=500, min_age=3600):
+    """Yield (path, size) for chunked-upload part files with no unfinished session"""
+    UploadSession = apps.get_model('uploads.UploadSession')
+    directory = settings.CHUNKED_UPLOAD_DIR
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    cutoff = time.time() - min_age
+    with entries:
+        parts = (e for e in entries if e.is_file() and e.name.endswith('.part'))
+        for batch in batched(parts, batch_size):
+            ids = [e.name[:-len('.part')] for e in batch]
+            # A completing session is still reading its part file
+            unfinished_ids = {
+                str(pk) for pk in UploadSession.objects.filter(
+                    pk__in=[i for i in ids if is_uuid(i)],
+                    status__in=[UploadSession.OPEN, UploadSession.COMPLETING],
+                ).values_list('pk', flat=True)
+            }
+            for entry, session_id in zip(batch, ids):
+                stat = entry.stat()
+                if session_id not in unfinished_ids and stat.st_mtime < cutoff:
+                    yield entry.path, stat.st_size
+
+
+def is_uuid(value):
+    try:
+        return str(uuid.UUID(value)) == value
+    except ValueError:
+        return False
+
+
+def remove_blob(storage, name):
+    """Delete an orphaned file and any reference-count row left for it"""
+    MediaBlob = apps.get_model('core.MediaBlob')
+    MediaBlob.objects.filter(name=name).delete()
+    storage.delete(name)
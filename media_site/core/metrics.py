@@ -0,0 +1,317 @@
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """A Prometheus histogram with one series per label set"""
+    def __init__(self, name, help_text, buckets, labelnames):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labelnames = labelnames
+        self.series = {}
+
+    def observe(self, labels, value):
+        counts = self.series.get(labels)
+        if counts is None:
+            # [bucket counts..., +Inf count, sum]
+            counts = self.series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @staticmethod
+    def add(total, counts):
+        return [a + b for a, b in zip(total, counts)] if total is not None else list(counts)
+
+    def expose(self, series):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, counts in sorted(series.items()):
+            base = format_labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}'
+            yield f"{self.name}_sum{{{base}}} {counts[-1]}"
+            yield f"{self.name}_count{{{base}}} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.series = {}
+
+    def inc(self, labels, amount=1):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    @staticmethod
+    def add(total, value):
+        return (total or 0) + value
+
+    def expose(self, series):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(series.items()):
+            yield f"{self.name}{{{format_labels(self.labelnames, labels)}}} {value}"
+
+
+def format_labels(names, values):
+    return ','.join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+ROUTE_LABELS = ('route', 'method')
+
+REQUESTS = Counter('http_requests_total', 'Requests by route, method and status.', ROUTE_LABELS + ('status',))
+LATENCY = Histogram('http_request_duration_seconds', 'Time from the first middleware to the response.', LATENCY_BUCKETS, ROUTE_LABELS)
+DB_QUERIES = Histogram('http_db_queries', 'Database queries per request.', QUERY_COUNT_BUCKETS, ROUTE_LABELS)
+DB_TIME = Histogram('http_db_duration_seconds', 'Time spent in database queries per request.', LATENCY_BUCKETS, ROUTE_LABELS)
+SERIALIZE_TIME = Histogram(
+    'http_serialize_duration_seconds',
+    'Time spent in serializers turning rows into response data, queries excluded.',
+    LATENCY_BUCKETS, ROUTE_LABELS,
+)
+RENDER_TIME = Histogram(
+    'http_json_render_duration_seconds',
+    'Time spent rendering the response data to JSON; serializers run earlier, in the view.',
+    LATENCY_BUCKETS, ROUTE_LABELS,
+)
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size.', SIZE_BUCKETS, ROUTE_LABELS)
+
+METRICS = [REQUESTS, LATENCY, DB_QUERIES, DB_TIME, SERIALIZE_TIME, RENDER_TIME, RESPONSE_SIZE]
+
+# Observations are a few dict operations; one lock keeps them consistent
+# across the worker's threads
+_lock = threading.Lock()
+_last_write = 0.0
+
+
+def write_snapshot():
+    """
+    Save this process's series to METRICS_DIR/<pid>.json, where /metrics
+    sums every worker's file. Files of exited workers stay, so counters
+    never go backwards; the directory should start empty on each deploy.
+    """
+    global _last_write
+    directory = settings.METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    with _lock:
+        data = json.dumps({
+            metric.name: [[list(labels), value] for labels, value in metric.series.items()] for metric in METRICS
+        })
+        _last_write = time.monotonic()
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    # Written whole then renamed, so a scrape never reads half a file
+    with open(f'{path}.tmp', 'w') as f:
+        f.write(data)
+    os.replace(f'{path}.tmp', path)
+
+
+def collect():
+    """{metric name: series}, summed over all workers when METRICS_DIR is set"""
+    if not settings.METRICS_DIR:
+        with _lock:
+            return {metric.name: dict(metric.series) for metric in METRICS}
+    write_snapshot()
+    merged = {metric.name: {} for metric in METRICS}
+    add = {metric.name: metric.add for metric in METRICS}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, items in data.items():
+            if name not in merged:
+                # Written by an older release under another name
+                continue
+            series = merged[name]
+            for labels, value in items:
+                labels = tuple(labels)
+                series[labels] = add[name](series.get(labels), value)
+    return merged
+
+
+class QueryTimer:
+    """Query count and time for the current request"""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# Set per request. A context variable rather than a wrapper on the
+# request thread's connection: async views run their queries on other
+# threads, which still see the request's context.
+current_queries = ContextVar('current_queries', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    queries = current_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.duration += time.perf_counter() - start
+        queries.count += 1
+
+
+class SerializerTimer:
+    """Time spent in serializers for the current request"""
+    def __init__(self):
+        self.duration = 0.0
+        self.depth = 0
+
+
+current_serializers = ContextVar('current_serializers', default=None)
+
+
+def time_representation(to_representation, instance):
+    """
+    to_representation(instance), adding its time to the request's
+    serializer timer. Only the outermost call is timed, so nested
+    serializers are not counted twice; a list is timed row by row, which
+    leaves out the query that fetches it.
+    """
+    timer = current_serializers.get()
+    if timer is None or timer.depth:
+        return to_representation(instance)
+    timer.depth += 1
+    start = time.perf_counter()
+    try:
+        return to_representation(instance)
+    finally:
+        timer.duration += time.perf_counter() - start
+        timer.depth -= 1
+
+
+@receiver(connection_created, dispatch_uid='core.metrics.time_query')
+def install_query_timer(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class MetricsMiddleware:
+    """
+    Records per-route latency, DB query count and time, serializer time,
+    JSON render time and response size, and adds a Server-Timing header so the breakdown shows
+    up in the browser's network panel.
+
+    Put it first in MIDDLEWARE so the latency covers the whole stack.
+    Metrics live in the worker process; with METRICS_DIR set each worker
+    saves them there every METRICS_WRITE_INTERVAL seconds, and /metrics
+    reports the sum over all workers. Works under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start, timers, tokens = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.reset(tokens)
+        return self.finish(request, response, start, *timers)
+
+    async def __acall__(self, request):
+        start, timers, tokens = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.reset(tokens)
+        return self.finish(request, response, start, *timers)
+
+    def start(self, request):
+        request._render_timing = [None, None]
+        queries, serializers = QueryTimer(), SerializerTimer()
+        tokens = current_queries.set(queries), current_serializers.set(serializers)
+        return time.perf_counter(), (queries, serializers), tokens
+
+    def reset(self, tokens):
+        current_queries.reset(tokens[0])
+        current_serializers.reset(tokens[1])
+
+    def finish(self, request, response, start, queries, serializers):
+        total = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unmatched'
+        labels = (route, request.method)
+        render_start, render_end = request._render_timing
+        render = render_end - render_start if render_end is not None else 0.0
+        size = None if response.streaming else len(response.content)
+        if size is None and response.has_header('Content-Length'):
+            size = int(response['Content-Length'])
+
+        with _lock:
+            REQUESTS.inc(labels + (response.status_code,))
+            LATENCY.observe(labels, total)
+            DB_QUERIES.observe(labels, queries.count)
+            DB_TIME.observe(labels, queries.duration)
+            SERIALIZE_TIME.observe(labels, serializers.duration)
+            RENDER_TIME.observe(labels, render)
+            if size is not None:
+                RESPONSE_SIZE.observe(labels, size)
+        if settings.METRICS_DIR and time.monotonic() - _last_write > settings.METRICS_WRITE_INTERVAL:
+            write_snapshot()
+
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries"',
+                f'serialize;dur={serializers.duration * 1000:.1f};desc="Serializers"',
+                f'render;dur={render * 1000:.1f};desc="JSON render"',
+                f'total;dur={total * 1000:.1f}',
+            ])
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time it from here
+        timing = request._render_timing
+        timing[0] = time.perf_counter()
+
+        def rendered(response):
+            timing[1] = time.perf_counter()
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus text exposition; without METRICS_TOKEN only served with DEBUG on"""
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        return HttpResponseForbidden()
+    if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    series = collect()
+    lines = [line for metric in METRICS for line in metric.expose(series[metric.name])]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,30 @@
+from django.db import models
+
+class TableVersion(models.Model):
+    """
+    A counter bumped on every write to a content table.
+
+    Conditional GET builds ETag and Last-Modified from this single row, so a
+    304 can be answered without touching (or serializing) the table itself.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class MediaBlob(models.Model):
+    """
+    One stored file shared by every row that uploaded the same content,
+    see core/blobs.py. The file is deleted when the last reference goes.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
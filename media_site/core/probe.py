@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .storage import media_source
+
+# Give up on a file ffprobe can't make sense of (or a URL that hangs)
+PROBE_TIMEOUT = 120
+
+
+def ffprobe(source):
+    """
+    Technical metadata of `source` (a path or URL) from ffprobe's JSON
+    output. Only the container header is read, not the media itself.
+    Raises on failure so the job can be retried.
+    """
+    cmd = [
+        settings.FFPROBE_BINARY, '-v', 'error', '-print_format', 'json',
+        '-show_format', '-show_streams', source,
+    ]
+    result = subprocess.run(cmd, check=True, capture_output=True, timeout=PROBE_TIMEOUT)
+    return parse_ffprobe(json.loads(result.stdout))
+
+
+def parse_ffprobe(data):
+    fmt = data.get('format', {})
+    streams = data.get('streams', [])
+    # Cover art in an audio file shows up as a one-frame video stream
+    video = next((
+        s for s in streams
+        if s.get('codec_type') == 'video' and not s.get('disposition', {}).get('attached_pic')
+    ), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    main = video or audio or {}
+    return {
+        'duration': to_number(fmt.get('duration') or main.get('duration'), float),
+        'bitrate': to_number(fmt.get('bit_rate') or main.get('bit_rate'), int),
+        'codec': (main.get('codec_name') or '')[:32],
+        'width': to_number(video.get('width'), int) if video else None,
+        'height': to_number(video.get('height'), int) if video else None,
+        'file_size': to_number(fmt.get('size'), int),
+    }
+
+
+def to_number(value, kind):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def stat_probe(source):
+    """
+    Stand-in for ffprobe in development and tests: only the file size, from
+    the filesystem. Select it with MEDIA_PROBE=core.probe.stat_probe.
+    """
+    size = os.path.getsize(source) if os.path.exists(source) else None
+    return {'duration': None, 'bitrate': None, 'codec': '', 'width': None, 'height': None, 'file_size': size}
+
+
+def probe(source):
+    return import_string(settings.MEDIA_PROBE)(source)
+
+
+def try_probe(source):
+    """(metadata, None) or (None, error): one bad file must not stop a backfill. Runs in pool workers."""
+    try:
+        return probe(source), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def read_metadata(field_file):
+    """Probe a stored file; ffprobe reads remote files through a (presigned) URL"""
+    return complete_metadata(probe(media_source(field_file)), field_file)
+
+
+def complete_metadata(metadata, field_file):
+    # The storage knows the size even when the probe doesn't
+    if metadata.get('file_size') is None:
+        try:
+            metadata['file_size'] = field_file.size
+        except (OSError, NotImplementedError):
+            pass
+    return metadata
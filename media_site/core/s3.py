@@ -0,0 +1,14 @@
+from storages.backends.s3 import S3Storage
+
+from .media import cache_control
+
+
+class MediaS3Storage(S3Storage):
+    """
+    S3Storage that stores each object with its Cache-Control (core/media.py),
+    so the bucket or CDN tells browsers to keep content-hashed files forever.
+    """
+    def get_object_parameters(self, name):
+        params = super().get_object_parameters(name)
+        params.setdefault('CacheControl', cache_control(name))
+        return params
@@ -21,21 +21,60 @@ DEBUG = 'True'
 ALLOWED_HOSTS = ['cms-xosi.onrender.com', 'localhost', '127.0.0.1']
 
 # Database
-DATABASES = {
-    'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL'),
-        conn_max_age=600,
-        ssl_require=True
+# DB_POOL_MAX_SIZE > 0 turns on psycopg's connection pool (Postgres only):
+# each worker process keeps up to that many open TLS connections and hands
+# them to requests and async-view threads, instead of connecting per thread.
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+# Seconds a request waits for a free pooled connection before failing
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))
+
+
+def database_config(url):
+    config = dj_database_url.parse(
+        url,
+        # Set CONN_MAX_AGE=0 under ASGI: async views run queries on short-lived
+        # threads, which would each keep their own persistent connection
+        conn_max_age=int(os.getenv('CONN_MAX_AGE', 600)),
+        ssl_require=True,
     )
-}
+    if DB_POOL_MAX_SIZE and config['ENGINE'] == 'django.db.backends.postgresql':
+        # The pool replaces persistent connections; Django requires 0 here
+        config['CONN_MAX_AGE'] = 0
+        config.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    return config
 
-# If no database URL, use sqlite3 for development
-if not DATABASES['default']:
-    DATABASES['default'] = {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+
+if os.environ.get('DATABASE_URL'):
+    DATABASES = {'default': database_config(os.environ['DATABASE_URL'])}
+else:
+    # If no database URL, use sqlite3 for development
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
     }
 
+# Read replicas, comma separated. Public GETs under REPLICA_READ_PATHS read
+# from them (core/db.py); everything else, and every write, uses default.
+REPLICA_DATABASES = []
+for i, url in enumerate(u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()):
+    alias = f'replica_{i}'
+    DATABASES[alias] = database_config(url)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    REPLICA_DATABASES.append(alias)
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+REPLICA_READ_PATHS = ['/api/blog/', '/api/audio/', '/api/video/']
+# Replication lag to allow for: after a write, reads go to default for this
+# long, for everyone (so shared caches aren't filled from a stale replica)
+# and for the user who wrote. Both marks live in the 'shared' cache.
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -43,11 +82,130 @@ STATICFILES_DIRS = []
 if REACT_BUILD_DIR.exists():
     STATICFILES_DIRS.append(REACT_BUILD_DIR / 'static')
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Media storage. MEDIA_STORAGE=s3 keeps uploads in an S3-compatible bucket
+# (AWS, MinIO, R2, ...) and lets clients move bytes with presigned URLs
+# instead of through gunicorn. Point AWS_S3_ENDPOINT_URL at a local MinIO
+# to try it out. HLS playlists refer to segments by relative URL, so serve
+# them from a public bucket or CDN (AWS_QUERYSTRING_AUTH=False).
+MEDIA_STORAGE = os.getenv('MEDIA_STORAGE', 'local')
+PRESIGNED_URL_EXPIRY = int(os.getenv('PRESIGNED_URL_EXPIRY', 3600))
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+if MEDIA_STORAGE == 's3':
+    STORAGES['default'] = {
+        # S3Storage plus per-object Cache-Control (core/media.py)
+        'BACKEND': 'core.s3.MediaS3Storage',
+        'OPTIONS': {
+            'bucket_name': os.getenv('AWS_STORAGE_BUCKET_NAME'),
+            'endpoint_url': os.getenv('AWS_S3_ENDPOINT_URL'),
+            'region_name': os.getenv('AWS_S3_REGION_NAME'),
+            'access_key': os.getenv('AWS_ACCESS_KEY_ID'),
+            'secret_key': os.getenv('AWS_SECRET_ACCESS_KEY'),
+            'custom_domain': os.getenv('AWS_S3_CUSTOM_DOMAIN'),
+            'querystring_auth': os.getenv('AWS_QUERYSTRING_AUTH', 'True') == 'True',
+            'querystring_expire': PRESIGNED_URL_EXPIRY,
+            'file_overwrite': False,
+        },
+    }
+
+# Cache backing the public GET response cache (core/cache.py).
+# Invalidation goes through version rows in the database, so a per-process
+# locmem cache is correct, just filled once per worker; CACHE_BACKEND=file
+# shares the entries between workers on the same host.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1000))
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+
+# Small coordination state every process must agree on, such as which
+# users just wrote (core/db.py). SHARED_CACHE=database keeps it in a table
+# (created by manage.py createcachetable); the per-process default only
+# suits a single process.
+if os.getenv('SHARED_CACHE', 'locmem') == 'database':
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'shared_cache',
+    }
+else:
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    }
+
+# Seconds a cached GET response lives before it is rebuilt
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Cached published-post feed (blog/feed.py): how many of the newest posts
+# it holds, and how long before it is rebuilt from the index anyway
+BLOG_FEED_SIZE = int(os.getenv('BLOG_FEED_SIZE', 500))
+BLOG_FEED_TIMEOUT = int(os.getenv('BLOG_FEED_TIMEOUT', 3600))
+
+# RSS and podcast feeds (core/rss.py): the channel title prefix and how
+# long a rendered <item> is kept before being rendered again anyway
+FEED_SITE_NAME = os.getenv('FEED_SITE_NAME', 'Media Site')
+FEED_ITEM_CACHE_TIMEOUT = int(os.getenv('FEED_ITEM_CACHE_TIMEOUT', 86400))
+
+# Static export (core/export.py, manage.py export): prerendered pages and API
+# JSON with .gz/.br variants, served by the catch-all route or a CDN. When
+# set, every content change queues a job rebuilding just the touched files.
+# The job worker writes the tree, so the catch-all route only serves it when
+# the web service shares that disk. Where it doesn't (separate instances, as
+# on Render), set STATIC_EXPORT_SYNC_COMMAND on the worker to push the tree
+# to the CDN after each export; the web service's directory stays empty and
+# its catch-all falls back to the React shell. {root} is replaced by the
+# export directory, e.g.  aws s3 sync {root} s3://bucket/site --exclude "*.tmp"
+STATIC_EXPORT_ROOT = os.getenv('STATIC_EXPORT_ROOT', '')
+STATIC_EXPORT_SYNC_COMMAND = os.getenv('STATIC_EXPORT_SYNC_COMMAND', '')
+STATIC_EXPORT_SYNC_TIMEOUT = int(os.getenv('STATIC_EXPORT_SYNC_TIMEOUT', 600))
+# Host and scheme the pages are rendered for (absolute URLs in feeds)
+STATIC_EXPORT_BASE_URL = os.getenv('STATIC_EXPORT_BASE_URL', f'https://{ALLOWED_HOSTS[0]}')
+# Items shown in a prerendered list page's markup; its inline data has all
+STATIC_EXPORT_PAGE_ITEMS = int(os.getenv('STATIC_EXPORT_PAGE_ITEMS', 50))
+STATIC_EXPORT_MAX_AGE = int(os.getenv('STATIC_EXPORT_MAX_AGE', 60))
 
 # Media files
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Cache lifetime of media whose name isn't derived from its content (uploaded
+# originals, HLS playlists); content-hashed ones are cached as immutable
+MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', 3600))
+
+# Hash uploads as they stream in; audio and video files are stored once per
+# distinct content (core/blobs.py)
+FILE_UPLOAD_HANDLERS = [
+    'core.blobs.HashingMemoryFileUploadHandler',
+    'core.blobs.HashingTemporaryFileUploadHandler',
+]
+
+# Chunked uploads (/api/uploads/). Part files must live on the same
+# filesystem as MEDIA_ROOT so finishing an upload is a rename, not a copy.
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', os.path.join(BASE_DIR, 'chunked_uploads'))
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.getenv('CHUNKED_UPLOAD_CHUNK_SIZE', 16 * 1024 * 1024))
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv('CHUNKED_UPLOAD_MAX_SIZE', 10 * 1024 ** 3))
+# Seconds an open upload may go without a chunk before it is deleted, and
+# how often starting an upload checks for such sessions (uploads/expiry.py)
+CHUNKED_UPLOAD_EXPIRY = int(os.getenv('CHUNKED_UPLOAD_EXPIRY', 24 * 3600))
+CHUNKED_UPLOAD_SWEEP_INTERVAL = int(os.getenv('CHUNKED_UPLOAD_SWEEP_INTERVAL', 3600))
 
 
 # Application definition
@@ -61,19 +219,25 @@ INSTALLED_APPS = [
     'corsheaders',
     'rest_framework',
     'rest_framework_simplejwt',
+    'core',
     'blog',
     'audio', 
     'video',
+    'jobs',
+    'uploads',
+    'search',
 ]
 
 MIDDLEWARE = [
-    'corsheaders.middleware.CorsMiddleware',  # Must be first
+    'core.metrics.MetricsMiddleware',  # Outermost, so timings cover every other middleware
+    'corsheaders.middleware.CorsMiddleware',  # Must come before anything that returns a response
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # For static files
+    'core.middleware.AsyncWhiteNoiseMiddleware',  # For static files; WhiteNoise, ASGI-capable
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db.ReplicaMiddleware',  # Picks the database for the request's reads
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -143,6 +307,71 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10
 }
 
+# ffmpeg used for thumbnails and transcoding; point at a stand-in script to test locally
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = os.getenv('FFPROBE_BINARY', 'ffprobe')
+# Metadata extractor for audio and video (core/probe.py); core.probe.stat_probe
+# is a stand-in that needs no ffprobe and only fills in the file size
+MEDIA_PROBE = os.getenv('MEDIA_PROBE', 'core.probe.ffprobe')
+# Seconds ffmpeg may spend decoding one audio file for its peaks before it
+# is killed (audio/waveform.py)
+AUDIO_PEAKS_TIMEOUT = int(os.getenv('AUDIO_PEAKS_TIMEOUT', 1800))
+
+# HLS ladder for VideoFile: (height, video kbit/s, audio kbit/s)
+VIDEO_HLS_RENDITIONS = [
+    (360, 800, 96),
+    (720, 2800, 128),
+    (1080, 5000, 192),
+]
+VIDEO_HLS_SEGMENT_SECONDS = 6
+# Seconds one rendition's ffmpeg run may take before it is killed
+VIDEO_HLS_TIMEOUT = int(os.getenv('VIDEO_HLS_TIMEOUT', 2 * 3600))
+
+# Video thumbnails (video/thumbnails.py): the width in px, where to start
+# looking as a fraction of the duration, and how many frames ffmpeg's
+# thumbnail filter compares to pick the most representative one. Changing
+# any of these marks existing thumbnails outdated for regenerate_thumbnails.
+VIDEO_THUMBNAIL_WIDTH = int(os.getenv('VIDEO_THUMBNAIL_WIDTH', 320))
+VIDEO_THUMBNAIL_SEEK = float(os.getenv('VIDEO_THUMBNAIL_SEEK', 0.1))
+VIDEO_THUMBNAIL_FRAMES = int(os.getenv('VIDEO_THUMBNAIL_FRAMES', 100))
+
+# Widths (px) of the resized copies made for blog images and video thumbnails
+IMAGE_DERIVATIVE_WIDTHS = [320, 640, 1024, 1600]
+
+# Serve GETs on the blog, audio and video list/detail/stream URLs from native
+# async views (core/async_views.py). Only worth it under ASGI, e.g.
+# gunicorn core.asgi:application -k uvicorn_worker.UvicornWorker, so
+# core/asgi.py turns it on; under WSGI async views run one event loop per
+# request and streamed bodies are buffered whole.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
+# Request metrics (core/metrics.py): Prometheus text at /metrics, guarded by
+# the bearer token METRICS_TOKEN (without one it is only served with DEBUG
+# on), plus Server-Timing headers. With METRICS_DIR set, workers save their
+# series there and /metrics sums them; it should be emptied on each deploy.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_WRITE_INTERVAL = float(os.getenv('METRICS_WRITE_INTERVAL', 5))
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'True') == 'True'
+
+# Largest operation list accepted by the bulk endpoints (/api/<app>/bulk/)
+BULK_MAX_OPERATIONS = 1000
+
+# Background jobs: kind -> handler, run by `python manage.py run_jobs`
+JOB_HANDLERS = {
+    'video.thumbnail': 'video.tasks.generate_thumbnail',
+    'video.hls': 'video.tasks.generate_hls',
+    'video.thumbnail_derivatives': 'video.tasks.generate_thumbnail_derivatives',
+    'audio.peaks': 'audio.tasks.generate_peaks',
+    'audio.metadata': 'audio.tasks.extract_metadata',
+    'video.metadata': 'video.tasks.extract_metadata',
+    'blog.image_derivatives': 'blog.tasks.generate_image_derivatives',
+    'blog.publish': 'blog.tasks.publish_scheduled',
+    'export.blog': 'core.export.export_job',
+    'export.audio': 'core.export.export_job',
+    'export.video': 'core.export.export_job',
+}
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+# Sent after a bulk create/update (core/bulk.py), which bypasses post_save.
+# Arguments: sender (the model), created (list of instances), updated (list of instances)
+bulk_saved = Signal()
+
+# Sent whenever one row's cached responses are invalidated (core/cache.py),
+# including queryset updates that skip post_save.
+# Arguments: sender (the cache namespace, e.g. 'blog'), pk
+content_changed = Signal()
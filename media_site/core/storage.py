@@ -0,0 +1,44 @@
+import uuid
+
+from django.conf import settings
+from django.utils.text import get_valid_filename
+
+
+def local_path(field_file):
+    """Filesystem path of a stored file, or None when the storage is remote"""
+    try:
+        return field_file.path
+    except NotImplementedError:
+        return None
+
+
+def media_source(field_file):
+    """
+    Something ffmpeg can open: the local path, or a (presigned) URL when the
+    file lives in object storage, so workers never download it first.
+    """
+    return local_path(field_file) or field_file.url
+
+
+def supports_presigned_upload(storage):
+    return hasattr(storage, 'bucket_name') and hasattr(storage, 'connection')
+
+
+def direct_upload_key(upload_to, filename):
+    # A fresh prefix per upload: the client writes to the key directly, so
+    # the storage never gets the chance to pick a non-colliding name itself
+    return f"{upload_to}{uuid.uuid4().hex}/{get_valid_filename(filename)}"
+
+
+def presigned_upload_url(storage, name, content_type):
+    """A URL the client can PUT the file to, straight into the bucket"""
+    client = storage.connection.meta.client
+    return client.generate_presigned_url(
+        'put_object',
+        Params={
+            'Bucket': storage.bucket_name,
+            'Key': storage._normalize_name(name),
+            'ContentType': content_type,
+        },
+        ExpiresIn=settings.PRESIGNED_URL_EXPIRY,
+    )
@@ -0,0 +1,203 @@
+import mimetypes
+import os
+import re
+
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .storage import local_path
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+class RangeFileWrapper:
+    """
+    A file positioned at `start` that stops reading after `length` bytes.
+
+    It keeps fileno() so gunicorn can still sendfile() the range straight
+    from the page cache; other servers fall back to bounded read() calls.
+    """
+    def __init__(self, filelike, start, length):
+        self.filelike = filelike
+        self.name = getattr(filelike, 'name', '')
+        self.remaining = length
+        filelike.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.filelike.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.filelike.fileno()
+
+    def tell(self):
+        return self.filelike.tell()
+
+    def close(self):
+        self.filelike.close()
+
+
+def parse_range(header, size):
+    """Return (start, end) for a single-range header, None to ignore it, or 'invalid'"""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multi-range and non-byte units: ignoring Range and sending 200 is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return 'invalid'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return 'invalid'
+    return start, min(end, size - 1)
+
+
+def ranged_file_response(request, field_file):
+    """
+    Stream a FileField's file with Range, If-Range and conditional GET support.
+
+    Files are never read into memory: full responses and ranges are both
+    served from the open file handle in fixed-size blocks (or sendfile).
+    """
+    prepared = prepare_file_response(request, field_file)
+    if isinstance(prepared, HttpResponse):
+        return prepared
+    filelike, byte_range, size, content_type = prepared[:4]
+
+    if byte_range is None:
+        response = FileResponse(filelike, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(RangeFileWrapper(filelike, start, end - start + 1), content_type=content_type, status=206)
+    return finish_file_response(response, *prepared[1:])
+
+
+async def async_ranged_file_response(request, field_file):
+    """
+    ranged_file_response() for async views. The body is an async iterator
+    reading blocks in a worker thread, so a slow client only holds an
+    open file and a coroutine, not a thread. (Django's ASGI handler would
+    buffer a sync FileResponse completely in memory.)
+    """
+    prepared = await sync_to_async(prepare_file_response, thread_sensitive=False)(request, field_file)
+    if isinstance(prepared, HttpResponse):
+        return prepared
+    filelike, byte_range, size, content_type = prepared[:4]
+
+    start, end = byte_range if byte_range is not None else (0, size - 1)
+    response = StreamingHttpResponse(
+        aiter_file(filelike, start, end - start + 1),
+        content_type=content_type,
+        status=200 if byte_range is None else 206,
+    )
+    # Also close the file if the body is never iterated (HEAD, disconnects)
+    response._resource_closers.append(filelike.close)
+    return finish_file_response(response, *prepared[1:])
+
+
+async def aiter_file(filelike, start, length):
+    read = sync_to_async(filelike.read, thread_sensitive=False)
+    try:
+        await sync_to_async(filelike.seek, thread_sensitive=False)(start)
+        remaining = length
+        while remaining > 0:
+            block = await read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        filelike.close()
+
+
+async def aiter_sync(iterator):
+    """
+    Serve a sync iterator that runs queries as an async body: each chunk is
+    produced in the request's sync thread, and the event loop sends it.
+    """
+    done = object()
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(iterator, done)) is not done:
+        yield chunk
+
+
+def finish_file_response(response, byte_range, size, content_type, etag, last_modified):
+    if byte_range is None:
+        response['Content-Length'] = str(size)
+    else:
+        start, end = byte_range
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def prepare_file_response(request, field_file):
+    """
+    Everything before the body: a finished response (redirect, 304, 416)
+    or (open file, byte range or None, size, content type, etag, mtime).
+    """
+    path = local_path(field_file)
+    if path is None:
+        # Object storage serves ranges itself; hand the client a (presigned) URL
+        return HttpResponseRedirect(field_file.url)
+
+    field_file.open('rb')
+    filelike = field_file.file
+    try:
+        size = field_file.size
+        mtime = os.path.getmtime(path)
+    except Exception:
+        filelike.close()
+        raise
+
+    etag = f'"{size:x}-{int(mtime):x}"'
+    last_modified = int(mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        filelike.close()
+        return not_modified
+
+    content_type = mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(range_header, size)
+
+    if byte_range == 'invalid':
+        filelike.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    return filelike, byte_range, size, content_type, etag, last_modified
+
+
+def if_range_matches(request, etag, last_modified):
+    """A Range is only honoured if If-Range (when present) still matches the file"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and last_modified <= since
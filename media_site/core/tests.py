@@ -0,0 +1,829 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import DatabaseError, connection, transaction
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from audio.models import AudioFile
+from audio.views import audio_list
+from blog.models import BlogPost
+from blog.views import BlogPostBulkAPIView
+from video.models import VideoFile
+from search.models import SearchEntry
+from .blobs import commit_references, release
+from .cache import bump_version, get_version, get_versions, invalidate
+from .db import ReplicaMiddleware, note_write
+from .export import Exporter, sections
+from .images import build_derivatives, derivative_widths, srcset
+from .media import IMMUTABLE, precompress, serve_media
+from .metrics import METRICS, REQUESTS, SERIALIZE_TIME, metrics_view, write_snapshot
+from .models import MediaBlob, TableVersion
+from .s3 import MediaS3Storage
+from .signals import bulk_saved
+from .storage import local_path, media_source, supports_presigned_upload
+from .streaming import async_ranged_file_response, ranged_file_response
+
+
+class TempMediaMixin:
+    """Stores files in a throwaway MEDIA_ROOT for the duration of a test"""
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class BlobReferenceTests(TempMediaMixin, TestCase):
+    def upload(self, audio, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            audio.audio_file.save('track.mp3', ContentFile(content))
+        return audio
+
+    def new_audio(self, content):
+        return self.upload(AudioFile(title='Track', description='d'), content)
+
+    def ref_count(self, name):
+        blob = MediaBlob.objects.filter(name=name).first()
+        return blob.ref_count if blob else None
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.new_audio(b'same bytes')
+        second = self.new_audio(b'same bytes')
+        self.assertEqual(first.audio_file.name, second.audio_file.name)
+        self.assertEqual(self.ref_count(first.audio_file.name), 2)
+
+    def test_reuploading_same_content_to_a_row_keeps_one_reference(self):
+        audio = self.new_audio(b'same bytes')
+        name = audio.audio_file.name
+        self.upload(audio, b'same bytes')
+        self.assertEqual(self.ref_count(name), 1)
+
+        storage = audio.audio_file.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            audio.delete()
+        self.assertIsNone(self.ref_count(name))
+        self.assertFalse(storage.exists(name))
+
+    def test_replacing_the_file_moves_the_reference(self):
+        audio = self.new_audio(b'old bytes')
+        old = audio.audio_file.name
+        self.upload(audio, b'new bytes')
+        self.assertIsNone(self.ref_count(old))
+        self.assertFalse(audio.audio_file.storage.exists(old))
+        self.assertEqual(self.ref_count(audio.audio_file.name), 1)
+
+    def test_deleting_one_of_two_rows_keeps_the_file(self):
+        first = self.new_audio(b'same bytes')
+        second = self.new_audio(b'same bytes')
+        name = first.audio_file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.ref_count(name), 1)
+        self.assertTrue(second.audio_file.storage.exists(name))
+
+    def test_failed_save_takes_no_reference(self):
+        audio = AudioFile(title='Track', description='d')
+        with mock.patch.object(AudioFile, 'save_base', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError), self.captureOnCommitCallbacks(execute=True):
+                audio.audio_file.save('track.mp3', ContentFile(b'unsaved bytes'))
+        self.assertFalse(MediaBlob.objects.filter(ref_count__gt=0).exists())
+
+    def test_rolled_back_bulk_create_takes_no_reference(self):
+        audio = AudioFile(title='Track', description='d', audio_file=ContentFile(b'bulk bytes', name='track.mp3'))
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                AudioFile.objects.bulk_create([audio])
+                commit_references(audio)
+                raise DatabaseError
+        self.assertFalse(MediaBlob.objects.filter(ref_count__gt=0).exists())
+
+    def test_reference_taken_after_the_last_release_restores_the_file(self):
+        first = self.new_audio(b'same bytes')
+        name = first.audio_file.name
+        storage = first.audio_file.storage
+        second = AudioFile(title='Track', description='d')
+        # store_blob() finds the blob; the first row goes before the
+        # second row's reference is taken
+        with self.captureOnCommitCallbacks() as callbacks:
+            second.audio_file.save('track.mp3', ContentFile(b'same bytes'))
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertFalse(storage.exists(name))
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.ref_count(name), 1)
+        with storage.open(name) as f:
+            self.assertEqual(f.read(), b'same bytes')
+
+    def test_release_never_goes_below_zero(self):
+        MediaBlob.objects.create(name='audio_files/ab/ab.mp3', sha256='ab', size=1, ref_count=0)
+        release(AudioFile._meta.get_field('audio_file').storage, 'audio_files/ab/ab.mp3')
+        self.assertFalse(MediaBlob.objects.filter(ref_count__lt=0).exists())
+
+
+@override_settings(IMAGE_DERIVATIVE_WIDTHS=[16, 32, 64])
+class ImageDerivativeTests(TempMediaMixin, TestCase):
+    def image(self, width):
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, width // 2), 'red').save(buffer, 'PNG')
+        post = BlogPost(title='Post', content='c')
+        post.image.save('picture.png', ContentFile(buffer.getvalue()), save=False)
+        return post.image
+
+    def test_widths_never_exceed_the_original_or_repeat(self):
+        self.assertEqual(derivative_widths(40), [16, 32, 40])
+        self.assertEqual(derivative_widths(64), [16, 32, 64])
+        self.assertEqual(derivative_widths(100), [16, 32, 64])
+        self.assertEqual(derivative_widths(10), [10])
+
+    def test_one_file_per_width_and_format(self):
+        for width, expected in ((40, [16, 32, 40]), (64, [16, 32, 64]), (100, [16, 32, 64])):
+            with self.subTest(width):
+                field_file = self.image(width)
+                derivatives = build_derivatives(field_file)
+                self.assertEqual(derivatives['source'], field_file.name)
+                for source in derivatives['sources']:
+                    self.assertEqual([f['width'] for f in source['files']], expected)
+                    for f in source['files']:
+                        with field_file.storage.open(f['name']) as stored:
+                            self.assertEqual(Image.open(stored).width, f['width'])
+
+    def test_srcset_lists_each_width_once(self):
+        field_file = self.image(100)
+        sources = srcset(field_file.storage, build_derivatives(field_file))
+        self.assertEqual(sources[-1]['type'], 'image/jpeg')
+        for source in sources:
+            descriptors = [candidate.split()[-1] for candidate in source['srcset'].split(', ')]
+            self.assertEqual(descriptors, ['16w', '32w', '64w'])
+        self.assertIsNone(srcset(field_file.storage, {}))
+
+
+async def serve_async(request, field_file):
+    response = await async_ranged_file_response(request, field_file)
+    if response.streaming:
+        response.body = b''.join([block async for block in response.streaming_content])
+    return response
+
+
+def serve_sync(request, field_file):
+    response = ranged_file_response(request, field_file)
+    if response.streaming:
+        response.body = b''.join(response.streaming_content)
+        response.close()
+    return response
+
+
+class RangeStreamingTests(TempMediaMixin, TestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        self.audio = self.new_audio(self.content)
+        path = self.audio.audio_file.path
+        self.etag = f'"{len(self.content):x}-{int(os.path.getmtime(path)):x}"'
+        self.last_modified = int(os.path.getmtime(path))
+
+    def new_audio(self, content):
+        audio = AudioFile(title='Track', description='d')
+        with self.captureOnCommitCallbacks(execute=True):
+            audio.audio_file.save('track.mp3', ContentFile(content))
+        return audio
+
+    def serve(self, audio=None, **headers):
+        """The response from both the sync and the async view, with the body read into .body"""
+        field_file = (audio or self.audio).audio_file
+        for serve in (serve_sync, async_to_sync(serve_async)):
+            request = RequestFactory().get('/api/audio/1/stream/', **headers)
+            yield serve(request, field_file)
+
+    def test_single_range(self):
+        for response in self.serve(HTTP_RANGE='bytes=10-19'):
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+            self.assertEqual(response['Content-Length'], '10')
+            self.assertEqual(response.body, self.content[10:20])
+
+    def test_suffix_and_open_ended_ranges(self):
+        for response in self.serve(HTTP_RANGE='bytes=-5'):
+            self.assertEqual(response.body, self.content[-5:])
+        for response in self.serve(HTTP_RANGE='bytes=1000-'):
+            self.assertEqual(response.body, self.content[1000:])
+
+    def test_multiple_ranges_fall_back_to_the_whole_file(self):
+        for response in self.serve(HTTP_RANGE='bytes=0-9,20-29'):
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('Content-Range'))
+            self.assertEqual(response.body, self.content)
+
+    def test_unsatisfiable_range(self):
+        for response in self.serve(HTTP_RANGE=f'bytes={len(self.content)}-'):
+            self.assertEqual(response.status_code, 416)
+            self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_if_range_with_the_current_etag_or_date_honours_the_range(self):
+        for if_range in (self.etag, http_date(self.last_modified)):
+            for response in self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=if_range):
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response.body, self.content[:10])
+
+    def test_if_range_with_a_stale_etag_or_date_sends_the_whole_file(self):
+        for if_range in ('"0-0"', http_date(self.last_modified - 60)):
+            for response in self.serve(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=if_range):
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.body, self.content)
+
+    def test_if_none_match(self):
+        for response in self.serve(HTTP_IF_NONE_MATCH=self.etag):
+            self.assertEqual(response.status_code, 304)
+
+    def test_head_has_the_headers_but_no_body(self):
+        response = self.client.head(f'/api/audio/{self.audio.pk}/stream/', HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def test_zero_length_file(self):
+        empty = self.new_audio(b'')
+        for response in self.serve(empty):
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Length'], '0')
+            self.assertEqual(response.body, b'')
+        for range_header in ('bytes=0-', 'bytes=-5'):
+            for response in self.serve(empty, HTTP_RANGE=range_header):
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */0')
+
+
+@override_settings(MEDIA_CACHE_MAX_AGE=3600)
+class MediaServingTests(TempMediaMixin, TestCase):
+    playlist = b''.join(b'#EXTINF:6.0,\nsegment_%03d.ts\n' % n for n in range(100))
+
+    def setUp(self):
+        super().setUp()
+        self.storage = FileSystemStorage(location=settings.MEDIA_ROOT)
+
+    def save(self, name, data):
+        self.storage.save(name, ContentFile(data))
+        precompress(self.storage, name, data)
+
+    def get(self, name, **headers):
+        response = serve_media(RequestFactory().get(f'/media/{name}', **headers), name)
+        response.body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response
+
+    def test_precompresses_only_compressible_files_worth_it(self):
+        self.save('hls/index.m3u8', self.playlist)
+        self.save('hls/short.m3u8', b'#EXTM3U\n')
+        self.save('audio/track.mp3', self.playlist)
+        self.assertTrue(self.storage.exists('hls/index.m3u8.gz'))
+        self.assertFalse(self.storage.exists('hls/short.m3u8.gz'))
+        self.assertFalse(self.storage.exists('audio/track.mp3.gz'))
+
+    def test_picks_the_precompressed_copy_by_accept_encoding(self):
+        self.save('hls/index.m3u8', self.playlist)
+        self.storage.save('hls/index.m3u8.br', ContentFile(b'brotli bytes'))
+        cases = [
+            ('gzip, deflate, br', 'br'),
+            ('gzip', 'gzip'),
+            ('br;q=0, gzip', 'gzip'),
+            ('identity', None),
+            ('', None),
+        ]
+        for accept_encoding, encoding in cases:
+            with self.subTest(accept_encoding):
+                response = self.get('hls/index.m3u8', HTTP_ACCEPT_ENCODING=accept_encoding)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+                if encoding == 'gzip':
+                    self.assertEqual(gzip.decompress(response.body), self.playlist)
+                elif encoding is None:
+                    self.assertEqual(response.body, self.playlist)
+
+    def test_each_encoding_has_its_own_etag(self):
+        self.save('hls/index.m3u8', self.playlist)
+        plain = self.get('hls/index.m3u8')
+        gzipped = self.get('hls/index.m3u8', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotEqual(plain['ETag'], gzipped['ETag'])
+        response = self.get('hls/index.m3u8', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=gzipped['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_ranges_are_of_the_uncompressed_file(self):
+        self.save('hls/index.m3u8', self.playlist)
+        response = self.get('hls/index.m3u8', HTTP_ACCEPT_ENCODING='gzip', HTTP_RANGE='bytes=0-6')
+        self.assertEqual(response.status_code, 206)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.body, self.playlist[:7])
+
+    def test_no_vary_for_files_that_are_never_precompressed(self):
+        self.save('audio/track.mp3', b'mp3 bytes')
+        self.assertFalse(self.get('audio/track.mp3', HTTP_ACCEPT_ENCODING='gzip').has_header('Vary'))
+
+    def test_only_content_addressed_names_are_immutable(self):
+        names = {
+            'derivatives/0123456789abcdef_640w.webp': IMMUTABLE,
+            'video_thumbnails/0123456789abcdef.jpg': IMMUTABLE,
+            'audio/ab/' + 'ab' * 32 + '.mp3': IMMUTABLE,
+            'audio/track.mp3': 'public, max-age=3600',
+            'hls/12/index.m3u8': 'public, max-age=3600',
+            'images/cafe.jpg': 'public, max-age=3600',
+        }
+        for name, cache_control in names.items():
+            with self.subTest(name):
+                self.save(name, b'bytes')
+                self.assertEqual(self.get(name)['Cache-Control'], cache_control)
+
+    def test_missing_files_and_paths_outside_media_root_are_404(self):
+        for name in ('nothing.mp3', '../settings.py'):
+            with self.subTest(name), self.assertRaises(Http404):
+                self.get(name)
+
+
+class BulkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create_user('editor', password='x'))
+        now = timezone.now()
+        self.kept = BlogPost.objects.create(title='Kept', content='c', published_date=now)
+        self.doomed = BlogPost.objects.create(title='Doomed', content='c', published_date=now)
+        self.sent = []
+        bulk_saved.connect(self.receive, sender=BlogPost)
+        self.addCleanup(bulk_saved.disconnect, self.receive, sender=BlogPost)
+
+    def receive(self, sender, created, updated, **kwargs):
+        self.sent.append((sorted(obj.title for obj in created), sorted(obj.title for obj in updated)))
+
+    def post(self, operations):
+        return self.client.post('/api/blog/bulk/', operations, content_type='application/json')
+
+    def operations(self, creates=3):
+        now = timezone.now().isoformat()
+        return [
+            *({'op': 'create', 'data': {'title': f'New {n}', 'content': 'c', 'published_date': now}} for n in range(creates)),
+            {'op': 'update', 'id': self.kept.pk, 'data': {'title': 'Kept, edited'}},
+            {'op': 'delete', 'id': self.doomed.pk},
+        ]
+
+    def titles(self):
+        return sorted(BlogPost.objects.values_list('title', flat=True))
+
+    def test_applies_everything_and_signals_once_per_batch(self):
+        with mock.patch.object(BlogPostBulkAPIView, 'batch_size', 2), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.post(self.operations(creates=5))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()['results']], [201] * 5 + [200, 204])
+        self.assertEqual(self.titles(), ['Kept, edited'] + [f'New {n}' for n in range(5)])
+        # One signal for the whole request, however many bulk_create batches
+        self.assertEqual(self.sent, [([f'New {n}' for n in range(5)], ['Kept, edited'])])
+        self.assertTrue(SearchEntry.objects.filter(kind='blog', title='New 4').exists())
+
+    def test_an_invalid_operation_writes_nothing(self):
+        operations = self.operations()
+        operations.insert(1, {'op': 'create', 'data': {'title': 'x' * 500, 'content': 'c'}})
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.post(operations)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1])
+        self.assertEqual(self.titles(), ['Doomed', 'Kept'])
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.sent, [])
+
+    def test_a_failing_write_rolls_back_the_whole_batch(self):
+        with mock.patch.object(BlogPostBulkAPIView, 'apply_deletes', side_effect=DatabaseError), \
+                self.captureOnCommitCallbacks(execute=True) as callbacks, \
+                self.assertRaises(DatabaseError):
+            self.post(self.operations())
+        self.assertEqual(self.titles(), ['Doomed', 'Kept'])
+        self.assertFalse(SearchEntry.objects.filter(title__startswith='New').exists())
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.sent, [])
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def add_rows(self, count):
+        for n in range(count):
+            AudioFile.objects.create(title=f'Track {n}', description='d', audio_file=f'audio_files/{n}.mp3')
+            BlogPost.objects.create(title=f'Post {n}', content='c' * 1000, published_date=timezone.now())
+
+    def test_selects_and_excludes_fields(self):
+        self.add_rows(1)
+        self.assertEqual(list(self.client.get('/api/audio/?fields=id,title').json()[0]), ['id', 'title'])
+        row = self.client.get('/api/blog/?exclude=content,image,image_srcset').json()[0]
+        self.assertEqual(sorted(row), ['created_date', 'id', 'published_date', 'title'])
+
+    def test_unknown_field_names_are_a_bad_request(self):
+        for url, param in (
+            ('/api/audio/?fields=id,nope', 'fields'),
+            ('/api/blog/?exclude=title,bogus', 'exclude'),
+            ('/api/blog/?view=summary&fields=content', 'fields'),
+            ('/api/video/?fields=title, nope', 'fields'),
+        ):
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(param, response.json())
+
+    def test_async_handlers_also_reject_unknown_names(self):
+        response = async_to_sync(audio_list)(RequestFactory().get('/api/audio/?fields=nope'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {'fields': 'Unknown field(s): nope.'})
+        self.assertEqual(response.content, self.client.get('/api/audio/?fields=nope').content)
+
+    def list_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_trimmed_columns_are_not_loaded_row_by_row(self):
+        # peaks_url reads peaks_status and excerpt reads content, neither
+        # of which is a requested field
+        urls = ['/api/audio/?fields=id,peaks_url', '/api/blog/?view=summary&fields=id,excerpt']
+        self.add_rows(1)
+        few = [len(self.list_queries(url)) for url in urls]
+        self.add_rows(5)
+        self.assertEqual([len(self.list_queries(url)) for url in urls], few)
+        select = next(sql for sql in self.list_queries(urls[0]) if 'FROM "audio_audiofile"' in sql)
+        self.assertIn('"peaks_status"', select)
+        self.assertNotIn('"description"', select)
+
+
+@override_settings(MEDIA_CACHE_MAX_AGE=3600)
+class ObjectStorageTests(TempMediaMixin, TestCase):
+    def s3_storage(self, **options):
+        return MediaS3Storage(
+            bucket_name='media', region_name='eu-west-1', access_key='AKIAEXAMPLE', secret_key='secret',
+            querystring_expire=900, **options,
+        )
+
+    def test_objects_are_stored_with_cache_control_by_name(self):
+        storage = self.s3_storage()
+        self.assertEqual(storage.get_object_parameters('derivatives/0123456789abcdef_640w.webp'), {'CacheControl': IMMUTABLE})
+        self.assertEqual(storage.get_object_parameters('audio_files/track.mp3'), {'CacheControl': 'public, max-age=3600'})
+        # Explicitly configured parameters win
+        storage = self.s3_storage(object_parameters={'CacheControl': 'no-cache'})
+        self.assertEqual(storage.get_object_parameters('audio_files/track.mp3'), {'CacheControl': 'no-cache'})
+
+    def test_uploading_to_s3_sends_the_cache_control(self):
+        storage = self.s3_storage()
+        with mock.patch.object(storage.bucket, 'Object') as bucket_object:
+            storage.save('derivatives/0123456789abcdef_640w.webp', ContentFile(b'webp'))
+        extra_args = bucket_object.return_value.upload_fileobj.call_args.kwargs['ExtraArgs']
+        self.assertEqual(extra_args['CacheControl'], IMMUTABLE)
+        self.assertEqual(extra_args['ContentType'], 'image/webp')
+
+    def test_remote_files_are_read_through_a_presigned_url(self):
+        field = AudioFile._meta.get_field('audio_file')
+        with mock.patch.object(field, 'storage', self.s3_storage()):
+            audio = AudioFile.objects.create(title='Track', description='d', audio_file='audio_files/track.mp3')
+            self.assertIsNone(local_path(audio.audio_file))
+            url = media_source(audio.audio_file)
+            self.assertTrue(url.startswith('https://media.s3.'))
+            self.assertIn('audio_files/track.mp3?', url)
+            self.assertTrue(supports_presigned_upload(field.storage))
+
+            response = ranged_file_response(RequestFactory().get('/', HTTP_RANGE='bytes=0-9'), audio.audio_file)
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(response['Location'].split('?')[0], url.split('?')[0])
+
+    def test_local_files_are_read_from_disk(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            audio = AudioFile(title='Track', description='d')
+            audio.audio_file.save('track.mp3', ContentFile(b'mp3'))
+        path = os.path.join(settings.MEDIA_ROOT, audio.audio_file.name)
+        self.assertEqual(local_path(audio.audio_file), path)
+        self.assertEqual(media_source(audio.audio_file), path)
+        self.assertFalse(supports_presigned_upload(audio.audio_file.storage))
+
+
+# --delete removes files from worker threads, which only see committed rows
+class ScanMediaTests(TempMediaMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        part_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, part_dir, ignore_errors=True)
+        settings_override = override_settings(CHUNKED_UPLOAD_DIR=part_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.write('audio_files/kept.mp3')
+        self.write('audio_files/orphan.mp3')
+        MediaBlob.objects.create(name='audio_files/orphan.mp3', size=100, ref_count=0)
+        # Written moments ago, before its row: left alone by --min-age
+        self.write('audio_files/fresh.mp3', age=0)
+        AudioFile.objects.create(title='Kept', description='d', audio_file='audio_files/kept.mp3')
+        AudioFile.objects.create(title='Gone', description='d', audio_file='audio_files/gone.mp3')
+
+        self.write('hls/kept.m3u8')
+        self.write('hls/kept.m3u8.gz')
+        self.write('hls/orphan.m3u8.gz')
+        VideoFile.objects.create(title='Video', description='d', video_file='hls/kept.m3u8')
+
+        live = BlogPost.objects.create(title='Post', content='c')
+        BlogPost.objects.filter(pk=live.pk).update(
+            image_derivatives={'sources': [{'files': [{'name': 'derivatives/0123456789abcdef_64w.webp'}]}]},
+        )
+        self.write('derivatives/0123456789abcdef_64w.webp')
+        self.write('derivatives/fedcba9876543210_64w.webp')
+
+        self.write(f'video_hls/{live.pk + 1000}/master.m3u8')
+        self.abandoned_part = os.path.join(settings.CHUNKED_UPLOAD_DIR, '00000000-0000-0000-0000-000000000000.part')
+        self.write_file(self.abandoned_part)
+
+        self.orphans = [
+            'audio_files/orphan.mp3', 'derivatives/fedcba9876543210_64w.webp',
+            'hls/orphan.m3u8.gz', f'video_hls/{live.pk + 1000}/master.m3u8',
+        ]
+        self.kept = [
+            'audio_files/kept.mp3', 'audio_files/fresh.mp3', 'hls/kept.m3u8', 'hls/kept.m3u8.gz',
+            'derivatives/0123456789abcdef_64w.webp',
+        ]
+
+    def write(self, name, age=7200):
+        self.write_file(os.path.join(settings.MEDIA_ROOT, name), age)
+
+    def write_file(self, path, age=7200):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(settings.MEDIA_ROOT, name))
+
+    def scan(self, *args):
+        self.errors = io.StringIO()
+        out = io.StringIO()
+        call_command('scan_media', *args, stdout=out, stderr=self.errors)
+        return out.getvalue()
+
+    def test_dry_run_reports_orphans_and_missing_files(self):
+        output = self.scan()
+        orphans, missing = output.split('Rows with missing files:')
+        for name in self.orphans:
+            self.assertIn(f'  {name} (100 B)', orphans)
+        for name in self.kept:
+            self.assertNotIn(name, orphans)
+        self.assertIn(f'  {self.abandoned_part} (100 B, abandoned upload)', orphans)
+        self.assertIn('Found 5 orphaned file(s), 500 B', orphans)
+
+        self.assertIn('audio.AudioFile', missing)
+        self.assertIn('audio_file: audio_files/gone.mp3', missing)
+        self.assertIn('Found 1 missing file(s)', missing)
+        self.assertIn('audio               3 file(s)      300 B', output)
+
+        # Nothing is deleted without --delete
+        for name in self.orphans + self.kept:
+            self.assertTrue(self.exists(name), name)
+        self.assertTrue(os.path.exists(self.abandoned_part))
+
+    def test_delete_removes_only_orphans(self):
+        output = self.scan('--delete', '--workers=2', '--batch-size=2', '--skip-missing')
+        self.assertEqual(self.errors.getvalue(), '')
+        self.assertIn('Deleted 5 orphaned file(s), 500 B', output)
+        self.assertNotIn('Rows with missing files', output)
+        for name in self.orphans:
+            self.assertFalse(self.exists(name), name)
+        for name in self.kept:
+            self.assertTrue(self.exists(name), name)
+        self.assertFalse(os.path.exists(self.abandoned_part))
+        self.assertFalse(MediaBlob.objects.filter(name='audio_files/orphan.mp3').exists())
+
+    def test_min_age_covers_new_files(self):
+        output = self.scan('--min-age=0')
+        self.assertIn('  audio_files/fresh.mp3 (100 B)', output)
+
+
+# Requests run on the benchmark's own threads, which only see committed rows
+class BenchmarkCommandTests(TempMediaMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir, ignore_errors=True)
+        self.output = os.path.join(output_dir, 'bench.json')
+
+    def benchmark(self, *args):
+        out = io.StringIO()
+        call_command(
+            'benchmark', '--requests=3', '--concurrency=1', '--warmup=1', '--rng-seed=1', *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_runs_every_endpoint_in_process(self):
+        output = self.benchmark('--seed=5', '--media-files=2', f'--output={self.output}')
+        self.assertIn('Seeded 5 blog.BlogPost rows', output)
+        with open(self.output) as f:
+            results = json.load(f)
+        self.assertEqual(results['meta']['rows'], {'blog.BlogPost': 5, 'audio.AudioFile': 5, 'video.VideoFile': 5})
+        endpoints = results['modes']['inprocess']
+        self.assertIn('audio.stream.range', endpoints)
+        for name, summary in endpoints.items():
+            with self.subTest(name):
+                self.assertEqual(summary['errors'], 0)
+                self.assertEqual(summary['requests'], 3)
+                self.assertIsNotNone(summary['p50_ms'])
+
+        # Compared with itself only a generous threshold is safe from noise
+        output = self.benchmark('--endpoint=blog.list', f'--baseline={self.output}', '--threshold=1000')
+        self.assertIn('inprocess blog.list', output)
+        self.assertNotIn('REGRESSION', output)
+
+        self.benchmark('--flush', '--endpoint=blog.list')
+        self.assertFalse(BlogPost.objects.filter(title__startswith='bench-').exists())
+        self.assertFalse(os.listdir(os.path.join(settings.MEDIA_ROOT, 'bench')))
+
+    def test_unknown_endpoint(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown endpoint(s): nope'):
+            self.benchmark('--endpoint=nope')
+
+
+class ResponseCacheVersionTests(TestCase):
+    def test_versions_start_at_zero_and_move_on_bump(self):
+        self.assertEqual(get_version('audio'), 0)
+        self.assertEqual(get_version('audio', 7), 0)
+        invalidate('audio', 7)
+        self.assertEqual(get_version('audio'), 1)
+        self.assertEqual(get_version('audio', 7), 1)
+        self.assertEqual(get_versions('audio', [7, 8]), {7: 1, 8: 0})
+
+    def test_versions_survive_the_cache_being_emptied(self):
+        # An evicted counter must not fall back to a version with entries
+        # still cached under it
+        bump_version('video', 3)
+        cache.clear()
+        self.assertEqual(get_version('video', 3), 1)
+
+    def test_conditional_get_reads_one_version_query_and_writes_nothing(self):
+        cache.clear()
+        post = BlogPost.objects.create(title='Post', content='c', published_date=timezone.now())
+        rows = TableVersion.objects.count()
+        for url in ('/api/blog/', f'/api/blog/{post.pk}/'):
+            with self.subTest(url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+                # A cache hit: the ETag and the cache key share one read
+                with self.assertNumQueries(1):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(1):
+                    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(TableVersion.objects.count(), rows)
+
+    def test_untouched_table_has_no_last_modified(self):
+        response = self.client.get('/api/video/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertFalse(TableVersion.objects.filter(name='video').exists())
+
+
+@override_settings(REPLICA_DATABASES=['replica_0'], REPLICA_STICKY_SECONDS=10)
+class ReplicaStickinessTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.middleware = ReplicaMiddleware(lambda request: HttpResponse())
+        users = get_user_model().objects
+        self.writer = users.create_user('writer', password='x')
+        self.reader = users.create_user('reader', password='x')
+
+    def request(self, method='get', user=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'} if user else {}
+        return getattr(RequestFactory(), method)('/api/audio/', **headers)
+
+    def write(self, user):
+        request = self.request('post', user)
+        request.user = user
+        self.middleware.note_writer(request, HttpResponse(status=201))
+
+    def test_a_writer_reads_from_primary_by_token(self):
+        self.write(self.writer)
+        self.assertTrue(self.middleware.on_primary(self.request(user=self.writer)))
+        self.assertFalse(self.middleware.on_primary(self.request(user=self.reader)))
+        self.assertFalse(self.middleware.on_primary(self.request()))
+
+    def test_failed_write_is_not_sticky(self):
+        request = self.request('post', self.writer)
+        request.user = self.writer
+        self.middleware.note_writer(request, HttpResponse(status=400))
+        self.assertFalse(self.middleware.on_primary(self.request(user=self.writer)))
+
+    def test_content_write_keeps_everyone_on_primary(self):
+        note_write()
+        self.assertTrue(self.middleware.on_primary(self.request()))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_root, ignore_errors=True)
+        self.export_root = export_root
+
+    def test_exports_responses_through_the_middleware(self):
+        post = BlogPost.objects.create(title='Post', content='c', published_date=timezone.now())
+        exporter = Exporter(self.export_root)
+        exporter.export_section(sections()['blog'], [post.pk])
+        with open(os.path.join(self.export_root, 'api', 'blog', 'index.json')) as f:
+            self.assertEqual([row['id'] for row in json.load(f)], [post.pk])
+        self.assertTrue(os.path.exists(os.path.join(self.export_root, 'blog', str(post.pk), 'index.html')))
+
+    @override_settings(STATIC_EXPORT_BASE_URL='https://cms-xosi.onrender.com')
+    def test_requests_are_made_for_the_public_host(self):
+        post = BlogPost.objects.create(title='Post', content='c', published_date=timezone.now())
+        Exporter(self.export_root).export_lists(sections()['blog'])
+        with open(os.path.join(self.export_root, 'api', 'blog', 'feed', 'index.xml')) as f:
+            self.assertIn(f'<link>https://cms-xosi.onrender.com/blog/{post.pk}/</link>', f.read())
+
+    def test_sync_runs_only_after_changes(self):
+        exporter = Exporter(self.export_root)
+        with self.settings(STATIC_EXPORT_SYNC_COMMAND='rsync -a {root}/ cdn:/site/'), \
+                mock.patch('core.export.subprocess.run') as run:
+            exporter.sync()
+            run.assert_not_called()
+            exporter.write('a/index.html', b'page')
+            exporter.sync()
+        self.assertEqual(run.call_args.args[0], ['rsync', '-a', f'{self.export_root}/', 'cdn:/site/'])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        settings_override = override_settings(METRICS_DIR=metrics_dir, METRICS_TOKEN='secret')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.metrics_dir = metrics_dir
+        # Start from empty series, whatever other tests requested
+        for metric in METRICS:
+            series = mock.patch.dict(metric.series, clear=True)
+            series.start()
+            self.addCleanup(series.stop)
+
+    def scrape(self, token='secret'):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        return metrics_view(RequestFactory().get('/metrics', **headers))
+
+    def test_series_are_summed_over_workers(self):
+        labels = ('api/audio/', 'GET', 200)
+        with mock.patch.dict(REQUESTS.series, {labels: 3}):
+            write_snapshot()
+            # Another worker's snapshot, with a histogram series of its own
+            with open(os.path.join(self.metrics_dir, '1.json'), 'w') as f:
+                json.dump({
+                    'http_requests_total': [[list(labels), 4]],
+                    'http_response_size_bytes': [[['api/audio/', 'GET'], [1, 0, 0, 0, 0, 0, 0, 0, 0, 100.0]]],
+                }, f)
+            body = self.scrape().content.decode()
+        self.assertIn('http_requests_total{route="api/audio/",method="GET",status="200"} 7', body)
+        self.assertIn('http_response_size_bytes_count{route="api/audio/",method="GET"} 1', body)
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    def test_serializer_time_is_recorded_apart_from_rendering(self):
+        cache.clear()
+        BlogPost.objects.create(title='Post', content='c', published_date=timezone.now())
+        response = self.client.get('/api/blog/')
+        counts = SERIALIZE_TIME.series[('api/blog/', 'GET')]
+        self.assertEqual(sum(counts[:-1]), 1)
+        self.assertGreater(counts[-1], 0)
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        self.assertIn('render;dur=', response['Server-Timing'])
+
+    def test_requires_the_token(self):
+        self.assertEqual(self.scrape(token='wrong').status_code, 403)
+        self.assertEqual(self.scrape().status_code, 200)
+
+    def test_closed_without_a_token_unless_debugging(self):
+        with self.settings(METRICS_TOKEN='', DEBUG=False):
+            self.assertEqual(self.scrape(token=None).status_code, 403)
+        with self.settings(METRICS_TOKEN='', DEBUG=True):
+            self.assertEqual(self.scrape(token=None).status_code, 200)
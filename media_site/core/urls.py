@@ -1,10 +1,13 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
-from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from core.export import prerendered_view
+from core.media import aserve_media, serve_media
+from core.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -12,6 +15,9 @@ urlpatterns = [
     path('api/blog/', include('blog.urls')),
     path('api/audio/', include('audio.urls')),
     path('api/video/', include('video.urls')),
+    path('api/uploads/', include('uploads.urls')),
+    path('api/search/', include('search.urls')),
+    path('metrics', metrics_view, name='metrics'),
 
      
 ]
@@ -19,12 +25,20 @@ urlpatterns = [
 # Only serve static files in development
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+# Local media: precompressed variants and immutable caching of hashed names.
+# Object storage serves its own files, with Cache-Control set on upload.
+if settings.MEDIA_STORAGE == 'local':
+    urlpatterns += [
+        re_path(
+            rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.+)$',
+            aserve_media if settings.ASYNC_VIEWS else serve_media,
+            name='media',
+        ),
+    ]
 
 urlpatterns += [
-    # Serve React's index.html for all other routes
-    re_path(r'^.*$', TemplateView.as_view(
-        template_name='index.html',
-        extra_context={}
-    )),
+    # Prerendered pages from manage.py export when there are any, else
+    # React's index.html for all other routes
+    re_path(r'^.*$', prerendered_view),
 ]
@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import claim_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued background jobs (thumbnails etc.)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of concurrent workers')
+        parser.add_argument('--processes', action='store_true', help='Use a process pool instead of threads')
+        parser.add_argument('--kind', action='append', dest='kinds', help='Only run jobs of this kind (repeatable)')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        use_processes = options['processes']
+        if use_processes:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+
+        self.stdout.write(f"Job worker started with {workers} worker(s)")
+        with executor:
+            while True:
+                pks = claim_jobs(workers, kinds=options['kinds'])
+                if not pks:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                if use_processes:
+                    # Forked workers must not inherit the parent's open DB connections
+                    connections.close_all()
+                futures = {pk: executor.submit(run_job, pk) for pk in pks}
+                for pk, future in futures.items():
+                    try:
+                        status = future.result()
+                    except Exception as e:
+                        self.stderr.write(f"Job {pk} crashed: {e}")
+                        continue
+                    self.stdout.write(f"Job {pk}: {status}")
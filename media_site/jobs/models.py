@@ -0,0 +1,43 @@
+from django.db import models
+from django.utils import timezone
+
+class Job(models.Model):
+    """
+    A unit of background work, picked up by `manage.py run_jobs`.
+
+    `kind` names a handler in settings.JOB_HANDLERS and `object_id` is the
+    primary key of the row the handler works on.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    object_id = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # The worker polls for due jobs by status and run_after
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    @property
+    def is_last_attempt(self):
+        return self.attempts >= self.max_attempts
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} ({self.status})"
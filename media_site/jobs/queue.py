@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+# A job stuck in RUNNING for longer than this is assumed to belong to a dead worker
+STALE_AFTER = timedelta(hours=1)
+
+
+def enqueue(kind, object_id, max_attempts=3, run_after=None):
+    """
+    Queue a job unless an identical one is already waiting or running.
+    `run_after` delays it; queueing a waiting job again moves it to the new time.
+    """
+    existing = Job.objects.filter(
+        kind=kind, object_id=object_id, status__in=[Job.PENDING, Job.RUNNING]
+    ).first()
+    if existing:
+        if run_after is not None and existing.status == Job.PENDING and existing.run_after != run_after:
+            existing.run_after = run_after
+            existing.save(update_fields=['run_after', 'updated_at'])
+        return existing
+    return Job.objects.create(
+        kind=kind, object_id=object_id, max_attempts=max_attempts, run_after=run_after or timezone.now()
+    )
+
+
+def claim_jobs(limit, kinds=None):
+    """
+    Mark up to `limit` due jobs as RUNNING and return them.
+
+    Claiming is a conditional UPDATE on (pk, status, updated_at), so several
+    workers can poll the same table without picking up the same job.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(
+        Q(status=Job.PENDING, run_after__lte=now) |
+        Q(status=Job.RUNNING, updated_at__lt=now - STALE_AFTER)
+    )
+    if kinds:
+        due = due.filter(kind__in=kinds)
+
+    claimed = []
+    for job in due.order_by('run_after')[:limit]:
+        updated = Job.objects.filter(
+            pk=job.pk, status=job.status, updated_at=job.updated_at
+        ).update(status=Job.RUNNING, attempts=F('attempts') + 1, updated_at=now)
+        if updated:
+            claimed.append(job.pk)
+    return claimed
+
+
+def run_job(pk):
+    """Run a claimed job and record the outcome. Safe to call from a thread or a child process."""
+    try:
+        job = Job.objects.get(pk=pk)
+        handler = import_string(settings.JOB_HANDLERS[job.kind])
+        try:
+            handler(job)
+        except Exception as e:
+            job.last_error = f"{type(e).__name__}: {e}"
+            if job.is_last_attempt:
+                job.status = Job.FAILED
+            else:
+                # Exponential backoff: 30s, 60s, 120s, ...
+                job.status = Job.PENDING
+                job.run_after = timezone.now() + timedelta(seconds=30 * 2 ** (job.attempts - 1))
+            job.save(update_fields=['status', 'last_error', 'run_after', 'updated_at'])
+            return job.status
+
+        job.status = Job.DONE
+        job.last_error = ''
+        job.save(update_fields=['status', 'last_error', 'updated_at'])
+        return job.status
+    finally:
+        close_old_connections()
@@ -0,0 +1,131 @@
+import operator
+from functools import reduce
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from .models import SearchEntry
+
+
+def document_for(kind, instance):
+    """(title, body, date) to index for `instance`, or None if it must not be searchable"""
+    if kind == 'blog':
+        if not instance.is_published:
+            # Drafts and scheduled posts; the publish job indexes the latter
+            return None
+        return instance.title, instance.content, instance.published_date
+    return instance.title, instance.description, instance.uploaded_date
+
+
+def update_entry(kind, instance):
+    """Index or unindex `instance`; returns whether it is now searchable"""
+    document = document_for(kind, instance)
+    if document is None:
+        remove_entry(kind, instance.pk)
+        return False
+
+    title, body, date = document
+    entry, _ = SearchEntry.objects.update_or_create(
+        kind=kind, object_id=instance.pk,
+        defaults={'title': title, 'body': body, 'date': date},
+    )
+    if connection.vendor == 'postgresql':
+        SearchEntry.objects.filter(pk=entry.pk).update(
+            search_vector=SearchVector('title', weight='A') + SearchVector('body', weight='B')
+        )
+    return True
+
+
+def remove_entry(kind, object_id):
+    SearchEntry.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def fts5_query(text):
+    # Quote every term so user input can't use FTS5 syntax; the last term
+    # also matches as a prefix for search-as-you-type.
+    terms = [term.replace('"', '""') for term in text.split()]
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+# Per database alias: whether the search_fts table exists
+_fts5_tables = {}
+
+
+def has_fts5():
+    """Whether migrations could create the FTS5 table (SQLite builds may lack FTS5)"""
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts5_tables:
+        _fts5_tables[connection.alias] = 'search_fts' in connection.introspection.table_names()
+    return _fts5_tables[connection.alias]
+
+
+def search(text, kinds=None, offset=0, limit=10):
+    """
+    Return up to `limit` entries ranked best first, each with a `rank`
+    attribute (higher is better). Title matches weigh more than body matches;
+    entries that rank the same come newest first.
+    """
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(text, search_type='websearch')
+        entries = SearchEntry.objects.filter(search_vector=query)
+        if kinds:
+            entries = entries.filter(kind__in=kinds)
+        entries = entries.annotate(rank=SearchRank(F('search_vector'), query)).order_by('-rank', '-date')
+        return list(entries[offset:offset + limit])
+    if not has_fts5():
+        return substring_search(text, kinds, offset, limit)
+
+    match = fts5_query(text)
+    if not match:
+        return []
+    sql = (
+        "SELECT e.id, bm25(search_fts, 10.0, 1.0) AS rank "
+        "FROM search_fts JOIN search_searchentry e ON e.id = search_fts.rowid "
+        "WHERE search_fts MATCH %s"
+    )
+    params = [match]
+    if kinds:
+        sql += f" AND e.kind IN ({', '.join(['%s'] * len(kinds))})"
+        params += kinds
+    sql += " ORDER BY rank, e.date DESC, e.id DESC LIMIT %s OFFSET %s"
+    params += [limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        ranks = dict(cursor.fetchall())
+
+    entries = SearchEntry.objects.in_bulk(list(ranks))
+    results = []
+    for pk, rank in ranks.items():
+        entry = entries[pk]
+        # bm25() is lower-is-better; flip it so both backends sort descending
+        entry.rank = -rank
+        results.append(entry)
+    return results
+
+
+def substring_search(text, kinds=None, offset=0, limit=10):
+    """
+    search() without a full-text index: every term must appear in the
+    title or body, and the rank counts the terms found in the title.
+    Slow on large tables, but the same results for simple queries.
+    """
+    terms = text.split()
+    if not terms:
+        return []
+    entries = SearchEntry.objects.all()
+    for term in terms:
+        entries = entries.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    title_hits = reduce(operator.add, [
+        Case(When(title__icontains=term, then=Value(1)), default=Value(0), output_field=IntegerField())
+        for term in terms
+    ])
+    entries = entries.annotate(rank=title_hits).order_by('-rank', '-date', '-id')
+    return list(entries[offset:offset + limit])
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from audio.models import AudioFile
+from blog.models import BlogPost
+from video.models import VideoFile
+from search.index import update_entry
+from search.models import SearchEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from the blog, audio and video tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        SearchEntry.objects.all().delete()
+        for kind, model in [('blog', BlogPost), ('audio', AudioFile), ('video', VideoFile)]:
+            count = 0
+            for instance in model.objects.order_by('pk').iterator(chunk_size=options['batch_size']):
+                if update_entry(kind, instance):
+                    count += 1
+            self.stdout.write(f"Indexed {count} {kind} rows")
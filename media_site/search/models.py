@@ -0,0 +1,31 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+class SearchEntry(models.Model):
+    """
+    One searchable row per public blog post, audio file or video file.
+
+    On PostgreSQL `search_vector` is filled in by search.index and covered
+    by a GIN index; on SQLite an FTS5 table mirrors title/body through
+    triggers. Both are created in migrations for the matching backend only.
+    """
+    KIND_CHOICES = [
+        ('blog', 'Blog post'),
+        ('audio', 'Audio'),
+        ('video', 'Video'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    date = models.DateTimeField()
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='search_entry_object_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.title}"
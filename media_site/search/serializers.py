@@ -0,0 +1,11 @@
+from rest_framework import serializers
+from .models import SearchEntry
+
+class SearchResultSerializer(serializers.ModelSerializer):
+    type = serializers.CharField(source='kind')
+    id = serializers.IntegerField(source='object_id')
+    rank = serializers.FloatField()
+
+    class Meta:
+        model = SearchEntry
+        fields = ['type', 'id', 'title', 'date', 'rank']
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from audio.models import AudioFile
+from core.signals import bulk_saved
+from blog.models import BlogPost
+from video.models import VideoFile
+from .index import remove_entry, update_entry
+
+KINDS = {
+    BlogPost: 'blog',
+    AudioFile: 'audio',
+    VideoFile: 'video',
+}
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=AudioFile)
+@receiver(post_save, sender=VideoFile)
+def index_instance(sender, instance, update_fields=None, **kwargs):
+    # Background jobs save status/derived fields only; nothing searchable changed
+    if update_fields and not {'title', 'content', 'description', 'published_date'} & set(update_fields):
+        return
+    update_entry(KINDS[sender], instance)
+
+
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=AudioFile)
+@receiver(post_delete, sender=VideoFile)
+def unindex_instance(sender, instance, **kwargs):
+    remove_entry(KINDS[sender], instance.pk)
+
+
+@receiver(bulk_saved, sender=BlogPost)
+@receiver(bulk_saved, sender=AudioFile)
+@receiver(bulk_saved, sender=VideoFile)
+def index_bulk(sender, created, updated, **kwargs):
+    for instance in created + updated:
+        update_entry(KINDS[sender], instance)
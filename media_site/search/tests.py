@@ -0,0 +1,94 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from audio.models import AudioFile
+from blog.models import BlogPost
+from .index import has_fts5, search
+from .models import SearchEntry
+
+
+class SearchTestsMixin:
+    """Shared by the FTS5 and the substring-matching backends"""
+    def setUp(self):
+        now = timezone.now()
+        self.older = BlogPost.objects.create(
+            title='Harbour notes', content='Tides past the lighthouse.',
+            published_date=now - timedelta(days=2),
+        )
+        self.newer = BlogPost.objects.create(
+            title='Market day', content='Stalls by the lighthouse.',
+            published_date=now - timedelta(days=1),
+        )
+        self.titled = BlogPost.objects.create(
+            title='Lighthouse restoration', content='Scaffolding is up.',
+            published_date=now - timedelta(days=3),
+        )
+
+    def titles(self, text, **kwargs):
+        return [entry.title for entry in search(text, **kwargs)]
+
+    def test_title_matches_rank_first_then_newest(self):
+        # The two body matches score the same, so the newer post goes first
+        results = search('lighthouse')
+        self.assertEqual([entry.object_id for entry in results], [self.titled.pk, self.newer.pk, self.older.pk])
+        ranks = [entry.rank for entry in results]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.titles('lighthouse tides'), ['Harbour notes'])
+        self.assertEqual(self.titles('lighthouse volcano'), [])
+
+    def test_last_term_matches_as_a_prefix(self):
+        self.assertEqual(self.titles('scaff'), ['Lighthouse restoration'])
+
+    def test_user_input_is_not_query_syntax(self):
+        self.assertEqual(self.titles('"lighthouse OR ('), [])
+        self.assertEqual(self.titles('   '), [])
+
+    def test_kind_filter_and_paging(self):
+        AudioFile.objects.create(title='Lighthouse foghorn', description='Recorded at dawn.')
+        self.assertEqual(self.titles('lighthouse', kinds=['audio']), ['Lighthouse foghorn'])
+        self.assertEqual(self.titles('lighthouse', kinds=['blog'], offset=1, limit=1), ['Market day'])
+
+    def test_edited_and_deleted_rows_drop_out(self):
+        self.titled.title = 'Restoration'
+        self.titled.save()
+        self.assertEqual(self.titles('lighthouse restoration'), [])
+        self.newer.delete()
+        self.assertNotIn('Market day', self.titles('lighthouse'))
+        self.assertFalse(SearchEntry.objects.filter(kind='blog', object_id=self.newer.pk).exists())
+
+    def test_unpublished_posts_are_not_searchable(self):
+        self.older.published_date = None
+        self.older.save()
+        self.assertEqual(self.titles('tides'), [])
+        BlogPost.objects.create(title='Tides tomorrow', content='c', published_date=timezone.now() + timedelta(days=1))
+        self.assertEqual(self.titles('tides'), [])
+
+    def test_api_pages_through_results(self):
+        response = self.client.get('/api/search/', {'q': 'lighthouse', 'page_size': 2})
+        self.assertEqual([row['title'] for row in response.json()['results']], ['Lighthouse restoration', 'Market day'])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([row['title'] for row in response.json()['results']], ['Harbour notes'])
+        self.assertIsNone(response.json()['next'])
+
+
+class FTS5SearchTests(SearchTestsMixin, TestCase):
+    def setUp(self):
+        if not has_fts5():
+            self.skipTest('SQLite was built without FTS5')
+        super().setUp()
+
+    def test_terms_are_stemmed(self):
+        self.assertEqual(self.titles('restored lighthouses'), ['Lighthouse restoration'])
+
+
+class SubstringSearchTests(SearchTestsMixin, TestCase):
+    def setUp(self):
+        patcher = mock.patch('search.index.has_fts5', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
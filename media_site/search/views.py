@@ -0,0 +1,44 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import AllowAny
+from rest_framework import status
+from django.conf import settings
+from .index import search
+from .serializers import SearchResultSerializer
+
+class SearchAPIView(APIView):
+    """
+    Ranked full-text search over blog posts, audio and video.
+    ?q= is the query, ?type= (repeatable) narrows by blog/audio/video,
+    ?page= and ?page_size= page through the results.
+    """
+    permission_classes = [AllowAny]
+    max_page_size = 50
+    max_page = 100
+
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'detail': 'q is required.'}, status = status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            page_size = int(request.query_params.get('page_size', settings.REST_FRAMEWORK['PAGE_SIZE']))
+        except ValueError:
+            return Response({'detail': 'Invalid page.'}, status = status.HTTP_400_BAD_REQUEST)
+        page_size = min(max(1, page_size), self.max_page_size)
+        # Deep pages of a relevance ranking are rarely useful and cost the most
+        if page > self.max_page:
+            return Response({'next': None, 'results': []})
+
+        kinds = request.query_params.getlist('type') or None
+        # Fetch one extra row to know whether there is a next page
+        entries = search(text, kinds, offset=(page - 1) * page_size, limit=page_size + 1)
+
+        next_link = None
+        if len(entries) > page_size:
+            params = request.query_params.copy()
+            params['page'] = page + 1
+            next_link = f"{request.path}?{params.urlencode()}"
+        serializer = SearchResultSerializer(entries[:page_size], many = True)
+        return Response({'next': next_link, 'results': serializer.data})
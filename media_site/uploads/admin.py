@@ -0,0 +1,6 @@
+from django.contrib import admin
+from .models import UploadSession
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'kind', 'size', 'status', 'created_date']
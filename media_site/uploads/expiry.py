@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import UploadSession
+
+SWEEP_KEY = 'uploads:sweep'
+
+
+def expired_sessions(now=None):
+    """
+    Unfinished uploads idle for CHUNKED_UPLOAD_EXPIRY seconds: open ones
+    that received nothing, and completions whose process died
+    """
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY)
+    return UploadSession.objects.filter(
+        status__in=[UploadSession.OPEN, UploadSession.COMPLETING], updated_date__lt=cutoff,
+    )
+
+
+def expire_sessions(now=None):
+    """Delete abandoned uploads and their part files; returns how many"""
+    count = 0
+    for session in expired_sessions(now).iterator():
+        session.discard()
+        count += 1
+    return count
+
+
+def sweep_expired():
+    """
+    expire_sessions() at most once per CHUNKED_UPLOAD_SWEEP_INTERVAL. Called
+    when an upload starts, so it runs on the host holding the part files
+    without needing a scheduler.
+    """
+    if cache.add(SWEEP_KEY, True, settings.CHUNKED_UPLOAD_SWEEP_INTERVAL):
+        expire_sessions()
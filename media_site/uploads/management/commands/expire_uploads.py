@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from uploads.expiry import expire_sessions, expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked and direct uploads left open for longer than CHUNKED_UPLOAD_EXPIRY, with their part files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list the expired uploads')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            for session in expired_sessions():
+                self.stdout.write(f"  {session.pk} {session.filename} (last chunk {session.updated_date:%Y-%m-%d %H:%M})")
+            return
+        count = expire_sessions()
+        self.stdout.write(self.style.SUCCESS(f"{count} expired uploads deleted"))
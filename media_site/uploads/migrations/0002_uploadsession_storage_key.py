@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='storage_key',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
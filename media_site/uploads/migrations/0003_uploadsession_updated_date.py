@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0002_uploadsession_storage_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='updated_date',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0003_uploadsession_updated_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('completing', 'Completing'), ('complete', 'Complete')], default='open', max_length=10),
+        ),
+    ]
@@ -0,0 +1,96 @@
+import os
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+
+class UploadSession(models.Model):
+    """
+    A resumable upload: chunks are written into a preallocated part file
+    at their offsets and the media row is created once every byte arrived.
+
+    Direct uploads set `storage_key` instead: the client PUTs the whole
+    file to a presigned object-storage URL and never sends bytes to us.
+    """
+    KIND_CHOICES = [
+        ('audio', 'Audio'),
+        ('video', 'Video'),
+    ]
+    # The model and file field each kind creates
+    TARGETS = {
+        'audio': ('audio.AudioFile', 'audio_file'),
+        'video': ('video.VideoFile', 'video_file'),
+    }
+    OPEN = 'open'
+    # Claimed by a complete request that is hashing and storing the file
+    COMPLETING = 'completing'
+    COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (OPEN, 'Open'),
+        (COMPLETING, 'Completing'),
+        (COMPLETE, 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=OPEN)
+    object_id = models.PositiveBigIntegerField(blank=True, null=True)
+    storage_key = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    created_date = models.DateTimeField(auto_now_add=True)
+    # Touched by every chunk and by the completion claim; an unfinished
+    # session idle for CHUNKED_UPLOAD_EXPIRY is abandoned
+    updated_date = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+    @property
+    def part_path(self):
+        return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{self.id}.part")
+
+    def target_storage(self):
+        model, field = self.TARGETS[self.kind]
+        return apps.get_model(model)._meta.get_field(field).storage
+
+    def discard(self):
+        """Delete the session along with the bytes it received"""
+        if os.path.exists(self.part_path):
+            os.unlink(self.part_path)
+        # An open direct upload's object belongs to no row yet
+        if self.storage_key and self.status == self.OPEN:
+            storage = self.target_storage()
+            if storage.exists(self.storage_key):
+                storage.delete(self.storage_key)
+        self.delete()
+
+    def received_chunks(self):
+        # A chunk without a checksum is still being written
+        return self.chunks.exclude(sha256='')
+
+    def received_bytes(self):
+        return self.received_chunks().aggregate(total=models.Sum('length'))['total'] or 0
+
+    def is_covered(self):
+        """Whether the received chunks, in offset order, tile [0, size) exactly"""
+        position = 0
+        for offset, length in self.received_chunks().order_by('offset').values_list('offset', 'length'):
+            if offset != position:
+                return False
+            position += length
+        return position == self.size
+
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, related_name='chunks', on_delete=models.CASCADE)
+    offset = models.PositiveBigIntegerField()
+    length = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'offset'], name='upload_chunk_offset_unique'),
+        ]
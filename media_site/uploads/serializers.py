@@ -0,0 +1,39 @@
+from django.conf import settings
+from rest_framework import serializers
+from .models import UploadSession
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    received = serializers.SerializerMethodField()
+    chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'kind', 'filename', 'size', 'status', 'object_id', 'received', 'chunks', 'created_date', 'updated_date']
+        read_only_fields = ['id', 'status', 'object_id', 'created_date', 'updated_date']
+
+    def get_received(self, obj):
+        return obj.received_bytes()
+
+    def get_chunks(self, obj):
+        # Lets a client work out which ranges still need to be (re)sent
+        return list(obj.received_chunks().order_by('offset').values('offset', 'length'))
+
+    def validate_size(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Size must be positive.")
+        if value > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError("File is too large.")
+        return value
+
+
+class DirectUploadSerializer(UploadSessionSerializer):
+    content_type = serializers.CharField(max_length=100, write_only=True)
+
+    class Meta(UploadSessionSerializer.Meta):
+        fields = UploadSessionSerializer.Meta.fields + ['content_type']
+
+
+class UploadCompleteSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField()
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False)
@@ -0,0 +1,237 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from audio.models import AudioFile
+from core.media_scan import find_orphan_parts
+from core.s3 import MediaS3Storage
+from core.tests import TempMediaMixin
+from .expiry import expire_sessions, sweep_expired
+from .models import UploadChunk, UploadSession
+
+CONTENT = bytes(range(256)) * 4
+
+
+class ChunkedUploadTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        part_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, part_dir, ignore_errors=True)
+        settings_override = override_settings(CHUNKED_UPLOAD_DIR=part_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('uploader', password='x'))
+        response = self.client.post('/api/uploads/', {'kind': 'audio', 'filename': 'track.mp3', 'size': len(CONTENT)})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.session = UploadSession.objects.get(pk=response.json()['id'])
+
+    def send(self, offset, length, **headers):
+        return self.client.put(
+            f'/api/uploads/{self.session.pk}/?offset={offset}', CONTENT[offset:offset + length],
+            content_type='application/octet-stream', **headers,
+        )
+
+    def complete(self, **data):
+        return self.client.post(
+            f'/api/uploads/{self.session.pk}/complete/', {'title': 'Track', 'description': 'd', **data},
+        )
+
+    def test_out_of_order_chunks_complete_the_upload(self):
+        for offset in (768, 0, 512, 256):
+            self.assertEqual(self.send(offset, 256).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.complete(sha256=hashlib.sha256(CONTENT).hexdigest())
+        self.assertEqual(response.status_code, 201, response.content)
+
+        audio = AudioFile.objects.get(pk=response.json()['id'])
+        with audio.audio_file.open('rb') as f:
+            self.assertEqual(f.read(), CONTENT)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, UploadSession.COMPLETE)
+        self.assertFalse(os.path.exists(self.session.part_path))
+
+    def test_overlapping_chunk_is_refused(self):
+        self.assertEqual(self.send(0, 512).status_code, 200)
+        self.assertEqual(self.send(256, 512).status_code, 409)
+        # Resending at the same offset replaces the chunk
+        self.assertEqual(self.send(0, 256).status_code, 200)
+        self.assertEqual(list(self.session.chunks.values_list('offset', 'length')), [(0, 256)])
+
+    def test_chunk_outside_the_file_is_refused(self):
+        response = self.client.put(
+            f'/api/uploads/{self.session.pk}/?offset=1000', b'x' * 256, content_type='application/octet-stream',
+        )
+        self.assertEqual(response.status_code, 416)
+
+    def test_checksum_mismatch_drops_the_chunk(self):
+        response = self.send(0, 256, HTTP_X_CHUNK_SHA256='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.session.chunks.exists())
+
+    def test_completion_needs_chunks_tiling_the_whole_file(self):
+        self.send(0, 256)
+        self.send(512, 512)
+        self.assertEqual(self.complete().status_code, 409)
+
+        # Bytes adding up to the size aren't enough when a range is missing
+        UploadChunk.objects.filter(session=self.session).delete()
+        for offset, length in ((0, 512), (256, 256), (768, 256)):
+            UploadChunk.objects.create(session=self.session, offset=offset, length=length, sha256='f' * 64)
+        self.assertEqual(self.session.received_bytes(), len(CONTENT))
+        self.assertFalse(self.session.is_covered())
+        self.assertEqual(self.complete().status_code, 409)
+
+    def test_chunk_still_being_written_does_not_count(self):
+        for offset in (0, 256, 512):
+            self.send(offset, 256)
+        UploadChunk.objects.create(session=self.session, offset=768, length=256, sha256='')
+        self.assertFalse(self.session.is_covered())
+        self.assertEqual(self.complete().status_code, 409)
+
+    def test_chunk_replaced_while_written_is_refused(self):
+        pwrite = os.pwrite
+
+        def resend_meanwhile(fd, data, offset):
+            # A resend of a shorter chunk at the same offset takes the reservation
+            UploadChunk.objects.filter(session=self.session, offset=0).update(length=128)
+            return pwrite(fd, data, offset)
+
+        with mock.patch('uploads.views.os.pwrite', side_effect=resend_meanwhile):
+            self.assertEqual(self.send(0, 256).status_code, 409)
+        self.assertFalse(self.session.received_chunks().exists())
+
+    def test_completing_session_refuses_chunks_and_repeats(self):
+        for offset in (0, 256, 512, 768):
+            self.send(offset, 256)
+        UploadSession.objects.filter(pk=self.session.pk).update(status=UploadSession.COMPLETING)
+        self.assertEqual(self.send(0, 256).status_code, 409)
+        self.assertEqual(self.complete().status_code, 409)
+
+    def test_failed_completion_reopens_the_session(self):
+        for offset in (0, 256, 512, 768):
+            self.send(offset, 256)
+        self.assertEqual(self.complete(sha256='0' * 64).status_code, 400)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, UploadSession.OPEN)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.complete().status_code, 201)
+
+    def test_abandoned_sessions_expire_with_their_part_files(self):
+        self.send(0, 256)
+        part_path = self.session.part_path
+        self.assertTrue(os.path.exists(part_path))
+
+        with self.settings(CHUNKED_UPLOAD_EXPIRY=3600):
+            self.assertEqual(expire_sessions(), 0)
+            UploadSession.objects.filter(pk=self.session.pk).update(updated_date=timezone.now() - timedelta(hours=2))
+            self.assertEqual(expire_sessions(), 1)
+        self.assertFalse(UploadSession.objects.filter(pk=self.session.pk).exists())
+        self.assertFalse(os.path.exists(part_path))
+
+    def test_a_chunk_keeps_the_session_alive(self):
+        UploadSession.objects.filter(pk=self.session.pk).update(updated_date=timezone.now() - timedelta(hours=2))
+        self.send(0, 256)
+        with self.settings(CHUNKED_UPLOAD_EXPIRY=3600):
+            self.assertEqual(expire_sessions(), 0)
+
+    def test_sweep_runs_once_per_interval(self):
+        UploadSession.objects.filter(pk=self.session.pk).update(updated_date=timezone.now() - timedelta(days=2))
+        cache.delete('uploads:sweep')
+        sweep_expired()
+        self.assertFalse(UploadSession.objects.exists())
+
+        stale = UploadSession.objects.create(kind='audio', filename='b.mp3', size=1, created_by=self.session.created_by)
+        UploadSession.objects.filter(pk=stale.pk).update(updated_date=timezone.now() - timedelta(days=2))
+        sweep_expired()
+        self.assertTrue(UploadSession.objects.filter(pk=stale.pk).exists())
+
+    def test_scan_leaves_part_files_of_unfinished_sessions(self):
+        hour_ago = time.time() - 3600
+        os.utime(self.session.part_path, (hour_ago, hour_ago))
+        for session_status in (UploadSession.OPEN, UploadSession.COMPLETING):
+            UploadSession.objects.filter(pk=self.session.pk).update(status=session_status)
+            self.assertEqual(list(find_orphan_parts(min_age=60)), [])
+        UploadSession.objects.filter(pk=self.session.pk).update(status=UploadSession.COMPLETE)
+        self.assertEqual([path for path, _ in find_orphan_parts(min_age=60)], [self.session.part_path])
+
+
+@override_settings(PRESIGNED_URL_EXPIRY=900)
+class DirectUploadTests(TestCase):
+    def setUp(self):
+        self.storage = MediaS3Storage(
+            bucket_name='media', location='site', region_name='eu-west-1',
+            access_key='AKIAEXAMPLE', secret_key='secret', file_overwrite=False,
+        )
+        patcher = mock.patch.object(AudioFile._meta.get_field('audio_file'), 'storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user('uploader', password='x'))
+
+    def start(self, **data):
+        return self.client.post('/api/uploads/direct/', {
+            'kind': 'audio', 'filename': 'My track.mp3', 'size': len(CONTENT), 'content_type': 'audio/mpeg', **data,
+        })
+
+    def test_returns_a_presigned_put_for_the_content_type(self):
+        client = self.storage.connection.meta.client
+        with mock.patch.object(client, 'generate_presigned_url', return_value='https://media.example/signed') as presign:
+            response = self.start()
+        self.assertEqual(response.status_code, 201, response.content)
+        session = UploadSession.objects.get(pk=response.json()['id'])
+        self.assertRegex(session.storage_key, r'^audio_files/[0-9a-f]{32}/My_track\.mp3$')
+        presign.assert_called_once_with(
+            'put_object',
+            Params={'Bucket': 'media', 'Key': f'site/{session.storage_key}', 'ContentType': 'audio/mpeg'},
+            ExpiresIn=900,
+        )
+        self.assertEqual(response.json()['upload'], {
+            'method': 'PUT',
+            'url': 'https://media.example/signed',
+            'headers': {'Content-Type': 'audio/mpeg'},
+            'expires_in': 900,
+        })
+
+    def test_each_upload_gets_its_own_key(self):
+        keys = {UploadSession.objects.get(pk=self.start().json()['id']).storage_key for _ in range(2)}
+        self.assertEqual(len(keys), 2)
+
+    def test_content_type_is_required(self):
+        response = self.client.post('/api/uploads/direct/', {'kind': 'audio', 'filename': 'a.mp3', 'size': 10})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('content_type', response.json())
+
+    def test_needs_object_storage(self):
+        with mock.patch.object(AudioFile._meta.get_field('audio_file'), 'storage', FileSystemStorage()):
+            self.assertEqual(self.start().status_code, 501)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_completion_waits_for_the_object(self):
+        session = UploadSession.objects.get(pk=self.start().json()['id'])
+        complete = f'/api/uploads/{session.pk}/complete/'
+        with mock.patch.object(self.storage, 'exists', return_value=False):
+            self.assertEqual(self.client.post(complete, {'title': 'Track', 'description': 'd'}).status_code, 409)
+        session.refresh_from_db()
+        self.assertEqual(session.status, UploadSession.OPEN)
+
+        with mock.patch.object(self.storage, 'exists', return_value=True), \
+                mock.patch.object(self.storage, 'size', return_value=len(CONTENT)):
+            response = self.client.post(complete, {'title': 'Track', 'description': 'd'})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(AudioFile.objects.get(pk=response.json()['id']).audio_file.name, session.storage_key)
+        session.refresh_from_db()
+        self.assertEqual(session.status, UploadSession.COMPLETE)
@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import UploadSessionListAPIView, DirectUploadAPIView, UploadSessionDetailAPIView, UploadSessionCompleteAPIView
+
+urlpatterns = [
+    path('', UploadSessionListAPIView.as_view(), name = 'upload_list'),
+    path('direct/', DirectUploadAPIView.as_view(), name = 'upload_direct'),
+    path('<uuid:pk>/', UploadSessionDetailAPIView.as_view(), name = 'upload_detail'),
+    path('<uuid:pk>/complete/', UploadSessionCompleteAPIView.as_view(), name = 'upload_complete'),
+]
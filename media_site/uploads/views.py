@@ -0,0 +1,271 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import F
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from audio.serializers import AudioFileSerializer
+from core.storage import direct_upload_key, presigned_upload_url, supports_presigned_upload
+from video.serializer import VideoFileSerializer
+from .expiry import sweep_expired
+from .models import UploadChunk, UploadSession
+from .serializers import DirectUploadSerializer, UploadCompleteSerializer, UploadSessionSerializer
+
+MEDIA_SERIALIZERS = {
+    'audio': (AudioFileSerializer, 'audio_file'),
+    'video': (VideoFileSerializer, 'video_file'),
+}
+
+BLOCK_SIZE = 64 * 1024
+
+
+class AssembledUpload(UploadedFile):
+    """
+    The finished part file, handed to the media serializer like a normal
+    upload. temporary_file_path() lets FileSystemStorage move it into
+    place instead of copying it.
+    """
+    def temporary_file_path(self):
+        return self.file.name
+
+
+class UploadSessionListAPIView(APIView):
+    """
+    Start a chunked upload
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = UploadSessionSerializer(data = request.data)
+        if serializer.is_valid():
+            sweep_expired()
+            session = serializer.save(created_by = request.user)
+            os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+            # Preallocate so chunks can be written at any offset, in any order
+            with open(session.part_path, 'wb') as part:
+                part.truncate(session.size)
+            return Response(UploadSessionSerializer(session).data, status = status.HTTP_201_CREATED)
+        return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+
+
+class DirectUploadAPIView(APIView):
+    """
+    Start a direct upload: returns a presigned URL the client PUTs the file
+    to, then the client calls complete/ as for a chunked upload
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = DirectUploadSerializer(data = request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+
+        serializer_class, file_field = MEDIA_SERIALIZERS[serializer.validated_data['kind']]
+        model_field = serializer_class.Meta.model._meta.get_field(file_field)
+        storage = model_field.storage
+        if not supports_presigned_upload(storage):
+            return Response({'detail': 'Direct uploads need object storage (MEDIA_STORAGE=s3); use chunked uploads.'}, status = status.HTTP_501_NOT_IMPLEMENTED)
+
+        content_type = serializer.validated_data.pop('content_type')
+        key = direct_upload_key(model_field.upload_to, serializer.validated_data['filename'])
+        session = serializer.save(created_by = request.user, storage_key = key)
+        data = UploadSessionSerializer(session).data
+        data['upload'] = {
+            'method': 'PUT',
+            'url': presigned_upload_url(storage, key, content_type),
+            'headers': {'Content-Type': content_type},
+            'expires_in': settings.PRESIGNED_URL_EXPIRY,
+        }
+        return Response(data, status = status.HTTP_201_CREATED)
+
+
+class UploadSessionDetailAPIView(APIView):
+    """
+    Check progress, send a chunk, or abort an upload
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self, request, pk):
+        return get_object_or_404(UploadSession, pk=pk, created_by=request.user)
+
+    def get(self, request, pk):
+        session = self.get_object(request, pk)
+        return Response(UploadSessionSerializer(session).data)
+
+    def put(self, request, pk):
+        """
+        Write the raw request body at ?offset=. Chunks may arrive in parallel
+        and out of order; resending a chunk at the same offset replaces it.
+        An optional X-Chunk-SHA256 header is checked against the bytes received.
+        """
+        session = self.get_object(request, pk)
+        if session.status != UploadSession.OPEN:
+            return Response({'detail': 'Upload is already complete.'}, status = status.HTTP_409_CONFLICT)
+        if session.storage_key:
+            return Response({'detail': 'Direct uploads go to the presigned URL.'}, status = status.HTTP_400_BAD_REQUEST)
+
+        try:
+            offset = int(request.query_params['offset'])
+            length = int(request.META['CONTENT_LENGTH'])
+        except (KeyError, ValueError):
+            return Response({'detail': 'offset and Content-Length are required.'}, status = status.HTTP_400_BAD_REQUEST)
+        if length < 1 or length > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+            return Response({'detail': 'Invalid chunk size.'}, status = status.HTTP_400_BAD_REQUEST)
+        end = offset + length
+        if offset < 0 or end > session.size:
+            return Response({'detail': 'Chunk is outside the file.'}, status = status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+        with transaction.atomic():
+            # Locking the session row serializes the overlap check and the
+            # reservation below, so parallel chunks can't both claim a range
+            session = get_object_or_404(UploadSession.objects.select_for_update(), pk=session.pk)
+            if session.status != UploadSession.OPEN:
+                return Response({'detail': 'Upload is already complete.'}, status = status.HTTP_409_CONFLICT)
+            overlapping = session.chunks.exclude(offset=offset).annotate(
+                end=F('offset') + F('length')
+            ).filter(offset__lt=end, end__gt=offset)
+            if overlapping.exists():
+                return Response({'detail': 'Chunk overlaps a received chunk.'}, status = status.HTTP_409_CONFLICT)
+            # Reserved without a checksum until its bytes are on disk
+            UploadChunk.objects.update_or_create(
+                session=session, offset=offset,
+                defaults={'length': length, 'sha256': ''},
+            )
+            session.save(update_fields=['updated_date'])
+
+        # Stream the body to disk, hashing as we go
+        digest = hashlib.sha256()
+        written = 0
+        fd = os.open(session.part_path, os.O_WRONLY)
+        try:
+            while written < length:
+                block = request.stream.read(min(BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                os.pwrite(fd, block, offset + written)
+                digest.update(block)
+                written += len(block)
+        finally:
+            os.close(fd)
+
+        checksum = digest.hexdigest()
+        expected = request.META.get('HTTP_X_CHUNK_SHA256')
+        if written != length or (expected and expected.lower() != checksum):
+            # The bytes on disk at this offset are no longer trustworthy
+            session.chunks.filter(offset=offset).delete()
+            if written != length:
+                return Response({'detail': 'Chunk body is shorter than Content-Length.'}, status = status.HTTP_400_BAD_REQUEST)
+            return Response({'detail': 'Chunk checksum mismatch.'}, status = status.HTTP_400_BAD_REQUEST)
+
+        if not session.chunks.filter(offset=offset, length=length, sha256='').update(sha256=checksum):
+            # A resend at this offset replaced the reservation while these
+            # bytes were written; whichever finished last is on disk
+            return Response({'detail': 'Chunk was replaced by another request; send it again.'}, status = status.HTTP_409_CONFLICT)
+        return Response({'offset': offset, 'length': length, 'sha256': checksum})
+
+    def delete(self, request, pk):
+        session = self.get_object(request, pk)
+        session.discard()
+        return Response(status = status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionCompleteAPIView(APIView):
+    """
+    Finish an upload and create the audio or video record from it
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        details = UploadCompleteSerializer(data = request.data)
+        if not details.is_valid():
+            return Response(details.errors, status = status.HTTP_400_BAD_REQUEST)
+
+        # Claim the session under a short lock. Once it is COMPLETING, chunks
+        # and repeated requests are refused, so the file (up to
+        # CHUNKED_UPLOAD_MAX_SIZE) is hashed and stored without holding the
+        # row lock or a transaction open
+        with transaction.atomic():
+            session = get_object_or_404(UploadSession.objects.select_for_update(), pk=pk, created_by=request.user)
+            if session.status != UploadSession.OPEN:
+                return Response({'detail': 'Upload is already complete.'}, status = status.HTTP_409_CONFLICT)
+            if not session.storage_key and not session.is_covered():
+                return Response(UploadSessionSerializer(session).data, status = status.HTTP_409_CONFLICT)
+            session.status = UploadSession.COMPLETING
+            session.save(update_fields=['status', 'updated_date'])
+
+        response = None
+        try:
+            response = self.complete(session, details.validated_data)
+        finally:
+            if response is None or response.status_code != status.HTTP_201_CREATED:
+                # Let the client fix the problem and complete again
+                UploadSession.objects.filter(pk=session.pk, status=UploadSession.COMPLETING).update(status=UploadSession.OPEN)
+        return response
+
+    def complete(self, session, details):
+        serializer_class, file_field = MEDIA_SERIALIZERS[session.kind]
+        if session.storage_key:
+            return self.complete_direct(session, details, serializer_class, file_field)
+
+        # Chunks arrive out of order, so the whole-file hash is taken once
+        # here; it both verifies the upload and names the stored blob
+        checksum = file_sha256(session.part_path)
+        expected = details.get('sha256')
+        if expected and expected.lower() != checksum:
+            return Response({'detail': 'File checksum mismatch.'}, status = status.HTTP_400_BAD_REQUEST)
+
+        with open(session.part_path, 'rb') as part:
+            upload = AssembledUpload(part, name=session.filename, size=session.size)
+            upload.sha256 = checksum
+            serializer = serializer_class(data = {
+                'title': details['title'],
+                'description': details['description'],
+                file_field: upload,
+            })
+            if not serializer.is_valid():
+                return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+            instance = serializer.save()
+        finish(session, instance)
+
+        # The storage backend normally moves the part file; remove any leftover copy
+        if os.path.exists(session.part_path):
+            os.unlink(session.part_path)
+        return Response(serializer.data, status = status.HTTP_201_CREATED)
+
+    def complete_direct(self, session, details, serializer_class, file_field):
+        storage = serializer_class.Meta.model._meta.get_field(file_field).storage
+        if not storage.exists(session.storage_key) or storage.size(session.storage_key) != session.size:
+            return Response({'detail': 'The file has not been uploaded to storage yet.'}, status = status.HTTP_409_CONFLICT)
+
+        # The object is already in place: validate the metadata only and point
+        # the new row at the existing key instead of uploading anything
+        serializer = serializer_class(data = {
+            'title': details['title'],
+            'description': details['description'],
+        }, partial = True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+        instance = serializer.save(**{file_field: session.storage_key})
+        finish(session, instance)
+        return Response(serializer.data, status = status.HTTP_201_CREATED)
+
+
+def finish(session, instance):
+    session.status = UploadSession.COMPLETE
+    session.object_id = instance.pk
+    session.save(update_fields=['status', 'object_id'])
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -3,4 +3,4 @@ from .models import VideoFile
 
 @admin.register(VideoFile)
 class VideoFileAdminn(admin.ModelAdmin):
-    list_display = ['title', 'uploaded_date']
+    list_display = ['title', 'uploaded_date', 'duration', 'codec', 'height', 'file_size']
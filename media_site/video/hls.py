@@ -0,0 +1,134 @@
+import os
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+
+from core.media import precompress
+from core.probe import read_metadata
+from core.storage import media_source
+
+from .models import VideoFile, VideoRendition
+
+# What rendition_command() encodes, for the master playlist's CODECS:
+# H.264 Main profile, level 4.2 (up to 1080p60), and AAC-LC
+VIDEO_CODEC = 'avc1.4d402a'
+AUDIO_CODEC = 'mp4a.40.2'
+
+
+def rendition_command(source, out_dir, height, video_kbps, audio_kbps):
+    """ffmpeg arguments for one VOD variant: <height>.m3u8 plus <height>_NNN.ts segments"""
+    return [
+        settings.FFMPEG_BINARY, '-i', source,
+        '-vf', f'scale=-2:{height}',
+        '-c:v', 'libx264', '-preset', 'veryfast',
+        '-profile:v', 'main', '-level:v', '4.2', '-pix_fmt', 'yuv420p',
+        '-b:v', f'{video_kbps}k', '-maxrate', f'{video_kbps}k', '-bufsize', f'{video_kbps * 2}k',
+        '-c:a', 'aac', '-b:a', f'{audio_kbps}k',
+        '-hls_time', str(settings.VIDEO_HLS_SEGMENT_SECONDS),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(out_dir, f'{height}_%03d.ts'),
+        os.path.join(out_dir, f'{height}.m3u8'),
+        '-y',
+    ]
+
+
+def even(value):
+    # Rounded down, like scale=-2: H.264 needs even dimensions
+    return max(2, int(value) // 2 * 2)
+
+
+def source_size(video):
+    """(width, height) of the source, probing it when the metadata job hasn't yet"""
+    if not (video.width and video.height):
+        metadata = read_metadata(video.video_file)
+        return metadata.get('width'), metadata.get('height')
+    return video.width, video.height
+
+
+def ladder_for(width, height, ladder):
+    """
+    The (height, width, video kbit/s, audio kbit/s) rungs worth encoding
+    for a `width` x `height` source: none taller than the source, since
+    upscaling only costs bytes. A source smaller than every rung gets one
+    rung at its own size. Widths keep the source's aspect ratio (16:9 when
+    it is unknown), as scale=-2:<height> does.
+    """
+    rungs = [rung for rung in ladder if not height or rung[0] <= height]
+    if not rungs:
+        _, video_kbps, audio_kbps = min(ladder)
+        rungs = [(even(height), video_kbps, audio_kbps)]
+    aspect = width / height if width and height else 16 / 9
+    return [(rung_height, even(rung_height * aspect), video_kbps, audio_kbps) for rung_height, video_kbps, audio_kbps in rungs]
+
+
+def master_playlist(renditions):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for height, width, video_kbps, audio_kbps in renditions:
+        bandwidth = (video_kbps + audio_kbps) * 1000
+        lines.append(
+            f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={width}x{height},'
+            f'CODECS="{VIDEO_CODEC},{AUDIO_CODEC}",NAME="{height}p"'
+        )
+        lines.append(f'{height}.m3u8')
+    return '\n'.join(lines) + '\n'
+
+
+def transcode_hls(video):
+    """
+    Build the HLS ladder for `video` and store it under video_hls/<pk>/.
+
+    Each rendition is encoded into a scratch directory, then every file is
+    pushed through the video file's storage backend. Rendition rows track
+    progress so a retry only redoes the rungs that did not finish.
+    """
+    storage = video.video_file.storage
+    prefix = f'video_hls/{video.pk}'
+    ladder = ladder_for(*source_size(video), settings.VIDEO_HLS_RENDITIONS)
+    # Rungs an earlier ladder had but this source shouldn't
+    video.renditions.exclude(height__in=[rung[0] for rung in ladder]).delete()
+
+    for height, _, video_kbps, audio_kbps in ladder:
+        rendition, _ = VideoRendition.objects.get_or_create(
+            video=video, height=height, defaults={'bitrate': video_kbps}
+        )
+        if rendition.status == VideoFile.STATUS_READY and rendition.bitrate == video_kbps:
+            continue
+
+        rendition.bitrate = video_kbps
+        rendition.status = VideoFile.STATUS_PROCESSING
+        rendition.save(update_fields=['bitrate', 'status'])
+        try:
+            with tempfile.TemporaryDirectory() as out_dir:
+                cmd = rendition_command(media_source(video.video_file), out_dir, height, video_kbps, audio_kbps)
+                # A stuck ffmpeg fails the rung, and the job retries it
+                subprocess.run(cmd, check=True, capture_output=True, timeout=settings.VIDEO_HLS_TIMEOUT)
+                for name in sorted(os.listdir(out_dir)):
+                    store(storage, f'{prefix}/{name}', os.path.join(out_dir, name))
+        except Exception:
+            rendition.status = VideoFile.STATUS_FAILED
+            rendition.save(update_fields=['status'])
+            raise
+
+        rendition.playlist = f'{prefix}/{height}.m3u8'
+        rendition.status = VideoFile.STATUS_READY
+        rendition.save(update_fields=['playlist', 'status'])
+
+    with tempfile.NamedTemporaryFile('w', suffix='.m3u8', delete=False) as master:
+        master.write(master_playlist(ladder))
+    try:
+        store(storage, f'{prefix}/master.m3u8', master.name)
+    finally:
+        os.unlink(master.name)
+    return f'{prefix}/master.m3u8'
+
+
+def store(storage, name, path):
+    # Overwrite rather than let the storage pick a new name: playlists
+    # refer to their segments by these exact names.
+    if storage.exists(name):
+        storage.delete(name)
+    with open(path, 'rb') as f:
+        storage.save(name, File(f))
+    precompress(storage, name)
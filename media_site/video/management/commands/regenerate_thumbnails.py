@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q
+
+from core.cache import bump_version
+from core.media import store_hashed
+from core.storage import media_source
+from jobs.queue import enqueue
+from video.models import VideoFile
+from video.thumbnails import seek_offset, thumbnail_policy, try_extract_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Regenerate video thumbnails that are missing, failed or made with an older policy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Concurrent ffmpeg runs (default: one per core)')
+        parser.add_argument('--threads', action='store_true', help='Use a thread pool instead of processes')
+        parser.add_argument('--batch-size', type=int, default=100, help='Videos handed to the pool and saved per batch')
+        parser.add_argument('--all', action='store_true', help='Regenerate current thumbnails too')
+        parser.add_argument(
+            '--checkpoint', default=os.path.join(settings.BASE_DIR, '.regenerate_thumbnails.json'),
+            help='Progress file; an interrupted run resumes from it',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over')
+
+    def handle(self, *args, **options):
+        policy = thumbnail_policy()
+        path = options['checkpoint']
+        state = {'policy': policy, 'all': options['all'], 'last_pk': 0, 'done': 0, 'failed': []}
+        saved = None if options['restart'] else read_checkpoint(path)
+        if saved and saved.get('policy') == policy and saved.get('all') == options['all']:
+            state = saved
+            self.stdout.write(f"Resuming after video {state['last_pk']} ({state['done']} done, {len(state['failed'])} failed)")
+
+        rows = VideoFile.objects.exclude(video_file='')
+        if not options['all']:
+            rows = rows.filter(Q(thumbnail='') | Q(thumbnail__isnull=True) | ~Q(thumbnail_policy=policy))
+        else:
+            # Rows sharing a file are updated with the lowest pk among them
+            rows = rows.exclude(Exists(VideoFile.objects.filter(video_file=OuterRef('video_file'), pk__lt=OuterRef('pk'))))
+        rows = rows.order_by('pk').only('pk', 'video_file', 'thumbnail', 'duration')
+
+        workers = max(1, options['workers'])
+        executor = ThreadPoolExecutor(workers) if options['threads'] else ProcessPoolExecutor(workers)
+        with executor, tempfile.TemporaryDirectory() as scratch:
+            while batch := list(rows.filter(pk__gt=state['last_pk'])[:options['batch_size']]):
+                self.run_batch(batch, executor, scratch, policy, state, options)
+                state['last_pk'] = batch[-1].pk
+                write_checkpoint(path, state)
+                self.stdout.write(f"Up to video {state['last_pk']}: {state['done']} regenerated, {len(state['failed'])} failed")
+
+        # A finished run leaves nothing to resume
+        if os.path.exists(path):
+            os.unlink(path)
+        self.stdout.write(self.style.SUCCESS(f"{state['done']} thumbnails regenerated, {len(state['failed'])} failed"))
+
+    def run_batch(self, batch, executor, scratch, policy, state, options):
+        # Rows sharing a stored file (core/blobs.py) share one thumbnail
+        groups = {}
+        for video in batch:
+            groups.setdefault(video.video_file.name, []).append(video)
+        tasks = [
+            (
+                settings.FFMPEG_BINARY, media_source(videos[0].video_file),
+                os.path.join(scratch, f'{videos[0].pk}.jpg'), seek_offset(videos[0].duration),
+                settings.VIDEO_THUMBNAIL_WIDTH, settings.VIDEO_THUMBNAIL_FRAMES,
+            )
+            for videos in groups.values()
+        ]
+        if not options['threads']:
+            # Forked workers must not inherit the parent's open DB connections
+            connections.close_all()
+
+        for (name, videos), task, error in zip(groups.items(), tasks, executor.map(try_extract_thumbnail, tasks)):
+            out_path = task[2]
+            if error:
+                self.stderr.write(f"video {videos[0].pk}: {error}")
+                state['failed'].extend(video.pk for video in videos)
+                # A row that has no thumbnail at all is reported as failed;
+                # an outdated one keeps serving its old thumbnail
+                failed = VideoFile.objects.filter(video_file=name).filter(Q(thumbnail='') | Q(thumbnail__isnull=True))
+                pks = list(failed.values_list('pk', flat=True))
+                VideoFile.objects.filter(pk__in=pks).update(thumbnail_status=VideoFile.STATUS_FAILED)
+                for pk in pks:
+                    bump_version('video', pk)
+            else:
+                state['done'] += self.save_thumbnail(name, videos[0], out_path, policy)
+            if os.path.exists(out_path):
+                os.unlink(out_path)
+
+        # Queryset updates skip post_save, so drop cached responses here
+        bump_version('video')
+
+    def save_thumbnail(self, name, video, out_path, policy):
+        """Store the new thumbnail on every row using the video file; returns how many"""
+        twins = VideoFile.objects.filter(video_file=name)
+        old_names = set(twins.exclude(thumbnail='').exclude(thumbnail__isnull=True).values_list('thumbnail', flat=True))
+        with open(out_path, 'rb') as f:
+            video.thumbnail.name = store_hashed(video.thumbnail.storage, 'video_thumbnails/', f.read(), '.jpg')
+
+        pks = list(twins.values_list('pk', flat=True))
+        VideoFile.objects.filter(pk__in=pks).update(
+            thumbnail=video.thumbnail.name,
+            thumbnail_status=VideoFile.STATUS_READY,
+            thumbnail_policy=policy,
+            thumbnail_derivatives={},
+        )
+        storage = video.thumbnail.storage
+        for old in old_names - {video.thumbnail.name}:
+            if not VideoFile.objects.filter(thumbnail=old).exists():
+                storage.delete(old)
+        for pk in pks:
+            bump_version('video', pk)
+            enqueue('video.thumbnail_derivatives', pk)
+        return len(pks)
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_checkpoint(path, state):
+    # Written whole then renamed, so a kill mid-write leaves the last good one
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video', '0003_alter_videofile_description'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='videofile',
+            index=models.Index(fields=['-uploaded_date', '-id'], name='video_uploaded_id_idx'),
+        ),
+    ]
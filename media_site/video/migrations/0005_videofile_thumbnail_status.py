@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:00
+
+from django.db import migrations, models
+
+
+def set_existing_status(apps, schema_editor):
+    # Rows from before the job queue were processed inline: either a thumbnail
+    # was written or the ffmpeg run failed.
+    VideoFile = apps.get_model('video', 'VideoFile')
+    VideoFile.objects.exclude(thumbnail='').exclude(thumbnail__isnull=True).update(thumbnail_status='ready')
+    VideoFile.objects.filter(thumbnail_status='pending').update(thumbnail_status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video', '0004_videofile_video_uploaded_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='thumbnail_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(set_existing_status, migrations.RunPython.noop),
+    ]
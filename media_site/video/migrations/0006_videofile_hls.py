@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def queue_existing_videos(apps, schema_editor):
+    # New uploads queue their own transcode; backfill the rows that predate it
+    VideoFile = apps.get_model('video', 'VideoFile')
+    Job = apps.get_model('jobs', 'Job')
+    Job.objects.bulk_create(
+        Job(kind='video.hls', object_id=pk)
+        for pk in VideoFile.objects.exclude(video_file='').values_list('pk', flat=True).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video', '0005_videofile_thumbnail_status'),
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='hls_playlist',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='videofile',
+            name='hls_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='VideoRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('height', models.PositiveIntegerField()),
+                ('bitrate', models.PositiveIntegerField(help_text='Video bitrate in kbit/s')),
+                ('playlist', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='video.videofile')),
+            ],
+            options={
+                'ordering': ['height'],
+                'constraints': [models.UniqueConstraint(fields=('video', 'height'), name='video_rendition_height_unique')],
+            },
+        ),
+        migrations.RunPython(queue_existing_videos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+def queue_existing_thumbnails(apps, schema_editor):
+    VideoFile = apps.get_model('video', 'VideoFile')
+    Job = apps.get_model('jobs', 'Job')
+    rows = VideoFile.objects.exclude(thumbnail='').exclude(thumbnail__isnull=True)
+    Job.objects.bulk_create(
+        Job(kind='video.thumbnail_derivatives', object_id=pk)
+        for pk in rows.values_list('pk', flat=True).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video', '0006_videofile_hls'),
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='thumbnail_derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(queue_existing_thumbnails, migrations.RunPython.noop),
+    ]
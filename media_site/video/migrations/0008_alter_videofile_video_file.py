@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:14
+
+import core.blobs
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video', '0007_videofile_thumbnail_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='videofile',
+            name='video_file',
+            field=core.blobs.ContentAddressedFileField(upload_to='video_files/'),
+        ),
+    ]
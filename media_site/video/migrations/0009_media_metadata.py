@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video', '0008_alter_videofile_video_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='bitrate',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videofile',
+            name='codec',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='videofile',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videofile',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videofile',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videofile',
+            name='metadata_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='videofile',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='videofile',
+            index=models.Index(fields=['duration'], name='video_duration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videofile',
+            index=models.Index(fields=['bitrate'], name='video_bitrate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videofile',
+            index=models.Index(fields=['codec'], name='video_codec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videofile',
+            index=models.Index(fields=['height'], name='video_height_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videofile',
+            index=models.Index(fields=['file_size'], name='video_file_size_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video', '0009_media_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videofile',
+            name='thumbnail_policy',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -1,61 +1,205 @@
+from django.conf import settings
 from django.db import models
 import os
 from PIL import Image
-import subprocess
 import tempfile
+from core.blobs import ContentAddressedFileField
+from core.cache import invalidate
+from core.media import store_hashed
+from core.storage import media_source
+from jobs.queue import enqueue
+from .thumbnails import extract_thumbnail, seek_offset, thumbnail_policy
 
 # ffmpeg -version
 # pip install ffmpeg-python
 
 class VideoFile(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     title = models.CharField(max_length=200)
-    video_file = models.FileField(upload_to='video_files/')
+    video_file = ContentAddressedFileField(upload_to='video_files/')
     thumbnail = models.ImageField(upload_to = 'video_thumbnails/', blank=True, null=True)
+    thumbnail_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # How `thumbnail` was made (video/thumbnails.py); a different value means outdated
+    thumbnail_policy = models.CharField(max_length=32, blank=True)
+    hls_playlist = models.CharField(max_length=255, blank=True)
+    hls_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # Resized copies of `thumbnail`, see core/images.py
+    thumbnail_derivatives = models.JSONField(default=dict, blank=True)
     description = models.TextField()
     uploaded_date = models.DateTimeField(auto_now_add = True)
+    # Technical metadata, probed by the job worker (core/probe.py)
+    duration = models.FloatField(null=True, blank=True)  # seconds
+    bitrate = models.PositiveIntegerField(null=True, blank=True)  # bits per second
+    codec = models.CharField(max_length=32, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)  # bytes
+    metadata_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+
+    METADATA_FIELDS = ['duration', 'bitrate', 'codec', 'width', 'height', 'file_size']
+
+    class Meta:
+        indexes = [
+            # Backs keyset pagination on (uploaded_date, id)
+            models.Index(fields=['-uploaded_date', '-id'], name='video_uploaded_id_idx'),
+            # Sorting and filtering on technical metadata (core/filters.py)
+            models.Index(fields=['duration'], name='video_duration_idx'),
+            models.Index(fields=['bitrate'], name='video_bitrate_idx'),
+            models.Index(fields=['codec'], name='video_codec_idx'),
+            models.Index(fields=['height'], name='video_height_idx'),
+            models.Index(fields=['file_size'], name='video_file_size_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored files as loaded, so a save can tell the video was replaced
+        loaded = dict(zip(field_names, values))
+        instance._saved_file = loaded.get('video_file', models.DEFERRED)
+        instance._saved_thumbnail = loaded.get('thumbnail', models.DEFERRED)
+        return instance
+
     def save(self, *args, **kwargs):
         # First save to get the file path
         super().save(*args, **kwargs)
-        
-        # Generate thumbnail if video file exists and no thumbnail yet
-        if self.video_file and not self.thumbnail:
-            self.generate_thumbnail()
+        self.queue_processing()
+
+    def queue_processing(self):
+        if self.file_replaced():
+            self.reset_processed()
+        if self.video_file:
+            self.reuse_processed()
+
+        # Queue thumbnail generation if video file exists and no thumbnail yet.
+        # The job worker (manage.py run_jobs) runs ffmpeg off the request path.
+        if self.video_file and not self.thumbnail and self.thumbnail_status == self.STATUS_PENDING:
+            enqueue('video.thumbnail', self.pk)
+
+        if self.thumbnail and self.thumbnail_derivatives.get('source') != self.thumbnail.name:
+            enqueue('video.thumbnail_derivatives', self.pk)
+
+        # Same for the HLS ladder (video/hls.py)
+        if self.video_file and self.hls_status == self.STATUS_PENDING:
+            enqueue('video.hls', self.pk)
+
+        if self.video_file and self.metadata_status == self.STATUS_PENDING:
+            enqueue('video.metadata', self.pk)
+
+    def file_replaced(self):
+        saved = getattr(self, '_saved_file', models.DEFERRED)
+        self._saved_file = self.video_file.name
+        return saved is not models.DEFERRED and saved != self.video_file.name
+
+    def reset_processed(self):
+        """
+        Metadata, the HLS ladder and a thumbnail taken from the previous
+        file are out of date: back to pending, so they are reused from a
+        twin or made again. A thumbnail uploaded along with the new file
+        is kept.
+        """
+        updates = {name: self._meta.get_field(name).get_default() for name in self.METADATA_FIELDS}
+        updates.update(metadata_status=self.STATUS_PENDING, hls_playlist='', hls_status=self.STATUS_PENDING)
+        if self.thumbnail.name == getattr(self, '_saved_thumbnail', None):
+            updates.update(
+                thumbnail='', thumbnail_status=self.STATUS_PENDING, thumbnail_policy='', thumbnail_derivatives={},
+            )
+        self._saved_thumbnail = updates.get('thumbnail', self.thumbnail.name)
+        self.renditions.all().delete()
+        VideoFile.objects.filter(pk=self.pk).update(**updates)
+        for name, value in updates.items():
+            setattr(self, name, value)
+        invalidate('video', self.pk)
+
+    def reuse_processed(self):
+        """
+        Identical uploads share one stored file (core/blobs.py), so copy the
+        thumbnail, HLS ladder and metadata from another row that already
+        has them instead of running ffmpeg again.
+        """
+        twins = VideoFile.objects.exclude(pk=self.pk).filter(video_file=self.video_file.name)
+        updates = {}
+        if not self.thumbnail and self.thumbnail_status == self.STATUS_PENDING:
+            donor = twins.filter(thumbnail_status=self.STATUS_READY).first()
+            if donor is not None and donor.thumbnail:
+                updates.update(
+                    thumbnail=donor.thumbnail.name,
+                    thumbnail_status=self.STATUS_READY,
+                    thumbnail_policy=donor.thumbnail_policy,
+                    thumbnail_derivatives=donor.thumbnail_derivatives,
+                )
+        if self.hls_status == self.STATUS_PENDING:
+            donor = twins.filter(hls_status=self.STATUS_READY).first()
+            if donor is not None:
+                updates.update(hls_playlist=donor.hls_playlist, hls_status=self.STATUS_READY)
+                VideoRendition.objects.bulk_create([
+                    VideoRendition(video=self, height=r.height, bitrate=r.bitrate, playlist=r.playlist, status=r.status)
+                    for r in donor.renditions.all()
+                ], ignore_conflicts=True)
+        if self.metadata_status == self.STATUS_PENDING:
+            donor = twins.filter(metadata_status=self.STATUS_READY).first()
+            if donor is not None:
+                updates.update({name: getattr(donor, name) for name in self.METADATA_FIELDS})
+                updates['metadata_status'] = self.STATUS_READY
+        if not updates:
+            return
+
+        # Queryset update: save() would queue processing all over again
+        VideoFile.objects.filter(pk=self.pk).update(**updates)
+        for name, value in updates.items():
+            setattr(self, name, value)
+        invalidate('video', self.pk)
 
     def generate_thumbnail(self):
+        """Extract a representative frame with ffmpeg. Raises on failure so the job can be retried."""
+        # Create a temporary file for the thumbnail
+        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_thumb:
+            temp_path = temp_thumb.name
+
         try:
-            # Create a temporary file for the thumbnail
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_thumb:
-                temp_path = temp_thumb.name
-
-            # Use ffmpeg to extract a frame at 1 second
-            video_path = self.video_file.path
-            cmd = [
-                'ffmpeg', '-i', video_path,
-                '-ss', '00:00:01',  # Capture at 1 second
-                '-vframes', '1',    # Capture 1 frame
-                '-vf', 'scale=320:-1',  # Resize to 320px width
-                '-q:v', '2',        # Quality setting
-                temp_path,
-                '-y'  # Overwrite output file
-            ]
-            
-            subprocess.run(cmd, check=True, capture_output=True)
-            
-            # Save thumbnail to model
-            thumb_name = f"thumb_{os.path.basename(self.video_file.name)}.jpg"
-            self.thumbnail.save(thumb_name, open(temp_path, 'rb'))
-            
+            extract_thumbnail(
+                settings.FFMPEG_BINARY, media_source(self.video_file), temp_path, seek_offset(self.duration),
+                settings.VIDEO_THUMBNAIL_WIDTH, settings.VIDEO_THUMBNAIL_FRAMES,
+            )
+
+            # Save thumbnail to model, named by its content so it can be cached forever
+            with open(temp_path, 'rb') as thumb_file:
+                self.thumbnail.name = store_hashed(self.thumbnail.storage, 'video_thumbnails/', thumb_file.read(), '.jpg')
+        finally:
             # Clean up temp file
             os.unlink(temp_path)
-            
-            # Save again to store thumbnail
-            super().save()
-            
-        except Exception as e:
-            print(f"Error generating thumbnail: {e}")
-
-    
\ No newline at end of file
+
+        # Save again to store thumbnail
+        self.thumbnail_status = self.STATUS_READY
+        self.thumbnail_policy = thumbnail_policy()
+        super().save(update_fields=['thumbnail', 'thumbnail_status', 'thumbnail_policy'])
+
+
+class VideoRendition(models.Model):
+    """One rung of a video's HLS ladder: a variant playlist plus its segments"""
+    video = models.ForeignKey(VideoFile, related_name='renditions', on_delete=models.CASCADE)
+    height = models.PositiveIntegerField()
+    bitrate = models.PositiveIntegerField(help_text='Video bitrate in kbit/s')
+    playlist = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=VideoFile.STATUS_CHOICES, default=VideoFile.STATUS_PENDING)
+
+    class Meta:
+        ordering = ['height']
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'height'], name='video_rendition_height_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.video} {self.height}p"
@@ -1,11 +1,44 @@
+from django.urls import reverse
 from rest_framework import serializers
+from core.fieldsets import SparseFieldsetMixin
+from core.images import srcset
 from .models import VideoFile
 
-class VideoFileSerializer(serializers.ModelSerializer):
+class VideoFileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    stream_url = serializers.SerializerMethodField()
+    hls_url = serializers.SerializerMethodField()
+    thumbnail_srcset = serializers.SerializerMethodField()
+
+    column_dependencies = {
+        'stream_url': [],
+        'thumbnail_srcset': ['thumbnail', 'thumbnail_derivatives'],
+        'hls_url': ['hls_status', 'hls_playlist', 'video_file'],
+    }
+
     class Meta:
         model = VideoFile
-        fields = ['id', 'title', 'video_file', 'thumbnail', 'description', 'uploaded_date']
-        read_only_fields = ['id', 'uploaded_date', 'thumbnail',]
+        fields = [
+            'id', 'title', 'video_file', 'stream_url', 'thumbnail', 'thumbnail_srcset', 'thumbnail_status', 'hls_url', 'hls_status', 'description', 'uploaded_date',
+            'duration', 'bitrate', 'codec', 'width', 'height', 'file_size', 'metadata_status',
+        ]
+        read_only_fields = [
+            'id', 'uploaded_date', 'thumbnail', 'thumbnail_status', 'hls_status',
+            'duration', 'bitrate', 'codec', 'width', 'height', 'file_size', 'metadata_status',
+        ]
+
+    def get_stream_url(self, obj):
+        return reverse('video_stream', args=[obj.pk])
+
+    def get_thumbnail_srcset(self, obj):
+        if not obj.thumbnail:
+            return None
+        return srcset(obj.thumbnail.storage, obj.thumbnail_derivatives)
+
+    def get_hls_url(self, obj):
+        # Master playlist; players pick a rendition from it
+        if obj.hls_status != VideoFile.STATUS_READY or not obj.hls_playlist:
+            return None
+        return obj.video_file.storage.url(obj.hls_playlist)
 
     def validate_description(self, value):
         """Ensure description is not empty"""
@@ -0,0 +1,77 @@
+from core.cache import invalidate
+from core.images import build_derivatives
+from core.probe import read_metadata
+from jobs.queue import enqueue
+from .hls import transcode_hls
+from .models import VideoFile
+
+
+def generate_thumbnail(job):
+    """Job handler for 'video.thumbnail'"""
+    video = VideoFile.objects.filter(pk=job.object_id).first()
+    if video is None or video.thumbnail:
+        return
+
+    # Queryset updates skip post_save, so drop cached responses explicitly
+    VideoFile.objects.filter(pk=video.pk).update(thumbnail_status=VideoFile.STATUS_PROCESSING)
+    invalidate('video', video.pk)
+    try:
+        video.generate_thumbnail()
+    except Exception:
+        # Leave the row pending while retries remain so clients know it may still arrive
+        status = VideoFile.STATUS_FAILED if job.is_last_attempt else VideoFile.STATUS_PENDING
+        VideoFile.objects.filter(pk=video.pk).update(thumbnail_status=status)
+        invalidate('video', video.pk)
+        raise
+    enqueue('video.thumbnail_derivatives', video.pk)
+
+
+def generate_thumbnail_derivatives(job):
+    """Job handler for 'video.thumbnail_derivatives'"""
+    video = VideoFile.objects.filter(pk=job.object_id).first()
+    if video is None or not video.thumbnail or video.thumbnail_derivatives.get('source') == video.thumbnail.name:
+        return
+
+    video.thumbnail_derivatives = build_derivatives(video.thumbnail)
+    video.save(update_fields=['thumbnail_derivatives'])
+
+
+def generate_hls(job):
+    """Job handler for 'video.hls'"""
+    video = VideoFile.objects.filter(pk=job.object_id).first()
+    if video is None or not video.video_file:
+        return
+
+    VideoFile.objects.filter(pk=video.pk).update(hls_status=VideoFile.STATUS_PROCESSING)
+    invalidate('video', video.pk)
+    try:
+        playlist = transcode_hls(video)
+    except Exception:
+        status = VideoFile.STATUS_FAILED if job.is_last_attempt else VideoFile.STATUS_PENDING
+        VideoFile.objects.filter(pk=video.pk).update(hls_status=status)
+        invalidate('video', video.pk)
+        raise
+
+    video.hls_playlist = playlist
+    video.hls_status = VideoFile.STATUS_READY
+    video.save(update_fields=['hls_playlist', 'hls_status'])
+
+
+def extract_metadata(job):
+    """Job handler for 'video.metadata'"""
+    video = VideoFile.objects.filter(pk=job.object_id).first()
+    if video is None or not video.video_file or video.metadata_status == VideoFile.STATUS_READY:
+        return
+
+    try:
+        metadata = read_metadata(video.video_file)
+    except Exception:
+        if job.is_last_attempt:
+            VideoFile.objects.filter(pk=video.pk).update(metadata_status=VideoFile.STATUS_FAILED)
+            invalidate('video', video.pk)
+        raise
+
+    for name in VideoFile.METADATA_FIELDS:
+        setattr(video, name, metadata.get(name))
+    video.metadata_status = VideoFile.STATUS_READY
+    video.save(update_fields=[*VideoFile.METADATA_FIELDS, 'metadata_status'])
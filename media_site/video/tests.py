@@ -1,3 +1,134 @@
+import os
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from core.cache import get_version
+from core.tests import TempMediaMixin
+from .hls import ladder_for, master_playlist, transcode_hls
+from .models import VideoFile, VideoRendition
+
+
+class VideoTestCase(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def video(self, content=b'video bytes'):
+        video = VideoFile(title='Clip', description='d')
+        with self.captureOnCommitCallbacks(execute=True):
+            video.video_file.save('clip.mp4', ContentFile(content))
+        return video
+
+
+class FileReplacementTests(VideoTestCase):
+    def setUp(self):
+        super().setUp()
+        video = self.video(b'old bytes')
+        VideoFile.objects.filter(pk=video.pk).update(
+            height=720, codec='h264', metadata_status=VideoFile.STATUS_READY,
+            hls_playlist=f'video_hls/{video.pk}/master.m3u8', hls_status=VideoFile.STATUS_READY,
+            thumbnail='video_thumbnails/0123456789abcdef.jpg', thumbnail_status=VideoFile.STATUS_READY,
+        )
+        VideoRendition.objects.create(video=video, height=360, bitrate=800, status=VideoFile.STATUS_READY)
+        self.video_obj = VideoFile.objects.get(pk=video.pk)
+
+    def replace(self, **fields):
+        video = self.video_obj
+        for name, value in fields.items():
+            setattr(video, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            video.video_file.save('clip.mp4', ContentFile(b'new bytes'))
+        video.refresh_from_db()
+        return video
+
+    def test_derived_fields_go_back_to_pending(self):
+        video = self.replace()
+        self.assertIsNone(video.height)
+        self.assertEqual(video.codec, '')
+        self.assertEqual(video.metadata_status, VideoFile.STATUS_PENDING)
+        self.assertEqual(video.hls_playlist, '')
+        self.assertEqual(video.hls_status, VideoFile.STATUS_PENDING)
+        self.assertFalse(video.renditions.exists())
+        self.assertFalse(video.thumbnail)
+        self.assertEqual(video.thumbnail_status, VideoFile.STATUS_PENDING)
+
+    def test_thumbnail_uploaded_with_the_new_file_is_kept(self):
+        video = self.replace(thumbnail='video_thumbnails/fedcba9876543210.jpg')
+        self.assertEqual(video.thumbnail.name, 'video_thumbnails/fedcba9876543210.jpg')
+        self.assertEqual(video.hls_status, VideoFile.STATUS_PENDING)
+
+    def test_other_edits_keep_derived_fields(self):
+        video = self.video_obj
+        video.title = 'Renamed'
+        video.save()
+        video.refresh_from_db()
+        self.assertEqual(video.hls_status, VideoFile.STATUS_READY)
+        self.assertEqual(video.height, 720)
+        self.assertTrue(video.renditions.exists())
+
+
+LADDER = [(360, 800, 96), (720, 2800, 128), (1080, 5000, 192)]
+
+
+def fake_ffmpeg(cmd, **kwargs):
+    # Writes the playlist and one segment where rendition_command() asks
+    playlist = cmd[-2]
+    with open(playlist, 'w') as f:
+        f.write('#EXTM3U\n')
+    with open(playlist.replace('.m3u8', '_000.ts'), 'wb') as f:
+        f.write(b'ts')
+
+
+class HLSLadderTests(VideoTestCase):
+    def test_rungs_above_the_source_are_skipped(self):
+        self.assertEqual(ladder_for(1280, 720, LADDER), [(360, 640, 800, 96), (720, 1280, 2800, 128)])
+
+    def test_small_source_gets_one_rung_at_its_own_size(self):
+        self.assertEqual(ladder_for(320, 241, LADDER), [(240, 318, 800, 96)])
+
+    def test_unknown_size_gets_the_whole_ladder_at_16_9(self):
+        self.assertEqual([rung[:2] for rung in ladder_for(None, None, LADDER)], [(360, 640), (720, 1280), (1080, 1920)])
+
+    def test_master_playlist_names_resolution_and_codecs(self):
+        playlist = master_playlist([(360, 640, 800, 96)])
+        self.assertIn(
+            '#EXT-X-STREAM-INF:BANDWIDTH=896000,RESOLUTION=640x360,CODECS="avc1.4d402a,mp4a.40.2",NAME="360p"\n360.m3u8',
+            playlist,
+        )
+
+    def test_transcode_encodes_only_rungs_the_source_fills(self):
+        video = self.video()
+        VideoFile.objects.filter(pk=video.pk).update(width=854, height=480)
+        video.refresh_from_db()
+        VideoRendition.objects.create(video=video, height=1080, bitrate=5000, status=VideoFile.STATUS_READY)
+
+        with self.settings(VIDEO_HLS_RENDITIONS=LADDER, VIDEO_HLS_TIMEOUT=60), \
+                mock.patch('video.hls.subprocess.run', side_effect=fake_ffmpeg) as run:
+            master = transcode_hls(video)
+
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual(run.call_args.kwargs['timeout'], 60)
+        self.assertEqual(list(video.renditions.values_list('height', 'status')), [(360, VideoFile.STATUS_READY)])
+        storage = video.video_file.storage
+        with storage.open(master) as f:
+            self.assertIn(b'RESOLUTION=640x360', f.read())
+        self.assertTrue(storage.exists(os.path.join(os.path.dirname(master), '360_000.ts')))
+
+
+class RegenerateThumbnailsTests(VideoTestCase):
+    def test_failed_rows_drop_their_cached_detail(self):
+        video = self.video()
+        VideoFile.objects.filter(pk=video.pk).update(thumbnail='')
+        version = get_version('video', video.pk)
+        checkpoint = os.path.join(os.path.dirname(video.video_file.path), 'checkpoint.json')
+        with mock.patch(
+            'video.management.commands.regenerate_thumbnails.try_extract_thumbnail', return_value='ffmpeg failed',
+        ):
+            call_command('regenerate_thumbnails', threads=True, workers=1, checkpoint=checkpoint, stdout=mock.Mock(), stderr=mock.Mock())
+        video.refresh_from_db()
+        self.assertEqual(video.thumbnail_status, VideoFile.STATUS_FAILED)
+        self.assertGreater(get_version('video', video.pk), version)
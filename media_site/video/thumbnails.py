@@ -0,0 +1,76 @@
+import os
+import subprocess
+
+from django.conf import settings
+
+# Bump when the frame picking below changes, so existing thumbnails count as outdated
+POLICY_VERSION = 2
+
+# Give up on a video ffmpeg can't decode (or a URL that hangs)
+THUMBNAIL_TIMEOUT = 300
+
+
+def thumbnail_policy():
+    """
+    Identifies how thumbnails are made right now. Stored on each video, so
+    changing the width, the frame picking or this code marks older
+    thumbnails as outdated for manage.py regenerate_thumbnails.
+    """
+    return f"v{POLICY_VERSION}-{settings.VIDEO_THUMBNAIL_WIDTH}w-{settings.VIDEO_THUMBNAIL_SEEK:g}s-{settings.VIDEO_THUMBNAIL_FRAMES}f"
+
+
+def seek_offset(duration):
+    # Skip intros, fades from black and title cards; 1s when the length is unknown
+    if not duration:
+        return 1.0
+    return round(duration * settings.VIDEO_THUMBNAIL_SEEK, 3)
+
+
+def thumbnail_command(ffmpeg, source, out_path, offset, width, frames):
+    """
+    ffmpeg arguments writing one representative frame of `source`.
+
+    Seeks (by keyframe, before -i, so it's cheap) to `offset`, then ffmpeg's
+    thumbnail filter picks the frame closest to the average of the next
+    `frames` frames. That skips the black frames, blurs and cuts a fixed
+    timestamp often lands on. One decode thread, since the regeneration
+    command runs a worker per core.
+    """
+    return [
+        ffmpeg, '-ss', str(offset), '-i', source,
+        '-threads', '1',
+        '-vf', f'thumbnail={frames},scale={width}:-2',
+        '-frames:v', '1',
+        '-q:v', '2',
+        out_path,
+        '-y',
+    ]
+
+
+def extract_thumbnail(ffmpeg, source, out_path, offset, width, frames):
+    """Raises on failure. Takes plain values so it can run in pool workers."""
+    # Seeking past the end (a wrong or missing duration) yields no frame;
+    # try again from the start
+    offsets = [offset, 0] if offset else [0]
+    for i, start in enumerate(offsets):
+        cmd = thumbnail_command(ffmpeg, source, out_path, start, width, frames)
+        try:
+            subprocess.run(cmd, check=True, capture_output=True, timeout=THUMBNAIL_TIMEOUT)
+        except subprocess.CalledProcessError:
+            if i == len(offsets) - 1:
+                raise
+            continue
+        if os.path.exists(out_path) and os.path.getsize(out_path):
+            return
+    raise RuntimeError('ffmpeg wrote no frame')
+
+
+def try_extract_thumbnail(args):
+    """None or an error message: one bad file must not stop a batch"""
+    try:
+        extract_thumbnail(*args)
+        return None
+    except subprocess.CalledProcessError as e:
+        return f"ffmpeg exited with {e.returncode}: {e.stderr.decode(errors='replace').strip()[-300:]}"
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import VideoFileListAPIView, VideoFileDetailAPIView
+from core.async_views import with_async_get
+from .views import VideoFileListAPIView, VideoFileDetailAPIView, VideoFileStreamAPIView, VideoFileBulkAPIView, video_list, video_detail, video_stream
 
 urlpatterns = [
-    path('', VideoFileListAPIView.as_view(), name='video_list'),
-    path('<int:pk>/', VideoFileDetailAPIView.as_view(), name = 'video_detail'),
+    path('', with_async_get(VideoFileListAPIView, video_list), name='video_list'),
+    path('<int:pk>/', with_async_get(VideoFileDetailAPIView, video_detail), name = 'video_detail'),
+    path('<int:pk>/stream/', with_async_get(VideoFileStreamAPIView, video_stream), name = 'video_stream'),
+    path('bulk/', VideoFileBulkAPIView.as_view(), name = 'video_bulk'),
 ]
\ No newline at end of file
@@ -2,19 +2,43 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import status
-from django.shortcuts import get_object_or_404
+from django.http import HttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from core.async_views import JSONResponse, async_api_view, serialized_response
+from core.bulk import BulkAPIView
+from core.cache import async_cached_response, cached_response
+from core.conditional import async_conditional_get, conditional_get
+from core.filters import filter_by_params
+from core.pagination import KeysetPagination
+from core.streaming import async_ranged_file_response, ranged_file_response
 from .models import VideoFile
 from .serializer import VideoFileSerializer
 
+def list_queryset(request, fields, exclude):
+    columns = VideoFileSerializer.only_columns(fields, exclude)
+    queryset = VideoFile.objects.only('uploaded_date', *columns).order_by('-uploaded_date', '-id')
+    # e.g. ?min_duration=60&max_duration=600&codec=aac
+    return filter_by_params(queryset, request, ranges = ['duration', 'bitrate', 'height', 'file_size'], exact = ['codec'])
+
+
 class VideoFileListAPIView(APIView):
     def get_permissions(self):
         if self.request.method == 'GET':
             return [AllowAny()]
         return [IsAuthenticated()]
     
+    @conditional_get('video')
+    @cached_response('video')
     def get(self, request):
-        video_file = VideoFile.objects.all().order_by('-uploaded_date')
-        serializer = VideoFileSerializer(video_file, many = True)
+        # ?fields= / ?exclude= also trim the columns fetched
+        fields, exclude = VideoFileSerializer.fieldset_from_request(request)
+        video_file = list_queryset(request, fields, exclude)
+        paginator = KeysetPagination('uploaded_date')
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(video_file, request)
+            serializer = VideoFileSerializer(page, many = True, fields = fields, exclude = exclude)
+            return paginator.get_paginated_response(serializer.data)
+        serializer = VideoFileSerializer(video_file, many = True, fields = fields, exclude = exclude)
         return Response(serializer.data)
     
     def post(self, request):
@@ -33,6 +57,8 @@ class VideoFileDetailAPIView(APIView):
     def get_object(self, pk):
         return get_object_or_404(VideoFile, pk=pk)
     
+    @conditional_get('video')
+    @cached_response('video')
     def get(self, request, pk):
         video_file = self.get_object(pk)
         serializer = VideoFileSerializer(video_file)
@@ -52,3 +78,57 @@ class VideoFileDetailAPIView(APIView):
         video_file.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+
+class VideoFileStreamAPIView(APIView):
+    """
+    Stream the video file with HTTP Range support so players can seek
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        video_file = get_object_or_404(VideoFile, pk=pk).video_file
+        if not video_file:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return ranged_file_response(request, video_file)
+
+
+class VideoFileBulkAPIView(BulkAPIView):
+    """
+    Create, update and delete many video files in one transaction
+    """
+    model = VideoFile
+    serializer_class = VideoFileSerializer
+
+
+# Native async GET handlers, used in place of the APIView GETs when
+# settings.ASYNC_VIEWS is on (see core/async_views.py)
+
+@async_api_view
+@async_conditional_get('video')
+@async_cached_response('video')
+async def video_list(request):
+    fields, exclude = VideoFileSerializer.fieldset_from_request(request)
+    video_files = list_queryset(request, fields, exclude)
+    paginator = KeysetPagination('uploaded_date')
+    if paginator.is_requested(request):
+        page = await paginator.apaginate_queryset(video_files, request)
+        return await serialized_response(request, VideoFileSerializer, page, paginator, fields = fields, exclude = exclude)
+    rows = [video_file async for video_file in video_files]
+    return await serialized_response(request, VideoFileSerializer, rows, fields = fields, exclude = exclude)
+
+
+@async_api_view
+@async_conditional_get('video')
+@async_cached_response('video')
+async def video_detail(request, pk):
+    video_file = await aget_object_or_404(VideoFile, pk=pk)
+    serializer = VideoFileSerializer(video_file)
+    return JSONResponse(serializer.data, request = request)
+
+
+@async_api_view
+async def video_stream(request, pk):
+    video_file = (await aget_object_or_404(VideoFile, pk=pk)).video_file
+    if not video_file:
+        return HttpResponse(status = status.HTTP_404_NOT_FOUND)
+    return await async_ranged_file_response(request, video_file)